@@ -1,64 +1,477 @@
-from flask import Flask, render_template, request
+import os
+from concurrent.futures import ThreadPoolExecutor
+from flask import (Flask, Response, current_app, get_template_attribute, jsonify, make_response, redirect,
+                   render_template, request, send_from_directory, stream_with_context, url_for)
+import fetch
+import metrics
+from cache import get_default_cache
+from coalesce import SingleFlight, StreamFlight
 from company import Company
-from dcf_models.operations import CashFlowOperationsDCF
-from plotter import Plotter 
+from plotter import PLOTLY_JS_DIR, PLOTLY_JS_FILENAME, PLOTLY_VERSION, Plotter
+from refresh import RefreshScheduler, read_watchlist
+from result_cache import ResultCache
+from valuation import (DEFAULT_MODEL, DEFAULT_TERMINAL_GROWTH_RATE, MODELS, ValuationSession, ValuationSessions,
+                       value_company)
 
-app = Flask(__name__)
+# Rendered valuations, shared between workers when DCF_RESULT_CACHE_PATH is set
+result_cache = ResultCache(
+    max_entries=int(os.environ.get('DCF_RESULT_CACHE_SIZE', 256)),
+    shared_path=os.environ.get('DCF_RESULT_CACHE_PATH')
+)
+
+# Downloaded data, WACC and drivers behind the "adjust assumptions" form of result pages
+valuation_sessions = ValuationSessions(max_entries=int(os.environ.get('DCF_SESSION_LIMIT', 256)))
+
+# Upper bounds for the batch valuation endpoint
+MAX_BATCH_TICKERS = 100
+BATCH_WORKERS = 8
+
+# Horizon of the valuation prewarmed for watchlist tickers, matching the form's default
+DEFAULT_FORECAST_YEARS = 5
+
+# Concurrent requests for the same company, or the same ticker/horizon/model, share one in-flight
+# download and computation (DCF_COALESCE_REQUESTS=0 turns this off)
+COALESCE_REQUESTS = os.environ.get('DCF_COALESCE_REQUESTS', '1') not in ('0', 'false')
+company_flight = SingleFlight('company', enabled=COALESCE_REQUESTS)
+result_flight = SingleFlight('result', enabled=COALESCE_REQUESTS)
+stream_flight = StreamFlight('stream', enabled=COALESCE_REQUESTS)
+
+# Stream result pages: headline numbers first, charts as they are computed (DCF_STREAM_RESULTS=1 makes
+# it the default; the `stream` request parameter overrides it)
+STREAM_RESULTS = os.environ.get('DCF_STREAM_RESULTS', '') not in ('', '0', 'false')
+
+# Started once per process by create_app() when a watchlist or stale-while-revalidate is configured
+refresh_scheduler = None
+
+# Worker processes of the WSGI server, which share the upstream rate limit (gunicorn also reads
+# WEB_CONCURRENCY as its default worker count)
+WEB_WORKERS = int(os.environ.get('DCF_WEB_WORKERS') or os.environ.get('WEB_CONCURRENCY') or 1)
+_fetch_share_configured = False
+
+def load_company(ticker):
+    """Downloads a company, sharing the download with concurrent requests for the same ticker."""
+    def load():
+        with metrics.span('company'):
+            return Company(ticker)
+    return company_flight.do(ticker.upper(), load)
+
+def start_request_metrics():
+    metrics.start_request()
+
+def add_server_timing(response):
+    # Per-stage durations of this request, visible in the browser's network panel
+    server_timing = metrics.server_timing()
+    if server_timing:
+        response.headers['Server-Timing'] = server_timing
+    return response
+
+def prometheus_metrics():
+    return Response(metrics.render_prometheus(), mimetype='text/plain; version=0.0.4')
+
+def plotly_js():
+    # The URL carries the Plotly version, so browsers may cache the bundle for a year
+    return send_from_directory(PLOTLY_JS_DIR, PLOTLY_JS_FILENAME, max_age=365 * 24 * 60 * 60)
 
-@app.route('/', methods=['GET', 'POST'])
 def index():
-    if request.method == 'POST':
-        ticker = request.form['ticker']
-        forecast_years = int(request.form['forecast_years'])
-
-        # Instantiate the Company object
-        company = Company(ticker)
-
-        # Pass the Company object to DCF
-        #dcf_calculator = NopatDCF(company, forecast_years)
-        dcf_calculator = CashFlowOperationsDCF(company, forecast_years)
-        dcf_calculator.calculate_dcf()
-        equity_value = dcf_calculator.calculate_equity_value()
-        intrinsic_share_price = dcf_calculator.calculate_intrinsic_share_price()
-
-        # Calculate additional values
-        total_dcf_value = dcf_calculator.dcf_table['Discounted FCF ($)'].sum()
-        
-        # Create plotter instance
-        plotter = Plotter(dcf_table=dcf_calculator.dcf_table, company=company)
-        
-        # Generate interactive plots
-        dcf_plot = plotter.create_dcf_plot()
-        core_metrics_plot = plotter.create_financial_metrics_plot()
-
-        # Prepare DataFrame for display in billions
-        dcf_table_display = dcf_calculator.dcf_table.copy()
-        dcf_table_display['Forecasted FCF ($)'] = dcf_table_display['Forecasted FCF ($)'] / 1e9
-        dcf_table_display['Discounted FCF ($)'] = dcf_table_display['Discounted FCF ($)'] / 1e9
-
-        # Rename columns for display
-        dcf_table_display = dcf_table_display.rename(columns={
-            'Forecasted FCF ($)': 'Forecasted FCF ($B)',
-            'Discounted FCF ($)': 'Discounted FCF ($B)'
-        })
-        dcf_table_display = dcf_table_display.round(2)
+    # The form submits with GET so result pages have stable URLs the browser can revalidate
+    params = request.form if request.method == 'POST' else request.args
+    if 'ticker' in params:
+        ticker = params['ticker']
+        try:
+            forecast_years, model_name = parse_valuation_params(params)
+        except ValueError as e:
+            return str(e), 400
+        model_cls = MODELS[model_name]
+        if wants_streaming(params):
+            company, key, result = lookup_valuation(ticker, forecast_years, model_cls)
+            if result is None:
+                return stream_response(shared_result_stream(company, key, ticker, forecast_years, model_name), ticker)
+        else:
+            result = result_flight.do((ticker.upper(), forecast_years, model_name),
+                                      lambda: cached_valuation(ticker, forecast_years, model_cls))
+
+        response = make_response(result.body)
+        response.set_etag(result.etag)
+        response.last_modified = result.last_modified
+        response.cache_control.no_cache = True
+        return response.make_conditional(request)
+
+    return render_template('index.html', models=MODELS, default_model=DEFAULT_MODEL)
+
+def wants_streaming(params):
+    return params.get('stream', '1' if STREAM_RESULTS else '0') not in ('', '0', 'false')
 
+def lookup_valuation(ticker, forecast_years, model_cls):
+    """
+    Loads a company and looks up the rendered result page of a valuation.
+
+    :return: (company, result cache key, CachedResult or None)
+    """
+    company = load_company(ticker)
+    key = ResultCache.key(ticker, forecast_years, model_cls, company.data_version)
+    with metrics.span('result_cache'):
+        return company, key, result_cache.get(key)
+
+def cached_valuation(ticker, forecast_years, model_cls):
+    """Returns the rendered result page of a valuation from the result cache, rendering it on a miss."""
+    company, key, result = lookup_valuation(ticker, forecast_years, model_cls)
+    if result is None:
+        # Cached pages are shared by every viewer, so they carry no session: the first /adjust of a
+        # viewer starts one
+        session = ValuationSession(company)
+        body = render_valuation(session.value(forecast_years, model_cls.__name__), ticker, None, session.wacc)
+        result = result_cache.set(key, body, company.last_modified)
+    return result
+
+def adjust():
+    """
+    Revalues a result page with new forecast horizon, terminal growth, discount rate or model,
+    reusing the session's downloaded data, WACC and drivers.
+    """
+    params = request.args
+    ticker = params.get('ticker')
+    if not ticker:
+        return redirect(url_for('index'))
+    try:
+        forecast_years, model_name = parse_valuation_params(params)
+        terminal_growth_rate = parse_percentage(params, 'terminal_growth_rate', DEFAULT_TERMINAL_GROWTH_RATE)
+        discount_rate = parse_percentage(params, 'discount_rate', None)
+    except ValueError as e:
+        return str(e), 400
+
+    handle = params.get('session', '')
+    session = valuation_sessions.get(handle)
+    if session is None or session.company.ticker.upper() != ticker.upper():
+        # Sessions live in one worker's memory; start a new one when evicted or unknown here
+        handle, session = valuation_sessions.create(load_company(ticker))
+
+    try:
+        dcf_calculator = session.value(forecast_years, model_name, terminal_growth_rate, discount_rate)
+    except ValueError as e:
+        return str(e), 400
+    if wants_streaming(params):
+        return stream_response(result_page_chunks(dcf_calculator, ticker, handle, session.wacc), ticker)
+    return render_valuation(dcf_calculator, ticker, handle, session.wacc)
+
+def compare():
+    """Values a company under every DCF model with one shared WACC and set of growth rates."""
+    ticker = request.args.get('ticker')
+    if not ticker:
+        return redirect(url_for('index'))
+    try:
+        forecast_years, _ = parse_valuation_params(request.args)
+    except ValueError as e:
+        return str(e), 400
+
+    company = load_company(ticker)
+    handle, session = valuation_sessions.create(company)
+    with metrics.span('compare'):
+        comparison, models = session.compare(forecast_years)
+    with metrics.span('plots'):
+        comparison_plot = Plotter(company=company, comparison=comparison).create_model_comparison_plot()
+
+    # Billions for the values, percent for the growth rate
+    comparison_display = comparison.copy()
+    for column in ['Enterprise Value ($)', 'Equity Value ($)']:
+        comparison_display[column] = comparison_display[column] / 1e9
+    comparison_display['Growth Rate'] = comparison_display['Growth Rate'] * 100
+    comparison_display = comparison_display.rename(columns={
+        'Enterprise Value ($)': 'Enterprise Value ($B)',
+        'Equity Value ($)': 'Equity Value ($B)',
+        'Growth Rate': 'Growth Rate (%)',
+    })
+    if comparison_display['Error'].isna().all():
+        comparison_display = comparison_display.drop(columns='Error')
+
+    with metrics.span('template'):
         return render_template(
-            'result.html', 
-            table=dcf_table_display.to_html(classes='table table-striped', index=False),
+            'compare.html',
             ticker=ticker,
-            company = company,
-            dcf_plot=dcf_plot,
-            core_metrics_plot = core_metrics_plot,
-            total_dcf_value=total_dcf_value / 1e9, 
-            equity_value=equity_value / 1e9,  
-            intrinsic_share_price=intrinsic_share_price,
-            shares_outstanding=dcf_calculator.company.shares_outstanding,
-            cash=dcf_calculator.company.cash / 1e9,  
-            debt=dcf_calculator.company.debt / 1e9   
+            company=company,
+            forecast_years=forecast_years,
+            wacc=session.wacc,
+            table=comparison_display.round(2).to_html(classes='table table-striped', na_rep='n/a'),
+            comparison_plot=comparison_plot,
+            plotly_version=PLOTLY_VERSION,
+            model_names=list(models),
+            session_handle=handle,
         )
 
-    return render_template('index.html')
+def parse_percentage(params, name, default):
+    """Reads an optional percentage form field, e.g. '2.5', as a fraction."""
+    value = params.get(name, '').strip()
+    if not value:
+        return default
+    try:
+        return float(value) / 100
+    except ValueError:
+        raise ValueError(f"'{name}' must be a number")
+
+def valuation_context(dcf_calculator, ticker, session_handle, wacc):
+    """
+    Template context of the result page, except for the charts and the sensitivity section.
+    `session_handle` is None for pages shared between viewers, such as cached ones.
+    """
+    company = dcf_calculator.company
+
+    # Prepare DataFrame for display in billions
+    dcf_table_display = dcf_calculator.dcf_table.copy()
+    dcf_table_display['Forecasted FCF ($)'] = dcf_table_display['Forecasted FCF ($)'] / 1e9
+    dcf_table_display['Discounted FCF ($)'] = dcf_table_display['Discounted FCF ($)'] / 1e9
+
+    # Rename columns for display
+    dcf_table_display = dcf_table_display.rename(columns={
+        'Forecasted FCF ($)': 'Forecasted FCF ($B)',
+        'Discounted FCF ($)': 'Discounted FCF ($B)'
+    })
+    dcf_table_display = dcf_table_display.round(2)
+
+    return dict(
+        table=dcf_table_display.to_html(classes='table table-striped', index=False),
+        ticker=ticker,
+        company=company,
+        plotly_version=PLOTLY_VERSION,
+        total_dcf_value=dcf_calculator.dcf_table['Discounted FCF ($)'].sum() / 1e9,
+        equity_value=dcf_calculator.equity_value / 1e9,
+        intrinsic_share_price=dcf_calculator.intrinsic_share_price,
+        shares_outstanding=company.shares_outstanding,
+        cash=company.cash / 1e9,
+        debt=company.debt / 1e9,
+        session_handle=session_handle,
+        adjustable=True,
+        models=MODELS,
+        model_name=type(dcf_calculator).__name__,
+        forecast_years=dcf_calculator.forecast_years,
+        terminal_growth_rate=dcf_calculator.terminal_growth_rate,
+        discount_rate=dcf_calculator.discount_rate,
+        wacc=wacc
+    )
+
+def sensitivity_table(sensitivity_grid):
+    """Shows every 7th discount rate / terminal growth rate of the sensitivity grid as an HTML table."""
+    sensitivity_display = sensitivity_grid.iloc[::7, ::7].round(2)
+    sensitivity_display.index = [f"{rate:.2%}" for rate in sensitivity_display.index]
+    sensitivity_display.columns = [f"{rate:.2%}" for rate in sensitivity_display.columns]
+    sensitivity_display.index.name = 'Discount Rate \\ Terminal Growth'
+    return sensitivity_display.to_html(classes='table table-striped table-sm', na_rep='n/a')
+
+def result_page_context(dcf_calculator, ticker, session_handle, wacc):
+    """Template context of the complete result page, with the charts and the sensitivity section."""
+    context = valuation_context(dcf_calculator, ticker, session_handle, wacc)
+    with metrics.span('sensitivity'):
+        sensitivity_grid = dcf_calculator.calculate_sensitivity_grid()
+
+    # Generate interactive plots
+    plotter = Plotter(dcf_table=dcf_calculator.dcf_table, company=dcf_calculator.company, sensitivity_grid=sensitivity_grid)
+    with metrics.span('plots'):
+        context.update(
+            dcf_plot=plotter.create_dcf_plot(),
+            core_metrics_plot=plotter.create_financial_metrics_plot(),
+            sensitivity_plot=plotter.create_sensitivity_heatmap(),
+        )
+    context.update(sensitivity_table=sensitivity_table(sensitivity_grid), deferred=())
+    return context
+
+def render_valuation(dcf_calculator, ticker, session_handle, wacc):
+    """Renders the result page of a calculated DCF model and the form to adjust its inputs."""
+    context = result_page_context(dcf_calculator, ticker, session_handle, wacc)
+    with metrics.span('template'):
+        return render_template('result.html', **context)
+
+def deferred_sections(dcf_calculator):
+    """
+    Yields the scripts that fill the charts and the sensitivity table of a streamed result page,
+    in page order, each as soon as it is computed.
+    """
+    plot_script = get_template_attribute('macros.html', 'plot_script')
+    fill_script = get_template_attribute('macros.html', 'fill_script')
+    plotter = Plotter(dcf_table=dcf_calculator.dcf_table, company=dcf_calculator.company)
+
+    with metrics.span('plots'):
+        figure = plotter.create_financial_metrics_plot()
+    yield plot_script('core-metrics-plot', figure)
+    with metrics.span('plots'):
+        figure = plotter.create_dcf_plot()
+    yield plot_script('dcf-plot', figure)
+
+    with metrics.span('sensitivity'):
+        plotter.sensitivity_grid = dcf_calculator.calculate_sensitivity_grid()
+    with metrics.span('plots'):
+        figure = plotter.create_sensitivity_heatmap()
+    yield plot_script('sensitivity-plot', figure)
+    yield fill_script('sensitivity-table', sensitivity_table(plotter.sensitivity_grid))
+
+def result_page_chunks(dcf_calculator, ticker, session_handle, wacc):
+    """
+    Yields the result page of a calculated DCF model in chunks: the page with the headline numbers
+    and the DCF table first, then the charts and the sensitivity section as scripts at the end of
+    the page, each as soon as it is computed. The final page is the same as a rendered one.
+    """
+    context = valuation_context(dcf_calculator, ticker, session_handle, wacc)
+    context.update(dcf_plot=None, core_metrics_plot=None, sensitivity_plot=None, sensitivity_table=None,
+                   deferred=deferred_sections(dcf_calculator))
+    yield from current_app.jinja_env.get_template('result.html').generate(context)
+
+def shared_result_stream(company, key, ticker, forecast_years, model_name):
+    """
+    Chunks of the result page of a valuation, shared by concurrent requests for it: the first
+    request values the company and computes each chunk once, the others replay them. The complete
+    page is stored in the result cache under `key`. Like cached pages, it carries no session.
+    """
+    def produce():
+        session = ValuationSession(company)
+        body = []
+        for chunk in result_page_chunks(session.value(forecast_years, model_name), ticker, None, session.wacc):
+            body.append(chunk)
+            yield chunk
+        result_cache.set(key, ''.join(body), company.last_modified)
+    return stream_flight.stream(key, produce)
+
+def stream_response(chunks, ticker):
+    """
+    Streams page chunks. The first chunk is computed before the response starts, so a valuation
+    that fails gets a normal error response.
+    """
+    chunks = iter(chunks)
+    first = next(chunks)
+
+    def generate():
+        yield first
+        try:
+            yield from chunks
+        except Exception as e:
+            # The status line is already sent: report the failure in the page instead
+            print(f"[ERROR] Streaming the result page of {ticker} failed: {type(e).__name__}: {e}")
+            yield '<div class="alert alert-danger">Some charts could not be rendered. Please reload the page.</div>'
+
+    response = Response(stream_with_context(generate()), mimetype='text/html')
+    response.cache_control.no_cache = True
+    response.headers['X-Accel-Buffering'] = 'no'  # Ask reverse proxies not to buffer the stream
+    return response
+
+def parse_valuation_params(params):
+    """
+    Reads forecast_years and model from request parameters.
+
+    :raises: ValueError with a message suitable for a 400 response.
+    """
+    try:
+        forecast_years = int(params.get('forecast_years', 5))
+    except (TypeError, ValueError):
+        raise ValueError("'forecast_years' must be an integer")
+    if forecast_years < 1:
+        raise ValueError("'forecast_years' must be at least 1")
+    model_name = params.get('model', DEFAULT_MODEL)
+    if model_name not in MODELS:
+        raise ValueError(f"Unknown model '{model_name}'. Choose one of: {', '.join(MODELS)}")
+    return forecast_years, model_name
+
+def value_ticker(ticker, forecast_years, model_name):
+    """
+    Values one ticker for the JSON endpoints, reporting failures per ticker. Concurrent requests
+    for the same valuation share one computation.
+    """
+    try:
+        valuation = result_flight.do(('api', ticker.upper(), forecast_years, model_name),
+                                     lambda: value_company(ticker, forecast_years, model_name))
+        return {'ticker': ticker.upper(), 'status': 'ok', 'valuation': valuation}
+    except Exception as e:
+        return {'ticker': ticker.upper(), 'status': 'error', 'error': f"{type(e).__name__}: {e}"}
+
+def value_batch_ticker(ticker, forecast_years, model_name):
+    """Values one ticker of the batch endpoint; its upstream calls yield to single-ticker requests."""
+    with fetch.priority(fetch.BATCH):
+        return value_ticker(ticker, forecast_years, model_name)
+
+def api_valuation():
+    ticker = request.args.get('ticker')
+    if not ticker:
+        return jsonify(error="'ticker' is required"), 400
+    try:
+        forecast_years, model_name = parse_valuation_params(request.args)
+    except ValueError as e:
+        return jsonify(error=str(e)), 400
+
+    result = value_ticker(ticker, forecast_years, model_name)
+    if result['status'] != 'ok':
+        return jsonify(error=result['error']), 422
+    return jsonify(result['valuation'])
+
+def api_valuation_batch():
+    payload = request.get_json(silent=True) or {}
+    tickers = payload.get('tickers')
+    if not isinstance(tickers, list) or not tickers or not all(isinstance(t, str) and t for t in tickers):
+        return jsonify(error="'tickers' must be a non-empty list of ticker symbols"), 400
+    if len(tickers) > MAX_BATCH_TICKERS:
+        return jsonify(error=f"At most {MAX_BATCH_TICKERS} tickers per batch"), 400
+    try:
+        forecast_years, model_name = parse_valuation_params(payload)
+    except ValueError as e:
+        return jsonify(error=str(e)), 400
+
+    tickers = list(dict.fromkeys(ticker.upper() for ticker in tickers))
+    with ThreadPoolExecutor(max_workers=min(BATCH_WORKERS, len(tickers))) as executor:
+        results = list(executor.map(lambda ticker: value_batch_ticker(ticker, forecast_years, model_name), tickers))
+
+    return jsonify(
+        forecast_years=forecast_years,
+        model=model_name,
+        succeeded=sum(result['status'] == 'ok' for result in results),
+        failed=sum(result['status'] != 'ok' for result in results),
+        results=results,
+    )
+
+def prewarm_valuation(app, company):
+    """Renders and caches the default result page of a freshly refreshed company."""
+    model_cls = MODELS[DEFAULT_MODEL]
+    key = ResultCache.key(company.ticker, DEFAULT_FORECAST_YEARS, model_cls, company.data_version)
+    if result_cache.get(key) is None:
+        with app.test_request_context('/'):
+            session = ValuationSession(company)
+            body = render_valuation(session.value(DEFAULT_FORECAST_YEARS, model_cls.__name__), company.ticker, None, session.wacc)
+        result_cache.set(key, body, company.last_modified)
+
+def create_app(config=None):
+    """
+    Builds the Flask application. WSGI servers call it once per worker process, e.g.
+    `gunicorn -w 4 --threads 8 'app:create_app()'` (see wsgi.py).
+
+    Caches, sessions and in-flight requests are shared by every app of a process. With
+    DCF_WEB_WORKERS (or WEB_CONCURRENCY) worker processes, each process gets its share of the
+    upstream rate limit. The background refresh scheduler is started with the first app when
+    DCF_WATCHLIST or DCF_STALE_WHILE_REVALIDATE is set: it serves expired data immediately while it
+    is refreshed in the background, and prewarms the watchlist (one ticker per line) outside market
+    hours, in the one worker holding the DCF_REFRESH_LOCK_PATH lock file.
+
+    :param config: Optional Flask configuration values.
+    """
+    global refresh_scheduler, _fetch_share_configured
+    app = Flask(__name__)
+    app.config.update(config or {})
+
+    app.before_request(start_request_metrics)
+    app.after_request(add_server_timing)
+    app.add_url_rule('/metrics', view_func=prometheus_metrics)
+    app.add_url_rule('/assets/plotly.min.js', view_func=plotly_js)
+    app.add_url_rule('/', view_func=index, methods=['GET', 'POST'])
+    app.add_url_rule('/adjust', view_func=adjust)
+    app.add_url_rule('/compare', view_func=compare)
+    app.add_url_rule('/api/valuation', view_func=api_valuation)
+    app.add_url_rule('/api/valuation/batch', view_func=api_valuation_batch, methods=['POST'])
+
+    if WEB_WORKERS > 1 and not _fetch_share_configured:
+        fetch.configure_process_share(WEB_WORKERS)
+        _fetch_share_configured = True
+
+    if refresh_scheduler is None and (os.environ.get('DCF_WATCHLIST') or
+                                      os.environ.get('DCF_STALE_WHILE_REVALIDATE', '') not in ('', '0', 'false')):
+        refresh_scheduler = RefreshScheduler(
+            watchlist=read_watchlist(os.environ['DCF_WATCHLIST']) if os.environ.get('DCF_WATCHLIST') else (),
+            max_workers=int(os.environ.get('DCF_REFRESH_WORKERS', 4)),
+            prewarm_valuation=lambda company: prewarm_valuation(app, company),
+            lock_path=os.environ.get('DCF_REFRESH_LOCK_PATH', get_default_cache().path + '.prewarm.lock'),
+        ).start()
+    return app
 
 if __name__ == '__main__':
-    app.run(debug=True)
+    create_app().run(debug=True)
@@ -0,0 +1,372 @@
+"""
+Point-in-time backtest of the DCF intrinsic share price as a signal.
+
+For every ticker of a universe and every fiscal year, the company is valued as of the date its
+annual report was published (fiscal year end plus a publication lag), using only the statements
+available by then, and the implied upside is compared with the share price return over the
+following years.
+
+Company data is read from the data cache, or from a local bulk dataset with DCF_PROVIDER=local
+(see providers.py). All prices (daily closes of the universe, of the
+risk-free rate ticker and of the market index) come from one price matrix, built once and sent
+once to every worker process. With --offline nothing is downloaded.
+
+Limitations: yfinance provides about four annual statements per company, and `info` fields have
+no history, so the current beta and share count are used for every view.
+
+Usage:
+    python backtest.py tickers.txt --model NopatDCF --horizon 1 --output backtest.csv
+    python backtest.py tickers.txt --offline --years 2021 2022 2023
+    DCF_PROVIDER=local DCF_LOCAL_DATA_PATH=data/bulk python backtest.py tickers.txt
+"""
+import argparse
+import contextlib
+import csv
+import functools
+import io
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import date
+import numpy as np
+import pandas as pd
+import fetch
+import market_data
+from cache import PRICE_HISTORY, get_default_cache
+from company import DEFAULT_PUBLICATION_LAG, Company
+from keys import FinStatement
+from providers import get_default_provider
+from screener import read_tickers
+from valuation import DEFAULT_MODEL, MODELS
+from wacc import WACC
+
+MARKET_INDEX = '^GSPC'
+DEFAULT_HORIZON = 1  # years between the valuation and the forward price
+DEFAULT_YEARS = 4  # fiscal years tested by default, ending with the last full calendar year
+
+FIELDS = [
+    'ticker', 'fiscal_year', 'model', 'status', 'error', 'period_end', 'as_of',
+    'intrinsic_share_price', 'price', 'upside', 'forward_price', 'forward_return', 'wacc', 'elapsed_seconds',
+]
+
+
+def load_price_history(ticker, cache, provider=None):
+    """
+    Returns the daily closes of a ticker from the cache, downloading its full history when it is
+    missing or expired. Providers that are not cacheable are read directly.
+
+    :raises: RuntimeError if the cache is offline and holds no copy of the history.
+    """
+    provider = provider or get_default_provider()
+    if not provider.cacheable:
+        return provider.history(ticker, 'max')['Close']
+
+    entry = cache.get_entry(ticker, PRICE_HISTORY)
+    if entry is not None and cache.is_fresh(PRICE_HISTORY, entry[1]):
+        return entry[0]
+    if cache.offline:
+        raise RuntimeError(f"No cached '{PRICE_HISTORY}' data for ticker '{ticker}' and the cache is offline.")
+
+    closes = provider.history(ticker, 'max')['Close']
+    if len(closes) > 0:
+        cache.set(ticker, PRICE_HISTORY, closes)
+    return closes
+
+
+class PriceMatrix:
+    """
+    Daily closes of many tickers on one shared date axis, forward-filled so the price at any date
+    is the last close on or before it.
+
+    Attributes:
+        dates (np.ndarray): Trading days in ascending order, as datetime64[D]
+        tickers (list): The tickers, one column each
+        closes (np.ndarray): (dates, tickers) matrix, NaN before a ticker's first close
+        missing (dict): Tickers whose history could not be loaded, with the error
+    """
+
+    def __init__(self, closes, missing=None):
+        """
+        Use PriceMatrix.load() to build the matrix from the data cache.
+
+        :param closes: A DataFrame of daily closes with one column per ticker.
+        """
+        closes = closes.sort_index()
+        self.dates = closes.index.values.astype('datetime64[D]')
+        self.tickers = list(closes.columns)
+        self.closes = closes.ffill().to_numpy(dtype=float)
+        self.missing = missing or {}
+        self._columns = {ticker: i for i, ticker in enumerate(self.tickers)}
+        self._market_returns = {}
+
+    @classmethod
+    def from_series(cls, series, missing=None):
+        """
+        :param series: A dictionary mapping tickers to Series of closes indexed by timestamp.
+        """
+        columns = {}
+        for ticker, closes in series.items():
+            index = pd.DatetimeIndex(closes.index)
+            if index.tz is not None:
+                index = index.tz_localize(None)  # Keep the exchange's calendar date
+            index = index.normalize()
+            columns[ticker] = pd.Series(closes.to_numpy(dtype=float), index=index)[~index.duplicated(keep='last')]
+        return cls(pd.DataFrame(columns), missing)
+
+    @classmethod
+    def load(cls, tickers, cache=None, max_workers=fetch.DEFAULT_MAX_WORKERS, provider=None):
+        """
+        Builds the matrix from the cached price histories of `tickers`, downloading the missing or
+        expired ones unless the cache is offline. Tickers that cannot be loaded are left out and
+        listed in `missing`.
+        """
+        cache = cache or get_default_cache()
+
+        def load(ticker):
+            try:
+                return ticker, load_price_history(ticker, cache, provider), None
+            except Exception as e:
+                return ticker, None, f"{type(e).__name__}: {e}"
+
+        series, missing = {}, {}
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='prices') as executor:
+            for ticker, closes, error in executor.map(load, dict.fromkeys(tickers)):
+                if error is None:
+                    series[ticker] = closes
+                else:
+                    missing[ticker] = error
+        return cls.from_series(series, missing)
+
+    def __contains__(self, ticker):
+        return ticker in self._columns
+
+    def _position(self, when):
+        """Index of the last trading day on or before `when`, -1 if there is none or `when` is past the data."""
+        day = np.datetime64(pd.Timestamp(when).date(), 'D')
+        if not len(self.dates) or day > self.dates[-1]:
+            return -1
+        return int(np.searchsorted(self.dates, day, side='right')) - 1
+
+    def price(self, ticker, when):
+        """The last close of `ticker` on or before `when`; NaN when unknown."""
+        i = self._position(when)
+        if i < 0 or ticker not in self._columns:
+            return np.nan
+        return self.closes[i, self._columns[ticker]]
+
+    def market_return(self, ticker, when):
+        """
+        Average yearly return of an index up to `when`, computed like the live WACC input
+        (see market_data.get_historical_market_return).
+
+        :raises: ValueError if the index has no prices by then.
+        """
+        i = self._position(when)
+        key = (ticker, i)
+        if key not in self._market_returns:
+            closes = pd.Series(self.closes[:i + 1, self._columns[ticker]] if ticker in self and i >= 0 else [],
+                               index=pd.DatetimeIndex(self.dates[:i + 1] if i >= 0 else []), dtype=float).dropna()
+            yearly_returns = closes.resample('YE').ffill().pct_change().dropna()
+            if yearly_returns.empty:
+                raise ValueError(f"No '{ticker}' prices to compute the market return as of {pd.Timestamp(when).date()}.")
+            self._market_returns[key] = float(yearly_returns.mean())
+        return self._market_returns[key]
+
+
+class PointInTimeWACC(WACC):
+    """
+    WACC of a point-in-time company view, with the risk-free rate and market return as of the
+    view's date read from a PriceMatrix instead of today's market inputs.
+    """
+
+    def __init__(self, company, prices, when):
+        self.prices = prices
+        self.when = when
+        super().__init__(company.ticker, company=company)
+
+    def get_risk_free_rate(self):
+        rate = self.prices.price(market_data.RISK_FREE_TICKER, self.when)
+        if np.isnan(rate):
+            raise ValueError(f"No risk free rate data available as of {pd.Timestamp(self.when).date()}")
+        return float(rate / 100)
+
+    def get_historical_market_return(self, ticker=MARKET_INDEX):
+        return self.prices.market_return(ticker, self.when)
+
+
+# Price matrix of a worker process, set once by _init_worker
+_prices = None
+
+
+def _init_worker(prices, processes):
+    global _prices
+    _prices = prices
+    fetch.configure_batch_process(processes)
+
+
+@functools.lru_cache(maxsize=64)
+def _load_company(ticker):
+    # A worker usually tests several years of the same ticker
+    return Company(ticker, prefetch_market_data=False)
+
+
+def backtest_year(ticker, fiscal_year, model_name=DEFAULT_MODEL, forecast_years=5, horizon=DEFAULT_HORIZON,
+                  publication_lag=DEFAULT_PUBLICATION_LAG, prices=None):
+    """
+    Values one ticker as of the publication of its annual report for `fiscal_year` and compares
+    the intrinsic share price with the price then and `horizon` years later. Errors are caught and
+    recorded in the row; a ticker without a fiscal year ending in `fiscal_year` is skipped.
+
+    :param prices: The PriceMatrix; defaults to the one of the worker process.
+    :return: A result row.
+    """
+    prices = prices if prices is not None else _prices
+    row = dict.fromkeys(FIELDS)
+    row.update(ticker=ticker, fiscal_year=fiscal_year, model=model_name)
+    start = time.perf_counter()
+    try:
+        # The models print their WACC inputs; keep worker output quiet
+        with contextlib.redirect_stdout(io.StringIO()):
+            company = _load_company(ticker)
+            period_ends = [end for end in company.statements.period_ends(FinStatement.INCOME.value) if end.year == fiscal_year]
+            if not period_ends:
+                row.update(status='skipped', error=f"No fiscal year ending in {fiscal_year}")
+                return row
+            period_end = max(period_ends)
+            as_of = period_end + publication_lag
+            price = prices.price(ticker, as_of)
+            if np.isnan(price):
+                raise ValueError(f"No '{ticker}' price as of {as_of.date()}")
+
+            view = company.as_of(as_of, publication_lag, price=price)
+            dcf_calculator = MODELS[model_name](view, forecast_years, wacc_model=PointInTimeWACC(view, prices, as_of))
+            dcf_calculator.calculate_dcf()
+            dcf_calculator.calculate_equity_value()
+            intrinsic_share_price = dcf_calculator.calculate_intrinsic_share_price()
+
+        forward_price = prices.price(ticker, as_of + pd.DateOffset(years=horizon))
+        row.update(
+            status='ok',
+            period_end=period_end.date().isoformat(),
+            as_of=as_of.date().isoformat(),
+            intrinsic_share_price=float(intrinsic_share_price),
+            price=float(price),
+            upside=float(intrinsic_share_price / price - 1),
+            forward_price=float(forward_price),
+            forward_return=float(forward_price / price - 1),
+            wacc=float(dcf_calculator.discount_rate),
+        )
+    except Exception as e:
+        row.update(status='error', error=f"{type(e).__name__}: {e}")
+    finally:
+        row['elapsed_seconds'] = round(time.perf_counter() - start, 3)
+    return row
+
+
+def summarize(rows):
+    """
+    Measures the signal over the valued rows whose forward price is known, for all years together
+    and per fiscal year.
+
+    :return: A DataFrame with the number of observations, the hit rate (upside and forward return
+             have the same sign), the rank information coefficient (Spearman correlation of upside
+             and forward return) and the mean forward return of undervalued and overvalued names.
+    """
+    results = pd.DataFrame([row for row in rows if row['status'] == 'ok'], columns=FIELDS)
+    results = results.dropna(subset=['upside', 'forward_return'])
+
+    def measure(group):
+        undervalued = group['upside'] > 0
+        return {
+            'observations': len(group),
+            'hit_rate': (np.sign(group['upside']) == np.sign(group['forward_return'])).mean(),
+            'rank_ic': group['upside'].rank().corr(group['forward_return'].rank()) if len(group) > 1 else np.nan,
+            'undervalued_return': group.loc[undervalued, 'forward_return'].mean(),
+            'overvalued_return': group.loc[~undervalued, 'forward_return'].mean(),
+        }
+
+    summary = {'all': measure(results)}
+    summary.update({str(year): measure(group) for year, group in results.groupby('fiscal_year')})
+    return pd.DataFrame.from_dict(summary, orient='index')
+
+
+def run(tickers, years, prices, writer, model_name=DEFAULT_MODEL, forecast_years=5, horizon=DEFAULT_HORIZON,
+        publication_lag=DEFAULT_PUBLICATION_LAG, workers=None):
+    """
+    Backtests every (ticker, fiscal year) pair in a process pool and writes each row as it completes.
+    The price matrix is sent to each worker once.
+
+    :param writer: A csv.DictWriter, or None.
+    :return: The result rows.
+    """
+    workers = workers or os.cpu_count() or 1
+    tickers, years = list(tickers), list(years)
+    # Keep the years of a ticker in one worker, unless there are too few tickers to keep every worker busy
+    chunksize = len(years) if len(tickers) >= workers else 1
+    tasks = [(ticker, year) for ticker in tickers for year in years]
+
+    rows = []
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(prices, workers)) as executor:
+        results = executor.map(functools.partial(_backtest_task, model_name=model_name, forecast_years=forecast_years,
+                                                 horizon=horizon, publication_lag=publication_lag),
+                               tasks, chunksize=chunksize)
+        for row in results:
+            rows.append(row)
+            if writer is not None:
+                writer.writerow(row)
+            if row['status'] == 'error':
+                print(f"[ERROR] {row['ticker']} {row['fiscal_year']}: {row['error']}")
+    return rows
+
+
+def _backtest_task(task, **kwargs):
+    ticker, year = task
+    return backtest_year(ticker, year, **kwargs)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('tickers_file', help='File with one ticker per line')
+    parser.add_argument('--model', choices=sorted(MODELS), default=DEFAULT_MODEL)
+    parser.add_argument('--forecast-years', type=int, default=5)
+    parser.add_argument('--years', type=int, nargs='+', default=None,
+                        help=f'Fiscal years to test (default: the last {DEFAULT_YEARS} full calendar years)')
+    parser.add_argument('--horizon', type=int, default=DEFAULT_HORIZON, help='Years until the forward price')
+    parser.add_argument('--lag-days', type=int, default=DEFAULT_PUBLICATION_LAG.days,
+                        help='Days between a fiscal year end and the publication of its statements')
+    parser.add_argument('--output', default=None, help='CSV file for the result rows')
+    parser.add_argument('--workers', type=int, default=None, help='Worker processes (default: CPU count)')
+    parser.add_argument('--offline', action='store_true', help='Only use cached data, never download')
+    args = parser.parse_args()
+
+    if args.offline:
+        os.environ['DCF_OFFLINE'] = '1'  # Read by the default cache of this and every worker process
+    tickers = read_tickers(args.tickers_file)
+    years = args.years or list(range(date.today().year - DEFAULT_YEARS, date.today().year))
+
+    start = time.perf_counter()
+    prices = PriceMatrix.load(tickers + [market_data.RISK_FREE_TICKER, MARKET_INDEX])
+    for ticker, error in prices.missing.items():
+        print(f"[ERROR] No price history for {ticker}: {error}")
+    print(f"Price matrix: {len(prices.dates)} days x {len(prices.tickers)} tickers "
+          f"({prices.closes.nbytes / 1e6:.1f} MB) in {time.perf_counter() - start:.1f}s")
+
+    output = open(args.output, 'w', newline='') if args.output else None
+    try:
+        writer = None
+        if output is not None:
+            writer = csv.DictWriter(output, fieldnames=FIELDS)
+            writer.writeheader()
+        rows = run(tickers, years, prices, writer, args.model, args.forecast_years, args.horizon,
+                   pd.Timedelta(days=args.lag_days), args.workers)
+    finally:
+        if output is not None:
+            output.close()
+
+    counts = pd.Series([row['status'] for row in rows]).value_counts().to_dict()
+    print(f"Backtested {len(tickers)} tickers x {len(years)} years in {time.perf_counter() - start:.1f}s: {counts}")
+    print(summarize(rows).to_string(float_format=lambda value: f"{value:.3f}"))
+
+
+if __name__ == '__main__':
+    main()
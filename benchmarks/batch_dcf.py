@@ -0,0 +1,102 @@
+"""
+Benchmarks the vectorized BatchDCF engine against calling the scalar DCF models in a loop,
+and checks that both produce the same numbers.
+
+Usage:
+    python -m benchmarks.batch_dcf --companies 50 --scenarios 20
+"""
+import argparse
+import contextlib
+import io
+import os
+import tempfile
+import time
+import numpy as np
+from benchmarks.synthetic import synthetic_cache
+from company import Company
+from dcf_models.batch import BatchDCF
+from dcf_models.fcf import FreeCashFlowDCF
+from dcf_models.nopat import NopatDCF
+from dcf_models.operations import CashFlowOperationsDCF
+
+MODELS = [CashFlowOperationsDCF, NopatDCF, FreeCashFlowDCF]
+
+
+def scenarios(count, seed=0):
+    rng = np.random.default_rng(seed)
+    return {
+        'growth_rate': rng.uniform(0.0, 0.15, count),
+        'discount_rate': rng.uniform(0.07, 0.12, count),
+        'terminal_growth_rate': rng.uniform(0.01, 0.03, count),
+        'forecast_years': rng.integers(3, 11, count),
+    }
+
+
+def run_scalar(models, model_cls, scenario):
+    prices = np.empty((len(models), len(scenario['discount_rate'])))
+    for i, model in enumerate(models):
+        for j in range(prices.shape[1]):
+            model.forecast_years = int(scenario['forecast_years'][j])
+            model.terminal_growth_rate = scenario['terminal_growth_rate'][j]
+            model.calculate_dcf(
+                discount_rate=scenario['discount_rate'][j],
+                overrides={model_cls.growth_driver: scenario['growth_rate'][j]},
+            )
+            model.calculate_equity_value()
+            prices[i, j] = model.calculate_intrinsic_share_price()
+    return prices
+
+
+def run_batch(batch, model_cls, scenario):
+    return batch.run(
+        discount_rate=scenario['discount_rate'],
+        forecast_years=scenario['forecast_years'],
+        terminal_growth_rate=scenario['terminal_growth_rate'],
+        overrides={model_cls.growth_driver: scenario['growth_rate']},
+    ).intrinsic_share_price
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--companies', type=int, default=50)
+    parser.add_argument('--scenarios', type=int, default=20)
+    args = parser.parse_args()
+
+    tickers = [f'SYN{i:04d}' for i in range(args.companies)]
+    scenario = scenarios(args.scenarios)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = synthetic_cache(os.path.join(tmp, 'cache.sqlite'), tickers)
+        companies = [Company(ticker, cache=cache) for ticker in tickers]
+
+        print(f"{args.companies} companies x {args.scenarios} assumption sets")
+        for model_cls in MODELS:
+            # The scalar models print their WACC inputs; keep the benchmark output readable
+            with contextlib.redirect_stdout(io.StringIO()):
+                models = [model_cls(company, 5) for company in companies]
+
+                start = time.perf_counter()
+                scalar_prices = run_scalar(models, model_cls, scenario)
+                scalar_seconds = time.perf_counter() - start
+
+            # Driver extraction runs once per company; the engine then covers every scenario
+            start = time.perf_counter()
+            batch = BatchDCF.from_models(models)
+            drivers_seconds = time.perf_counter() - start
+
+            start = time.perf_counter()
+            batch_prices = run_batch(batch, model_cls, scenario)
+            batch_seconds = time.perf_counter() - start
+
+            np.testing.assert_allclose(batch_prices, scalar_prices, rtol=1e-12)
+            print(
+                f"{model_cls.__name__:<24} scalar loop {scalar_seconds * 1e3:9.1f} ms   "
+                f"drivers {drivers_seconds * 1e3:7.1f} ms   batch {batch_seconds * 1e3:7.2f} ms   "
+                f"speedup {scalar_seconds / (drivers_seconds + batch_seconds):6.1f}x "
+                f"(engine only {scalar_seconds / batch_seconds:8.0f}x)   "
+                f"max rel diff {np.max(np.abs(batch_prices / scalar_prices - 1)):.1e}"
+            )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+"""
+Tunes the fetch scheduler against a simulated upstream that throttles like Yahoo Finance: calls
+take a fixed latency, and calls above the upstream's own token bucket fail with a rate limit
+error. For each scheduler rate the same bulk workload is run and the sustained throughput,
+throttled (and retried) responses and p50/p99 call latency are reported, showing the rate that
+completes the most calls without being throttled.
+
+Usage:
+    python -m benchmarks.fetch_throughput --upstream-rate 10 --rates 5 8 10 12 16 24 --calls 200
+"""
+import argparse
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from fetch import FetchScheduler, UpstreamError
+
+
+class YFRateLimitError(Exception):
+    """Named like yfinance's rate limit error, which the scheduler recognises."""
+
+
+class ThrottlingUpstream:
+    """Serves calls after `latency` seconds, failing those above `rate` calls per second."""
+
+    def __init__(self, rate, burst, latency):
+        self.rate = rate
+        self.burst = burst
+        self.latency = latency
+        self.throttled = 0
+        self._tokens = float(burst)
+        self._refilled = time.monotonic()
+        self._lock = threading.Lock()
+
+    def call(self):
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._refilled) * self.rate)
+            self._refilled = now
+            allowed = self._tokens >= 1
+            if allowed:
+                self._tokens -= 1
+            else:
+                self.throttled += 1
+        time.sleep(self.latency)
+        if not allowed:
+            raise YFRateLimitError('Too Many Requests. Rate limited. Try after a while.')
+
+
+def run(upstream, scheduler, calls, clients):
+    latencies, failed = [], 0
+
+    def one(_):
+        start = time.perf_counter()
+        try:
+            scheduler.call(upstream.call, 'bench', 'TICKER')
+            return time.perf_counter() - start, False
+        except UpstreamError:
+            return time.perf_counter() - start, True
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as executor:
+        for latency, error in executor.map(one, range(calls)):
+            latencies.append(latency)
+            failed += error
+    return latencies, failed, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--upstream-rate', type=float, default=10, help='Calls per second the upstream accepts')
+    parser.add_argument('--upstream-burst', type=int, default=10)
+    parser.add_argument('--latency', type=float, default=0.05, help='Seconds per upstream call')
+    parser.add_argument('--rates', type=float, nargs='+', default=[5, 8, 10, 12, 16, 24],
+                        help='Scheduler rates to try (0 for no limit)')
+    parser.add_argument('--concurrency', type=int, default=8, help='Scheduler concurrency cap')
+    parser.add_argument('--calls', type=int, default=200)
+    parser.add_argument('--clients', type=int, default=32, help='Threads issuing calls')
+    args = parser.parse_args()
+
+    print(f"upstream: {args.upstream_rate:g} calls/s (burst {args.upstream_burst}), "
+          f"{args.latency * 1000:.0f} ms per call; {args.calls} calls from {args.clients} threads")
+    print(f"{'rate':>6}{'calls/s':>10}{'throttled':>11}{'failed':>8}{'p50':>10}{'p99':>10}")
+    for rate in args.rates:
+        upstream = ThrottlingUpstream(args.upstream_rate, args.upstream_burst, args.latency)
+        scheduler = FetchScheduler(rate=rate, burst=args.upstream_burst, max_concurrency=args.concurrency,
+                                   backoff=0.25, max_retries=6)
+        latencies, failed, seconds = run(upstream, scheduler, args.calls, args.clients)
+        print(f"{f'{rate:g}' if rate else 'none':>6}{(args.calls - failed) / seconds:>10.1f}{upstream.throttled:>11}{failed:>8}"
+              f"{np.median(latencies) * 1000:>7.0f} ms{np.percentile(latencies, 99) * 1000:>7.0f} ms")
+
+
+if __name__ == '__main__':
+    main()
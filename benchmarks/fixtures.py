@@ -0,0 +1,122 @@
+"""
+Recorded upstream responses for offline benchmarks: `info`, the three statements and the
+^TNX/^GSPC price histories, stored as one pickle file per ticker.
+
+Usage:
+    python -m benchmarks.fixtures record AAPL MSFT GOOG   # record live Yahoo Finance data
+    python -m benchmarks.fixtures synthesize              # deterministic synthetic stand-ins
+"""
+import argparse
+import glob
+import os
+import pickle
+from contextlib import contextmanager
+import numpy as np
+import pandas as pd
+import fetch
+import market_data
+from benchmarks.synthetic import synthetic_company
+from company import DATASET_ATTRIBUTES
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+MARKET_TICKERS = [market_data.RISK_FREE_TICKER, '^GSPC']
+SYNTHETIC_TICKERS = ['SYNA', 'SYNB', 'SYNC', 'SYND', 'SYNE']
+
+
+def fixture_path(ticker, directory=FIXTURES_DIR):
+    return os.path.join(directory, ticker.replace('^', '_') + '.pkl')
+
+
+def save_fixture(ticker, responses, directory=FIXTURES_DIR):
+    os.makedirs(directory, exist_ok=True)
+    with open(fixture_path(ticker, directory), 'wb') as f:
+        pickle.dump({'ticker': ticker, 'responses': responses}, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def load_fixtures(directory=FIXTURES_DIR):
+    """
+    Returns {ticker: {call kind: response}}, where call kinds are Ticker attribute names
+    (`info`, `cashflow`, ...) and `history`.
+    """
+    fixtures = {}
+    for path in sorted(glob.glob(os.path.join(directory, '*.pkl'))):
+        with open(path, 'rb') as f:
+            fixture = pickle.load(f)
+        fixtures[fixture['ticker']] = fixture['responses']
+    return fixtures
+
+
+def company_tickers(fixtures):
+    return [ticker for ticker in fixtures if ticker not in MARKET_TICKERS]
+
+
+def record(tickers, directory=FIXTURES_DIR):
+    """Records live responses for `tickers` and the market indices."""
+    for ticker in tickers:
+        responses = {attribute: fetch.fetch_ticker_attribute(ticker, attribute) for attribute in DATASET_ATTRIBUTES.values()}
+        save_fixture(ticker, responses, directory)
+    save_fixture(market_data.RISK_FREE_TICKER, {'history': fetch.fetch_history(market_data.RISK_FREE_TICKER, '3mo')}, directory)
+    save_fixture('^GSPC', {'history': fetch.fetch_history('^GSPC', 'max')}, directory)
+
+
+def synthesize(directory=FIXTURES_DIR, tickers=SYNTHETIC_TICKERS, seed=0):
+    """Writes deterministic synthetic fixtures with the same shape as recorded ones."""
+    for i, ticker in enumerate(tickers):
+        info, statements = synthetic_company(ticker, seed + i)
+        responses = {DATASET_ATTRIBUTES['info']: info}
+        responses.update({DATASET_ATTRIBUTES[statement]: df for statement, df in statements.items()})
+        save_fixture(ticker, responses, directory)
+
+    rng = np.random.default_rng(seed)
+    # Roughly the length of the real ^GSPC "max" history
+    index = pd.bdate_range('1927-12-30', '2024-12-31', tz='America/New_York')
+    close = 17.66 * np.cumprod(1 + rng.normal(0.0003, 0.011, len(index)))
+    save_fixture('^GSPC', {'history': pd.DataFrame({'Close': close}, index=index)}, directory)
+    tnx_index = pd.bdate_range(end='2024-12-31', periods=63, tz='America/New_York')
+    save_fixture(market_data.RISK_FREE_TICKER, {'history': pd.DataFrame({'Close': np.full(63, 4.2)}, index=tnx_index)}, directory)
+
+
+@contextmanager
+def replay(fixtures):
+    """
+    Serves upstream calls from recorded fixtures instead of Yahoo Finance. Calls are still
+    counted by fetch.count_upstream_calls(); unknown tickers fail like an empty response would.
+    """
+    original = fetch.fetch_ticker_attribute, fetch.fetch_history
+
+    def fetch_ticker_attribute(ticker, attribute):
+        fetch._record(attribute)
+        try:
+            return fixtures[ticker.upper()][attribute]
+        except KeyError:
+            raise KeyError(f"No recorded '{attribute}' fixture for '{ticker}'")
+
+    def fetch_history(ticker, period):
+        fetch._record(f'history:{period}')
+        return fixtures[ticker.upper()]['history'].copy()
+
+    fetch.fetch_ticker_attribute, fetch.fetch_history = fetch_ticker_attribute, fetch_history
+    try:
+        yield
+    finally:
+        fetch.fetch_ticker_attribute, fetch.fetch_history = original
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('command', choices=['record', 'synthesize'])
+    parser.add_argument('tickers', nargs='*')
+    parser.add_argument('--directory', default=FIXTURES_DIR)
+    args = parser.parse_args()
+
+    if args.command == 'record':
+        if not args.tickers:
+            parser.error('record needs at least one ticker')
+        record([ticker.upper() for ticker in args.tickers], args.directory)
+    else:
+        synthesize(args.directory)
+    print(f"Fixtures written to {args.directory}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+"""
+Measures what it costs a fresh process to load the valuation core versus the data layer and the
+full web app: import time, peak RSS and which heavy dependencies end up loaded. Each target is
+imported in a new interpreter, and the "core valuation" target also values a company from plain
+numbers, as a pool worker would.
+
+Usage:
+    python -m benchmarks.import_cost --repeat 5
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+HEAVY_MODULES = ['pandas', 'yfinance', 'flask', 'plotly']
+
+CORE_VALUATION = """
+from dcf_models.core import CompanyData
+from dcf_models.nopat import NopatDCF
+from keys import FinKeys as K, FinStatement as S
+from statements import StatementStore
+store = StatementStore.from_dict({
+    S.INCOME.value: {K.REVENUE.value: [120e9, 110e9, 100e9, 95e9], K.OPERATING_INCOME.value: [30e9, 27e9, 24e9, 22e9],
+                     K.TAX_PROVISION.value: [5e9, 4.6e9, 4e9, 3.8e9], K.PRETAX_INCOME.value: [28e9, 25e9, 22e9, 20e9]},
+    S.CASHFLOW.value: {K.CAPEX.value: [-8e9, -7.5e9, -7e9, -6e9], K.CHANGE_IN_WORKING_CAPITAL.value: [1e9, 0.8e9, 1.2e9, 0.5e9],
+                       K.DEPRECIATION.value: [5e9, 4.8e9, 4.5e9, 4e9]},
+    S.BALANCE_SHEET.value: {K.CASH.value: [20e9, 18e9, 15e9, 14e9], K.DEBT.value: [30e9, 31e9, 29e9, 28e9]},
+}, ['2024-12-31', '2023-12-31', '2022-12-31', '2021-12-31'])
+model = NopatDCF(CompanyData('CORE', store, shares_outstanding=1e9), 5)
+model.calculate_dcf(discount_rate=0.09)
+model.calculate_equity_value()
+model.calculate_intrinsic_share_price()
+"""
+
+TARGETS = {
+    'interpreter': '',
+    'valuation core (import)': 'import dcf_models.core, modeling, wacc, dcf_models.nopat, dcf_models.operations, dcf_models.fcf',
+    'valuation core (value a company)': CORE_VALUATION,
+    'data layer (company)': 'import company',
+    'valuation module': 'import valuation',
+    'full app': 'import app; app.create_app()',
+}
+
+PROBE = """
+import json, resource, sys, time
+start = time.perf_counter()
+exec(compile({code!r}, '<target>', 'exec'))
+elapsed = time.perf_counter() - start
+print(json.dumps({{
+    'seconds': elapsed,
+    'rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    'loaded': [name for name in {heavy!r} if name in sys.modules],
+}}))
+"""
+
+
+def measure(code, repeat):
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    runs = []
+    for _ in range(repeat):
+        output = subprocess.run([sys.executable, '-c', PROBE.format(code=code, heavy=HEAVY_MODULES)], cwd=root,
+                                capture_output=True, text=True, check=True).stdout
+        runs.append(json.loads(output.strip().splitlines()[-1]))
+    return {
+        'seconds': statistics.median(run['seconds'] for run in runs),
+        'rss_mb': statistics.median(run['rss_kb'] for run in runs) / 1024,
+        'loaded': runs[-1]['loaded'],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'target':<36}{'import':>12}{'peak RSS':>12}  heavy modules loaded")
+    for name, code in TARGETS.items():
+        result = measure(code, args.repeat)
+        print(f"{name:<36}{result['seconds'] * 1000:>9.0f} ms{result['rss_mb']:>9.0f} MB  "
+              f"{', '.join(result['loaded']) or '-'}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,134 @@
+"""
+Load test of the web app against a local stub data source, with and without request coalescing.
+
+The app is served by a threaded WSGI server in this process, like one worker of a multi-worker
+deployment. The stub provider serves synthetic companies after a fixed delay per call, standing
+in for Yahoo Finance. Requests come in bursts: `--concurrency` clients open the same cold ticker
+at once, one ticker after another, so every burst either shares one download and computation
+(coalescing on) or repeats it in every request (off).
+
+Usage:
+    python -m benchmarks.load_test --tickers 20 --concurrency 16 --latency 0.1
+    python -m benchmarks.load_test --endpoint api
+    python -m benchmarks.load_test --endpoint stream
+"""
+import argparse
+import contextlib
+import io
+import logging
+import os
+import statistics
+import tempfile
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import pandas as pd
+from benchmarks.synthetic import synthetic_company
+from cache import INFO
+from providers import DataProvider, set_default_provider
+
+ENDPOINTS = {
+    'page': '/?ticker={ticker}&forecast_years=5',
+    'stream': '/?ticker={ticker}&forecast_years=5&stream=1',
+    'api': '/api/valuation?ticker={ticker}&forecast_years=5',
+}
+
+
+class StubProvider(DataProvider):
+    """Synthetic data returned after `latency` seconds per call, counting the calls."""
+    name = 'stub'
+
+    def __init__(self, latency):
+        self.latency = latency
+        self.calls = 0
+        self.dates = pd.bdate_range('2000-01-01', '2024-12-31')
+        self._lock = threading.Lock()
+
+    def _call(self):
+        with self._lock:
+            self.calls += 1
+        time.sleep(self.latency)
+
+    def dataset(self, ticker, dataset):
+        self._call()
+        info, statements = synthetic_company(ticker, sum(map(ord, ticker)))
+        return info if dataset == INFO else statements[dataset]
+
+    def history(self, ticker, period):
+        self._call()
+        closes = 100 * np.cumprod(1 + np.random.default_rng(0).normal(0.0003, 0.01, len(self.dates)))
+        if ticker == '^TNX':
+            closes = np.full(len(self.dates), 4.2)
+        return pd.DataFrame({'Close': closes}, index=self.dates)
+
+
+def run(base_url, endpoint, tickers, concurrency):
+    """Fires `concurrency` simultaneous requests per ticker; returns (latencies, errors, seconds)."""
+    def get(ticker):
+        start = time.perf_counter()
+        try:
+            with urllib.request.urlopen(base_url + ENDPOINTS[endpoint].format(ticker=ticker)) as response:
+                response.read()
+            return time.perf_counter() - start, None
+        except Exception as e:
+            return time.perf_counter() - start, e
+
+    latencies, errors = [], 0
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for ticker in tickers:
+            for latency, error in executor.map(get, [ticker] * concurrency):
+                latencies.append(latency)
+                errors += error is not None
+    return latencies, errors, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--tickers', type=int, default=20, help='Cold tickers requested, one burst each')
+    parser.add_argument('--concurrency', type=int, default=16, help='Simultaneous requests per ticker')
+    parser.add_argument('--latency', type=float, default=0.1, help='Seconds per stub upstream call')
+    parser.add_argument('--endpoint', choices=sorted(ENDPOINTS), default='page')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ['DCF_CACHE_PATH'] = os.path.join(tmp, 'cache.sqlite')
+        provider = StubProvider(args.latency)
+        set_default_provider(provider)
+
+        # Imported after the environment is set so the app uses the temporary cache
+        from werkzeug.serving import make_server
+        import app as webapp
+
+        logging.getLogger('werkzeug').setLevel(logging.ERROR)  # No access log lines
+        server = make_server('127.0.0.1', 0, webapp.create_app(), threaded=True)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        base_url = f'http://127.0.0.1:{server.server_port}'
+
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                run(base_url, args.endpoint, ['WARMUP'], 1)  # Market inputs and first-use imports
+
+                results = {}
+                for coalescing in (True, False):
+                    webapp.company_flight.enabled = webapp.result_flight.enabled = webapp.stream_flight.enabled = coalescing
+                    tickers = [f"{'C' if coalescing else 'N'}{i:04d}" for i in range(args.tickers)]
+                    calls = provider.calls
+                    latencies, errors, seconds = run(base_url, args.endpoint, tickers, args.concurrency)
+                    results[coalescing] = (latencies, errors, seconds, provider.calls - calls)
+        finally:
+            server.shutdown()
+
+    print(f"{args.tickers} cold tickers x {args.concurrency} concurrent requests to '{args.endpoint}', "
+          f"{args.latency * 1000:.0f} ms per upstream call")
+    print(f"{'coalescing':<12}{'req/s':>10}{'p50':>12}{'p99':>12}{'upstream':>10}{'errors':>8}")
+    for coalescing, (latencies, errors, seconds, calls) in results.items():
+        p99 = np.percentile(latencies, 99)
+        print(f"{'on' if coalescing else 'off':<12}{len(latencies) / seconds:>10.1f}"
+              f"{statistics.median(latencies) * 1000:>9.0f} ms{p99 * 1000:>9.0f} ms{calls:>10}{errors:>8}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,140 @@
+"""
+Loads companies from a bulk local dataset (providers.LocalProvider) and from an offline data cache
+holding the same synthetic data, and reports the time per company and the memory the dataset adds.
+Synthetic `info` dictionaries carry the ~130 fields of a real yfinance one, so the dataset and the
+memory figures are of realistic size.
+
+Usage:
+    python -m benchmarks.local_provider --tickers 2000 --sample 200
+"""
+import argparse
+import os
+import random
+import resource
+import statistics
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from benchmarks.synthetic import synthetic_cache, synthetic_company
+from company import Company
+from providers import DataProvider, LocalProvider, write_local_dataset
+from cache import INFO
+
+
+# Fields of a yfinance `info` dictionary besides those synthetic_company() fills in
+INFO_NUMBER_FIELDS = (
+    'fullTimeEmployees', 'auditRisk', 'boardRisk', 'compensationRisk', 'shareHolderRightsRisk', 'overallRisk',
+    'governanceEpochDate', 'compensationAsOfEpochDate', 'maxAge', 'priceHint', 'previousClose', 'open', 'dayLow',
+    'dayHigh', 'regularMarketPreviousClose', 'regularMarketOpen', 'regularMarketDayLow', 'regularMarketDayHigh',
+    'dividendRate', 'dividendYield', 'exDividendDate', 'payoutRatio', 'fiveYearAvgDividendYield', 'trailingPE',
+    'forwardPE', 'volume', 'regularMarketVolume', 'averageVolume', 'averageVolume10days', 'averageDailyVolume10Day',
+    'bid', 'ask', 'bidSize', 'askSize', 'fiftyTwoWeekLow', 'fiftyTwoWeekHigh', 'priceToSalesTrailing12Months',
+    'fiftyDayAverage', 'twoHundredDayAverage', 'trailingAnnualDividendRate', 'trailingAnnualDividendYield',
+    'floatShares', 'sharesShort', 'sharesShortPriorMonth', 'sharesShortPreviousMonthDate', 'dateShortInterest',
+    'sharesPercentSharesOut', 'heldPercentInsiders', 'heldPercentInstitutions', 'shortRatio', 'shortPercentOfFloat',
+    'impliedSharesOutstanding', 'bookValue', 'priceToBook', 'lastFiscalYearEnd', 'nextFiscalYearEnd',
+    'mostRecentQuarter', 'earningsQuarterlyGrowth', 'netIncomeToCommon', 'trailingEps', 'forwardEps', 'pegRatio',
+    'lastSplitDate', 'enterpriseToRevenue', 'enterpriseToEbitda', '52WeekChange', 'SandP52WeekChange',
+    'lastDividendValue', 'lastDividendDate', 'firstTradeDateEpochUtc', 'gmtOffSetMilliseconds', 'currentPrice',
+    'targetHighPrice', 'targetLowPrice', 'targetMeanPrice', 'targetMedianPrice', 'recommendationMean',
+    'numberOfAnalystOpinions', 'totalCash', 'totalCashPerShare', 'ebitda', 'totalDebt', 'quickRatio', 'currentRatio',
+    'totalRevenue', 'debtToEquity', 'revenuePerShare', 'returnOnAssets', 'returnOnEquity', 'freeCashflow',
+    'operatingCashflow', 'earningsGrowth', 'revenueGrowth', 'grossMargins', 'ebitdaMargins', 'operatingMargins',
+    'trailingPegRatio',
+)
+INFO_TEXT_FIELDS = (
+    'address1', 'city', 'state', 'zip', 'country', 'phone', 'website', 'industryKey', 'industryDisp', 'sectorKey',
+    'sectorDisp', 'irWebsite', 'currency', 'lastSplitFactor', 'exchange', 'quoteType', 'symbol', 'underlyingSymbol',
+    'shortName', 'timeZoneFullName', 'timeZoneShortName', 'uuid', 'messageBoardId', 'recommendationKey',
+    'financialCurrency',
+)
+
+
+def realistic_info(ticker, info, seed):
+    """Pads a synthetic `info` dictionary with the other fields, and values of the sizes, yfinance returns."""
+    rng = np.random.default_rng(seed)
+    info = dict(info)
+    info.update(zip(INFO_NUMBER_FIELDS, rng.uniform(0, 1e6, len(INFO_NUMBER_FIELDS)).tolist()))
+    info.update((field, f'{field} of {ticker} {rng.integers(1e9):x}') for field in INFO_TEXT_FIELDS)
+    info['longBusinessSummary'] = ' '.join(f'{ticker} designs and sells products {i}.' for i in range(40))
+    info['companyOfficers'] = [{'name': f'Officer {i}', 'title': 'Vice President', 'age': 50 + i, 'totalPay': 1e6}
+                               for i in range(10)]
+    return info
+
+
+class SyntheticProvider(DataProvider):
+    """Serves benchmarks.synthetic companies and random-walk price histories."""
+    name = 'synthetic'
+
+    def __init__(self, tickers, seed=0):
+        self.seeds = {ticker: seed + i for i, ticker in enumerate(tickers)}
+        self.dates = pd.bdate_range('2010-01-01', '2024-12-31')
+        self._last = (None, None)  # The datasets of a ticker are read one after another
+
+    def dataset(self, ticker, dataset):
+        if self._last[0] != ticker:
+            self._last = (ticker, synthetic_company(ticker, self.seeds[ticker]))
+        info, statements = self._last[1]
+        return realistic_info(ticker, info, self.seeds[ticker]) if dataset == INFO else statements[dataset]
+
+    def history(self, ticker, period):
+        rng = np.random.default_rng(self.seeds.get(ticker, 0))
+        closes = 100 * np.cumprod(1 + rng.normal(0.0003, 0.01, len(self.dates)))
+        return pd.DataFrame({'Close': closes}, index=self.dates)
+
+
+def time_loads(tickers, **kwargs):
+    durations = []
+    for ticker in tickers:
+        start = time.perf_counter()
+        Company(ticker, prefetch_market_data=False, **kwargs)
+        durations.append(time.perf_counter() - start)
+    return durations
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--tickers', type=int, default=2000, help='Companies in the dataset')
+    parser.add_argument('--sample', type=int, default=200, help='Companies loaded from each source')
+    args = parser.parse_args()
+
+    tickers = [f'T{i:05d}' for i in range(args.tickers)]
+    sample = random.Random(0).sample(tickers, min(args.sample, len(tickers)))
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'bulk')
+        start = time.perf_counter()
+        # Written in another process, so the peak RSS below only measures reading
+        with ProcessPoolExecutor(max_workers=1) as executor:
+            executor.submit(write_local_dataset, path, tickers, SyntheticProvider(tickers), history_tickers=tickers).result()
+        size = sum(os.path.getsize(os.path.join(path, name)) for name in os.listdir(path))
+        print(f"wrote {len(tickers)} tickers ({size / 1e6:.1f} MB) in {time.perf_counter() - start:.1f}s")
+
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        start = time.perf_counter()
+        provider = LocalProvider(path)
+        print(f"opened local dataset in {(time.perf_counter() - start) * 1000:.1f} ms")
+        local = time_loads(sample, provider=provider)
+        print(f"peak RSS grew {(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - rss) / 1024:.1f} MB "
+              f"after loading {len(sample)} companies")
+        for ticker in sample:
+            provider.history(ticker, 'max')
+        print(f"peak RSS grew {(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - rss) / 1024:.1f} MB "
+              f"after loading their price histories too")
+
+        # The cache only holds the sample: its lookups do not depend on how many tickers it holds
+        cache = synthetic_cache(os.path.join(directory, 'cache.sqlite'), sample)
+        source = SyntheticProvider(tickers)
+        for ticker in sample:
+            cache.set(ticker, INFO, source.dataset(ticker, INFO))
+        cached = time_loads(sample, cache=cache)
+
+    print(f"{'source':<16}{'median':>12}{'p95':>12}")
+    for name, durations in (('local dataset', local), ('offline cache', cached)):
+        p95 = statistics.quantiles(durations, n=20)[-1] if len(durations) > 1 else durations[0]
+        print(f"{name:<16}{statistics.median(durations) * 1000:>9.2f} ms{p95 * 1000:>9.2f} ms")
+
+
+if __name__ == '__main__':
+    main()
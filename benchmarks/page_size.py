@@ -0,0 +1,75 @@
+"""
+Measures result page size and plot rendering time with Plotly inlined in every figure
+(the previous `pio.to_html(fig, full_html=False)` output) versus compact figure JSON plus
+one cached static Plotly bundle.
+
+Usage:
+    python -m benchmarks.page_size --repeat 5
+"""
+import argparse
+import contextlib
+import io
+import os
+import tempfile
+import time
+import plotly.io as pio
+from benchmarks.synthetic import synthetic_cache
+from company import Company
+from dcf_models.operations import CashFlowOperationsDCF
+from plotter import Plotter
+
+FIGURES = ['dcf_figure', 'financial_metrics_figure', 'sensitivity_figure']
+
+
+def time_call(function, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        best = min(best, time.perf_counter() - start)
+    return result, best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ['DCF_CACHE_PATH'] = os.path.join(tmp, 'cache.sqlite')
+        os.environ['DCF_OFFLINE'] = '1'
+        cache = synthetic_cache(os.environ['DCF_CACHE_PATH'], ['BENCH'])
+
+        # Imported after the environment is set so the app uses the synthetic offline cache
+        from app import create_app
+        app = create_app()
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            model = CashFlowOperationsDCF(Company('BENCH', cache=cache), 5)
+            model.calculate_dcf()
+            plotter = Plotter(model.dcf_table, model.company, model.calculate_sensitivity_grid())
+        figures = [getattr(plotter, name)() for name in FIGURES]
+
+        inline, inline_seconds = time_call(lambda: [pio.to_html(fig, full_html=False) for fig in figures], args.repeat)
+        compact, compact_seconds = time_call(lambda: [Plotter.to_json(fig) for fig in figures], args.repeat)
+
+        client = app.test_client()
+        with contextlib.redirect_stdout(io.StringIO()):
+            response, page_seconds = time_call(
+                lambda: client.post('/', data={'ticker': 'BENCH', 'forecast_years': '5'}), args.repeat
+            )
+        page_bytes = len(response.data)
+        inline_bytes = sum(map(len, inline))
+        compact_bytes = sum(map(len, compact))
+        plotly_js_bytes = len(client.get('/assets/plotly.min.js').data)
+
+    print(f"{'':<34}{'inline Plotly':>16}{'JSON + static JS':>18}")
+    print(f"{'plot output (3 figures)':<34}{inline_bytes / 1e3:>13.1f} kB{compact_bytes / 1e3:>15.1f} kB")
+    print(f"{'plot render time (3 figures)':<34}{inline_seconds * 1e3:>13.1f} ms{compact_seconds * 1e3:>15.1f} ms")
+    print(f"{'result page response':<34}{(page_bytes - compact_bytes + inline_bytes) / 1e3:>13.1f} kB{page_bytes / 1e3:>15.1f} kB")
+    print(f"{'full request time (current code)':<34}{'':>16}{page_seconds * 1e3:>15.1f} ms")
+    print(f"plotly.min.js served once and cached by the browser: {plotly_js_bytes / 1e3:.1f} kB")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,262 @@
+"""
+Offline benchmark suite for every stage of the valuation pipeline, driven by recorded fixtures.
+
+Each stage is timed separately and reported with its throughput and peak traced memory, then
+compared against benchmarks/baseline.json. Timings are compared relative to a fixed calibration
+workload timed alongside every stage, so a baseline measured on one machine can be checked on
+another: a uniformly slower machine slows the calibration too. A stage slower than its baseline by
+more than the tolerance fails the run with exit status 1.
+
+Usage:
+    python -m benchmarks.suite                       # run and compare against the baseline
+    python -m benchmarks.suite --update-baseline     # store the current timings as the baseline
+    python -m benchmarks.suite --tolerance 0.5 --repeat 20
+
+Fixtures are read from benchmarks/fixtures, which is not under version control (recorded Yahoo
+Finance data is not redistributed). When none exist, deterministic synthetic ones (SYNA...SYNE) are
+generated, and the committed baseline is measured on those: out of the box the suite tracks the
+speed of the pipeline on synthetic data of realistic shape, not on real companies. Record real ones
+with `python -m benchmarks.fixtures record AAPL MSFT ...` and re-baseline to benchmark those.
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+import numpy as np
+import market_data
+from benchmarks import fixtures as fixture_store
+from cache import DataCache
+from company import Company
+from dcf_models.fcf import FreeCashFlowDCF
+from dcf_models.nopat import NopatDCF
+from dcf_models.operations import CashFlowOperationsDCF
+from keys import FinKeys, FinStatement
+from modeling import ProjectAssumptions
+from plotter import Plotter
+from wacc import WACC
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+MODELS = [CashFlowOperationsDCF, NopatDCF, FreeCashFlowDCF]
+
+
+def reset_market_data(cache):
+    """Forgets the shared market inputs so the next WACC recomputes them from the histories."""
+    market_data._memo.clear()
+    for ticker, dataset in [(market_data.RISK_FREE_TICKER, market_data.RISK_FREE_RATE), ('^GSPC', market_data.MARKET_RETURN)]:
+        cache.invalidate(ticker, dataset)
+
+
+def build_stages(tickers, cache_dir):
+    """
+    Returns (name, setup, operation) triples. `setup` runs untimed before every timed call
+    and returns the first argument for `operation(argument, ticker)`.
+    """
+    warm_cache = DataCache(os.path.join(cache_dir, 'warm.sqlite'))
+    with contextlib.redirect_stdout(io.StringIO()):
+        companies = {ticker: Company(ticker, cache=warm_cache) for ticker in tickers}
+        models = {(cls, ticker): cls(companies[ticker], 5) for cls in MODELS for ticker in tickers}
+        for model in models.values():
+            model.calculate_dcf()
+            model.calculate_equity_value()
+            model.calculate_intrinsic_share_price()
+
+    def all_assumptions(assumptions):
+        return (assumptions.growth_rates(), assumptions.mean(FinStatement.CASHFLOW, FinKeys.CAPEX),
+                assumptions.operating_margin, assumptions.fcf_margin, assumptions.capex_to_revenue,
+                assumptions.effective_tax_rate)
+
+    def cold_cache():
+        path = os.path.join(cache_dir, 'cold.sqlite')
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+        return DataCache(path)
+
+    stages = [
+        ('company (cold cache)', cold_cache, lambda cache, t: Company(t, cache=cache, prefetch_market_data=False)),
+        ('company (warm cache)', lambda: warm_cache, lambda cache, t: Company(t, cache=cache, prefetch_market_data=False)),
+        ('wacc (market inputs recomputed)', lambda: reset_market_data(warm_cache),
+         lambda _, t: WACC(t, company=companies[t]).calculate_wacc()),
+        ('wacc (market inputs shared)', lambda: None, lambda _, t: WACC(t, company=companies[t]).calculate_wacc()),
+        ('growth rate (revenue)', lambda: None,
+         lambda _, t: ProjectAssumptions(companies[t].statements).calculate_growth_rate(FinStatement.INCOME, FinKeys.REVENUE)),
+        ('assumptions (all line items)', lambda: None, lambda _, t: all_assumptions(ProjectAssumptions(companies[t].statements))),
+    ]
+    def forget_assumptions():
+        # Models memoize their drivers and growth rates; start every timed call from scratch
+        for (_, ticker), model in models.items():
+            model._base_drivers = None
+            model.assumptions = ProjectAssumptions(companies[ticker].statements)
+
+    for cls in MODELS:
+        stages.append((f'calculate_fcf ({cls.__name__})', forget_assumptions, lambda _, t, cls=cls: models[(cls, t)].calculate_fcf()))
+
+    def render_plots(_, t):
+        model = models[(CashFlowOperationsDCF, t)]
+        plotter = Plotter(model.dcf_table, model.company, model.calculate_sensitivity_grid())
+        return plotter.create_dcf_plot(), plotter.create_financial_metrics_plot(), plotter.create_sensitivity_heatmap()
+
+    stages.append(('plotter (3 figures)', lambda: None, render_plots))
+    return stages
+
+
+def add_index_stage(stages):
+    # Imported here so the app's default cache picks up DCF_CACHE_PATH set by main()
+    from app import create_app, result_cache
+    client = create_app().test_client()
+
+    def request(_, t):
+        response = client.get(f'/?ticker={t}&forecast_years=5')
+        if response.status_code != 200:
+            raise RuntimeError(f"index returned {response.status_code} for {t}")
+
+    stages.append(('index request (uncached)', result_cache.clear, request))
+
+
+def calibration_workload():
+    """
+    A fixed workload mixing interpreted Python and small NumPy array operations, like the pipeline
+    stages. Its timing is the unit stage timings are compared in.
+    """
+    values = np.random.default_rng(0).normal(size=(64, 64))
+
+    def workload():
+        total = 0.0
+        for i in range(20_000):
+            total += (i * 31) % 7
+        for _ in range(200):
+            total += float(np.sum(values @ values[:, :4]))
+        return total
+
+    return workload
+
+
+def measure(stages, tickers, repeat):
+    """
+    Times every stage `repeat` times over all tickers. The calibration workload is timed after
+    every repetition, so each stage is measured together with the speed of the machine at the
+    time it ran, which drifts during a run on shared or throttled hardware.
+    """
+    calibration = calibration_workload()
+    calibration()
+    results = {}
+    for name, setup, operation in stages:
+        timings, calibration_timings = [], []
+        with contextlib.redirect_stdout(io.StringIO()):
+            # Untimed warm-up, so the medians do not depend on the number of repetitions
+            for ticker in tickers:
+                operation(setup(), ticker)
+            for _ in range(repeat):
+                for ticker in tickers:
+                    argument = setup()
+                    start = time.perf_counter()
+                    operation(argument, ticker)
+                    timings.append(time.perf_counter() - start)
+                start = time.perf_counter()
+                calibration()
+                calibration_timings.append(time.perf_counter() - start)
+
+            # Separate pass for memory, since tracing slows the code down
+            peak = 0
+            for ticker in tickers:
+                argument = setup()
+                tracemalloc.start()
+                operation(argument, ticker)
+                peak = max(peak, tracemalloc.get_traced_memory()[1])
+                tracemalloc.stop()
+
+        median = statistics.median(timings)
+        results[name] = {
+            'median_ms': median * 1e3,
+            'mean_ms': statistics.fmean(timings) * 1e3,
+            'throughput_per_s': 1 / median if median else float('inf'),
+            'peak_memory_kb': peak / 1e3,
+            'calibration_ms': statistics.median(calibration_timings) * 1e3,
+        }
+    return results
+
+
+# Slowdowns smaller than this are timer and scheduling noise, whatever their percentage
+NOISE_FLOOR_MS = 0.25
+
+
+def compare(results, baseline, tolerance):
+    """
+    Prints every stage next to its baseline and returns the stages that regressed. The baseline
+    timing of a stage is scaled by the calibration measured alongside it in this run over the one
+    measured alongside it in the baseline run; a baseline without calibrations is compared in
+    milliseconds. A stage only regresses when it is slower by more than `tolerance` and by more
+    than NOISE_FLOOR_MS.
+    """
+    stages = baseline.get('stages', {})
+    print(f"{'stage':<36}{'median':>11}{'ops/s':>10}{'peak mem':>12}{'baseline':>11}{'scale':>7}{'change':>9}")
+    regressions = []
+    for name, result in results.items():
+        reference = stages.get(name)
+        line = (f"{name:<36}{result['median_ms']:>8.2f} ms{result['throughput_per_s']:>10.1f}"
+                f"{result['peak_memory_kb']:>9.0f} kB")
+        if reference:
+            scale = result['calibration_ms'] / reference['calibration_ms'] if reference.get('calibration_ms') else 1.0
+            expected_ms = reference['median_ms'] * scale
+            change = result['median_ms'] / expected_ms - 1
+            line += f"{expected_ms:>8.2f} ms{scale:>7.2f}{change:>+8.0%}"
+            # Sub-millisecond stages swing by more than the tolerance from scheduling alone
+            if change > tolerance and result['median_ms'] - expected_ms > NOISE_FLOOR_MS:
+                regressions.append(name)
+                line += '  SLOWER'
+        print(line)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=10, help='Repetitions of each stage over all tickers')
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help='Allowed slowdown against the baseline median, as a fraction (default 0.25)')
+    parser.add_argument('--baseline', default=BASELINE_PATH)
+    parser.add_argument('--update-baseline', action='store_true')
+    parser.add_argument('--fixtures', default=fixture_store.FIXTURES_DIR)
+    args = parser.parse_args()
+
+    if not fixture_store.load_fixtures(args.fixtures):
+        fixture_store.synthesize(args.fixtures)
+    fixtures = fixture_store.load_fixtures(args.fixtures)
+    tickers = fixture_store.company_tickers(fixtures)
+
+    with tempfile.TemporaryDirectory() as cache_dir, fixture_store.replay(fixtures):
+        os.environ['DCF_CACHE_PATH'] = os.path.join(cache_dir, 'warm.sqlite')
+        stages = build_stages(tickers, cache_dir)
+        add_index_stage(stages)
+        print(f"{len(tickers)} tickers from {args.fixtures}, {args.repeat} repetitions\n")
+        results = measure(stages, tickers, args.repeat)
+
+    if tickers == fixture_store.SYNTHETIC_TICKERS:
+        print("Fixtures are synthetic; record real ones with `python -m benchmarks.fixtures record ...`\n")
+
+    baseline = {}
+    if os.path.exists(args.baseline) and not args.update_baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline.get('tickers') != tickers:
+            print(f"The baseline was measured on other fixtures ({', '.join(baseline.get('tickers', []))}); "
+                  f"re-baseline with --update-baseline\n")
+    regressions = compare(results, baseline, args.tolerance)
+
+    if args.update_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump({'tickers': tickers, 'repeat': args.repeat, 'stages': results},
+                      f, indent=2)
+        print(f"\nBaseline written to {args.baseline}")
+    elif regressions:
+        print(f"\n{len(regressions)} stage(s) slower than the baseline by more than {args.tolerance:.0%}: {', '.join(regressions)}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+"""
+Deterministic synthetic company data laid out like yfinance responses, used to run the
+models offline through an offline DataCache.
+"""
+import numpy as np
+import pandas as pd
+import market_data
+from cache import INFO, DataCache
+from keys import FinKeys, FinStatement
+
+FISCAL_YEARS = pd.to_datetime(['2024-12-31', '2023-12-31', '2022-12-31', '2021-12-31'])
+
+STATEMENT_LINES = {
+    FinStatement.CASHFLOW.value: {
+        FinKeys.CASH_FLOW_OPERATIONS.value: 0.28,
+        FinKeys.CAPEX.value: -0.03,
+        FinKeys.FREE_CASH_FLOW.value: 0.25,
+        FinKeys.DEPRECIATION.value: 0.03,
+        FinKeys.CHANGE_IN_WORKING_CAPITAL.value: 0.01,
+    },
+    FinStatement.BALANCE_SHEET.value: {
+        FinKeys.DEBT.value: 0.25,
+        FinKeys.CASH.value: 0.15,
+    },
+    FinStatement.INCOME.value: {
+        FinKeys.REVENUE.value: 1.0,
+        FinKeys.OPERATING_INCOME.value: 0.30,
+        FinKeys.EBITDA.value: 0.34,
+        FinKeys.EBIT.value: 0.31,
+        FinKeys.PRETAX_INCOME.value: 0.31,
+        FinKeys.TAX_PROVISION.value: 0.05,
+        FinKeys.NET_INCOME.value: 0.26,
+        FinKeys.INTEREST_EXPENSE.value: 0.01,
+    },
+}
+
+
+def synthetic_company(ticker, seed):
+    """
+    Returns (info, statements) for one synthetic company. Statements have line items as rows
+    and fiscal years as columns, most recent first, like yfinance.
+    """
+    rng = np.random.default_rng(seed)
+    revenue = rng.uniform(1e9, 4e11)
+    growth = np.cumprod(1 + rng.normal(0.06, 0.05, len(FISCAL_YEARS)))[::-1]
+
+    statements = {}
+    for statement, lines in STATEMENT_LINES.items():
+        rows = {
+            line: revenue * share * growth * (1 + rng.normal(0, 0.03, len(FISCAL_YEARS)))
+            for line, share in lines.items()
+        }
+        statements[statement] = pd.DataFrame(rows, index=FISCAL_YEARS).T
+
+    market_cap = revenue * rng.uniform(2, 8)
+    info = {
+        'longName': f'{ticker} Corporation',
+        'sector': 'Technology',
+        'industry': 'Software',
+        'marketCap': market_cap,
+        'enterpriseValue': market_cap * 1.05,
+        'beta': rng.uniform(0.7, 1.6),
+        FinKeys.SHARES_OUTSTANDING.value: market_cap / rng.uniform(20, 400),
+    }
+    return info, statements
+
+
+def synthetic_cache(path, tickers, seed=0):
+    """
+    Fills an offline DataCache at `path` with synthetic data for `tickers` and the WACC market inputs.
+    """
+    cache = DataCache(path, offline=True)
+    for i, ticker in enumerate(tickers):
+        info, statements = synthetic_company(ticker, seed + i)
+        cache.set(ticker, INFO, info)
+        for statement, df in statements.items():
+            cache.set(ticker, statement, df)
+    cache.set(market_data.RISK_FREE_TICKER, market_data.RISK_FREE_RATE, 0.042)
+    cache.set('^GSPC', market_data.MARKET_RETURN, 0.095)
+    return cache
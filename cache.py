@@ -0,0 +1,135 @@
+import os
+import pickle
+import sqlite3
+import time
+from keys import FinStatement
+
+INFO = 'info'
+PRICE_HISTORY = 'price_history'  # Daily closes, used by the backtest
+
+DEFAULT_CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache', 'dcf.sqlite')
+
+# Time-to-live in seconds for every cached dataset. Annual statements change a few
+# times a year, while `info` carries market data (market cap, beta) that moves daily.
+DEFAULT_TTLS = {
+    INFO: 24 * 60 * 60,
+    PRICE_HISTORY: 24 * 60 * 60,
+    FinStatement.CASHFLOW.value: 7 * 24 * 60 * 60,
+    FinStatement.BALANCE_SHEET.value: 7 * 24 * 60 * 60,
+    FinStatement.INCOME.value: 7 * 24 * 60 * 60,
+}
+
+
+class DataCache:
+    """
+    Persistent on-disk cache for downloaded company data, stored in SQLite and keyed
+    by ticker and dataset (`info` or one of the FinStatement values).
+
+    Attributes:
+        path (str): Location of the SQLite database file
+        ttls (dict): Time-to-live in seconds per dataset; datasets without an entry never expire
+        offline (bool): When True, cached entries are served regardless of age and
+            nothing is ever downloaded
+        revalidator (RefreshScheduler): When set, expired entries are served as they are while
+            the revalidator downloads them again in the background (stale-while-revalidate)
+    """
+
+    def __init__(self, path=None, ttls=None, offline=False, revalidator=None):
+        self.path = path or DEFAULT_CACHE_PATH
+        self.ttls = {**DEFAULT_TTLS, **(ttls or {})}
+        self.offline = offline
+        self.revalidator = revalidator
+
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        with self._connect() as conn:
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS datasets (
+                    ticker TEXT NOT NULL,
+                    dataset TEXT NOT NULL,
+                    fetched_at REAL NOT NULL,
+                    payload BLOB NOT NULL,
+                    PRIMARY KEY (ticker, dataset)
+                )
+                """
+            )
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.execute('PRAGMA journal_mode=WAL')
+        return conn
+
+    def is_fresh(self, dataset, fetched_at):
+        """
+        Checks whether an entry fetched at `fetched_at` is still within its TTL.
+
+        Returns:
+            bool: True if the entry may be served without going to the network
+        """
+        if self.offline:
+            return True
+        ttl = self.ttls.get(dataset)
+        return ttl is None or time.time() - fetched_at < ttl
+
+    def get(self, ticker, dataset):
+        """
+        Returns the cached value for a ticker/dataset pair if it is fresh.
+
+        Returns:
+            object: The cached value, or None if it is missing or expired
+        """
+        entry = self.get_entry(ticker, dataset)
+        if entry is None:
+            return None
+        value, fetched_at = entry
+        return value if self.is_fresh(dataset, fetched_at) else None
+
+    def get_entry(self, ticker, dataset):
+        """
+        Returns the cached value together with its fetch timestamp, ignoring the TTL.
+
+        Returns:
+            tuple: (value, fetched_at), or None if nothing is cached
+        """
+        with self._connect() as conn:
+            row = conn.execute(
+                'SELECT payload, fetched_at FROM datasets WHERE ticker = ? AND dataset = ?',
+                (ticker.upper(), dataset)
+            ).fetchone()
+        if row is None:
+            return None
+        return pickle.loads(row[0]), row[1]
+
+    def set(self, ticker, dataset, value, fetched_at=None):
+        with self._connect() as conn:
+            conn.execute(
+                'INSERT OR REPLACE INTO datasets (ticker, dataset, fetched_at, payload) VALUES (?, ?, ?, ?)',
+                (ticker.upper(), dataset, fetched_at or time.time(), pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+            )
+
+    def invalidate(self, ticker, dataset=None):
+        with self._connect() as conn:
+            if dataset is None:
+                conn.execute('DELETE FROM datasets WHERE ticker = ?', (ticker.upper(),))
+            else:
+                conn.execute('DELETE FROM datasets WHERE ticker = ? AND dataset = ?', (ticker.upper(), dataset))
+
+
+_default_cache = None
+
+
+def get_default_cache():
+    """
+    Returns the process-wide cache, configured from the DCF_CACHE_PATH and DCF_OFFLINE
+    environment variables on first use.
+    """
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = DataCache(
+            path=os.environ.get('DCF_CACHE_PATH'),
+            offline=os.environ.get('DCF_OFFLINE', '') not in ('', '0', 'false')
+        )
+    return _default_cache
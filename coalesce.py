@@ -0,0 +1,233 @@
+"""
+Single-flight request coalescing.
+
+When several requests need the same result at once, e.g. users opening the same ticker, only the
+first one (the leader) computes it; the others wait for the leader and share its result or
+exception. Nothing is kept once the computation completes, so later requests go to the caches as
+usual. StreamFlight does the same for results sent in chunks: followers replay the leader's chunks
+as they are computed.
+
+Coalescing is per process: with several WSGI workers each worker has its own in-flight table, and
+the shared data and result caches dedupe the work across workers once a first result is stored.
+"""
+import threading
+from functools import partial
+import metrics
+
+
+class _Call:
+    __slots__ = ('done', 'result', 'error', 'followers')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.followers = 0
+
+
+class SingleFlight:
+    """
+    Runs at most one computation per key at a time; concurrent callers with the same key share it.
+
+    Attributes:
+        name (str): Label of the `dcf_coalesced_requests_total` counter
+        enabled (bool): When False every caller computes its own result
+    """
+
+    def __init__(self, name, enabled=True):
+        self.name = name
+        self.enabled = enabled
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, compute):
+        """
+        Returns `compute()`, or the result of the call already running for `key`.
+
+        :param key: Identifies the result, e.g. (ticker, forecast_years, model).
+        :param compute: A zero-argument callable.
+        :raises: Whatever `compute()` raised, in the leader and in every follower.
+        """
+        if not self.enabled:
+            return compute()
+
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            else:
+                call.followers += 1
+
+        if not leader:
+            metrics.increment('dcf_coalesced_requests_total', flight=self.name, role='follower')
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        metrics.increment('dcf_coalesced_requests_total', flight=self.name, role='leader')
+        try:
+            call.result = compute()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    @property
+    def in_flight(self):
+        """Number of keys currently being computed."""
+        with self._lock:
+            return len(self._calls)
+
+
+class _SharedIterator:
+    """
+    Replays the items of one iterator to several consumers, computing each item once. When the
+    last consumer stops before the end, e.g. every client of a streamed page disconnected, the
+    iterator is closed so it releases what it holds.
+    """
+
+    def __init__(self, iterator, on_finish):
+        """
+        :param iterator: The iterator to share.
+        :param on_finish: Called with this object once the iterator is exhausted, failed or abandoned.
+        """
+        self._iterator = iterator
+        self._on_finish = on_finish
+        self._items = []
+        self._done = False
+        self._error = None
+        self._consumers = 0
+        self._abandoned = False
+        self._lock = threading.Lock()
+
+    def attach(self):
+        """Returns a consumer iterating from the first item, or None once the iterator was abandoned."""
+        with self._lock:
+            if self._abandoned:
+                return None
+            self._consumers += 1
+        return _Consumer(self)
+
+    def item(self, position):
+        # The consumer that gets ahead computes the next item; the others wait for it here
+        with self._lock:
+            if position < len(self._items):
+                return self._items[position]
+            if self._error is not None:
+                raise self._error
+            if self._done:
+                raise StopIteration
+            try:
+                self._items.append(next(self._iterator))
+                return self._items[position]
+            except StopIteration:
+                self._done = True
+            except BaseException as e:
+                self._error = e
+        # Outside the lock, since on_finish takes the lock of the flight
+        self._on_finish(self)
+        if self._error is not None:
+            raise self._error
+        raise StopIteration
+
+    def detach(self):
+        with self._lock:
+            self._consumers -= 1
+            abandoned = self._consumers == 0 and not self._done and self._error is None
+            if abandoned:
+                self._abandoned = True
+        if abandoned:
+            close = getattr(self._iterator, 'close', None)
+            if close is not None:
+                close()
+            self._on_finish(self)
+
+
+class _Consumer:
+    """One consumer of a _SharedIterator; closing it, or dropping it unfinished, detaches it."""
+
+    def __init__(self, shared):
+        self._shared = shared
+        self._position = 0
+        self._closed = False
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self._closed:
+            raise StopIteration
+        try:
+            item = self._shared.item(self._position)
+        except BaseException:
+            self.close()
+            raise
+        self._position += 1
+        return item
+
+    def close(self):
+        if not self._closed:
+            self._closed = True
+            self._shared.detach()
+
+    def __del__(self):
+        self.close()
+
+
+class StreamFlight:
+    """
+    Single-flight for streamed results: concurrent callers with the same key iterate over one
+    computation, from its first item, until it is exhausted. Each item is computed once, by
+    whichever caller needs it first. A computation that every caller stopped iterating over is
+    closed and forgotten.
+
+    Attributes:
+        name (str): Label of the `dcf_coalesced_requests_total` counter
+        enabled (bool): When False every caller iterates over its own computation
+    """
+
+    def __init__(self, name, enabled=True):
+        self.name = name
+        self.enabled = enabled
+        self._streams = {}
+        self._lock = threading.Lock()
+
+    def stream(self, key, produce):
+        """
+        Returns an iterator over `produce()`, or over the stream already running for `key`.
+        Close the iterator when stopping before its end.
+
+        :param key: Identifies the result, e.g. a result cache key.
+        :param produce: A zero-argument callable returning an iterator.
+        :raises: Whatever the shared iterator raised, in every caller that reaches that item.
+        """
+        if not self.enabled:
+            return iter(produce())
+
+        with self._lock:
+            shared = self._streams.get(key)
+            consumer = shared.attach() if shared is not None else None
+            leader = consumer is None
+            if leader:
+                shared = self._streams[key] = _SharedIterator(iter(produce()), partial(self._forget, key))
+                consumer = shared.attach()
+        metrics.increment('dcf_coalesced_requests_total', flight=self.name, role='leader' if leader else 'follower')
+        return consumer
+
+    def _forget(self, key, shared):
+        with self._lock:
+            # An abandoned stream may already have been replaced by a new one
+            if self._streams.get(key) is shared:
+                del self._streams[key]
+
+    @property
+    def in_flight(self):
+        """Number of keys currently being streamed."""
+        with self._lock:
+            return len(self._streams)
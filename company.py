@@ -1,59 +1,183 @@
-import yfinance as yf
+import copy
+import hashlib
+import time
+from functools import partial
 import pandas as pd
+import fetch
+import market_data
+import metrics
 from keys import FinKeys, FinStatement
+from cache import INFO, get_default_cache
+from providers import DATASET_ATTRIBUTES, INFO_NUMBER_FIELDS, INFO_TEXT_FIELDS, get_default_provider
+from statements import StatementStore
+
+# `info` fields kept on the Company; the full dictionary stays in the cache
+INFO_FIELDS = INFO_TEXT_FIELDS + INFO_NUMBER_FIELDS
+
+# Time between the end of a fiscal year and the filing of its annual report
+DEFAULT_PUBLICATION_LAG = pd.Timedelta(days=90)
+
+def download_dataset(ticker, dataset, cache, provider=None):
+    """
+    Downloads one dataset of a ticker from the provider and stores it in the cache.
+
+    :return: (value, fetched_at)
+    """
+    value = (provider or get_default_provider()).dataset(ticker, dataset)
+    fetched_at = time.time()
+
+    # Empty responses are usually transient upstream failures, so they are not cached
+    if value is not None and len(value) > 0:
+        cache.set(ticker, dataset, value, fetched_at=fetched_at)
+    return value, fetched_at
 
 class Company:
-    def __init__(self, ticker):
+    def __init__(self, ticker, cache=None, prefetch_market_data=True, serve_stale=True, provider=None):
         self.ticker = ticker
+        self.cache = cache or get_default_cache()
+        # Where datasets and market data come from (see providers.py)
+        self.provider = provider or get_default_provider()
+        # Resolve the WACC market inputs in the same concurrent stage as the company data
+        self.prefetch_market_data = prefetch_market_data
+        # Serve expired datasets immediately when the cache has a background revalidator
+        self.serve_stale = serve_stale
         self.info = {}
-        self.financial_data = {}
+        self.statements = StatementStore.from_frames({})
         self.shares_outstanding = None
         self.cash = None
         self.debt = None
+        # When each dataset was downloaded, as POSIX timestamps
+        self.fetched_at = {}
+        # Date of a point-in-time view (see `as_of`), None for the current data
+        self.as_of_date = None
 
         self.download_company_data()
         
-    def download_company_data(self):
-        stock = yf.Ticker(self.ticker)
-        
-        # Download company information
-        self.info = stock.info
+    def download_company_data(self, refresh=False):
+        # Download company information, statements and market inputs in parallel
+        calls = {dataset: partial(self.load_dataset, dataset, refresh) for dataset in DATASET_ATTRIBUTES}
+        if self.prefetch_market_data:
+            calls[market_data.RISK_FREE_RATE] = partial(market_data.get_risk_free_rate, self.cache, self.serve_stale,
+                                                        self.provider)
+            calls[market_data.MARKET_RETURN] = partial(market_data.get_historical_market_return, cache=self.cache,
+                                                       serve_stale=self.serve_stale, provider=self.provider)
+        with metrics.span('company.download'):
+            datasets = fetch.fetch_concurrently(calls)
+
+        info = datasets[INFO]
+        self.info = {field: info[field] for field in INFO_FIELDS if field in info}
         self.name = self.info.get('longName', None)
         self.market_cap = self.info.get('marketCap', None)
         self.industry = self.info.get('industry', None)
         self.sector = self.info.get('sector', None)
         self.enterprise_value = self.info.get('enterpriseValue', None)
         
-        # Download financial data
-        self.financial_data = {
-            FinStatement.CASHFLOW.value: self.reverse_dataframe(stock.cashflow),
-            FinStatement.BALANCE_SHEET.value: self.reverse_dataframe(stock.balance_sheet),
-            FinStatement.INCOME.value: self.reverse_dataframe(stock.income_stmt)
-        }
+        # Reverse the financial statements and pack them into the compact store
+        self.statements = StatementStore.from_frames({
+            FinStatement.CASHFLOW.value: self.reverse_dataframe(datasets[FinStatement.CASHFLOW.value]),
+            FinStatement.BALANCE_SHEET.value: self.reverse_dataframe(datasets[FinStatement.BALANCE_SHEET.value]),
+            FinStatement.INCOME.value: self.reverse_dataframe(datasets[FinStatement.INCOME.value])
+        })
         
         self.shares_outstanding = self.info.get(FinKeys.SHARES_OUTSTANDING.value, None)
         self.cash = self.get_latest_value(FinStatement.BALANCE_SHEET.value, FinKeys.CASH.value)
         self.debt = self.get_latest_value(FinStatement.BALANCE_SHEET.value, FinKeys.DEBT.value)
         
+    def load_dataset(self, dataset, refresh=False):
+        """
+        Returns a dataset from the cache, downloading it only when it is missing or expired.
+        When every dataset is fresh no upstream call is made. An expired dataset is returned
+        as it is when the cache has a revalidator, which downloads it again in the background.
+        Providers that are not cacheable, such as local files, are read directly.
+
+        :param dataset: `info` or one of the FinStatement values.
+        :param refresh: Bypass the cache and download the dataset again.
+        :raises: RuntimeError if the cache is offline and holds no copy of the dataset.
+        """
+        if not self.provider.cacheable:
+            metrics.increment('dcf_data_cache_requests_total', dataset=dataset, result='provider')
+            self.fetched_at[dataset] = self.provider.version
+            return self.provider.dataset(self.ticker, dataset)
+
+        if not refresh or self.cache.offline:
+            entry = self.cache.get_entry(self.ticker, dataset)
+            if entry is not None and self.cache.is_fresh(dataset, entry[1]):
+                metrics.increment('dcf_data_cache_requests_total', dataset=dataset, result='hit')
+                self.fetched_at[dataset] = entry[1]
+                return entry[0]
+            if entry is not None and self.serve_stale and self.cache.revalidator is not None:
+                metrics.increment('dcf_data_cache_requests_total', dataset=dataset, result='stale')
+                self.cache.revalidator.schedule((self.ticker.upper(), dataset),
+                                                partial(download_dataset, self.ticker, dataset, self.cache, self.provider))
+                self.fetched_at[dataset] = entry[1]
+                return entry[0]
+        metrics.increment('dcf_data_cache_requests_total', dataset=dataset, result='miss')
+        if self.cache.offline:
+            raise RuntimeError(f"No cached '{dataset}' data for ticker '{self.ticker}' and the cache is offline.")
+
+        value, self.fetched_at[dataset] = download_dataset(self.ticker, dataset, self.cache, self.provider)
+        return value
+
+    @property
+    def data_version(self):
+        """
+        A stamp that changes whenever any underlying dataset is downloaded again or the
+        trading day of the WACC market inputs rolls over, and differs between point-in-time views.
+        """
+        stamp = repr((sorted(self.fetched_at.items()), market_data.trading_day().isoformat(), self.as_of_date))
+        return hashlib.sha1(stamp.encode()).hexdigest()[:16]
+
+    def as_of(self, date, publication_lag=DEFAULT_PUBLICATION_LAG, price=None):
+        """
+        Returns a point-in-time view of the company: a copy holding only the statements that were
+        published by `date`, i.e. of periods that ended at least `publication_lag` earlier. No data
+        is downloaded. `info` fields have no history and keep their current values, except the
+        market capitalization, which is derived from `price` when given.
+
+        :param date: The date of the view.
+        :param publication_lag: Time between the end of a fiscal period and the publication of its statements.
+        :param price: Share price at `date`.
+        :return: A Company.
+        :raises: ValueError if the statement columns are not dated.
+        """
+        date = pd.Timestamp(date)
+        view = copy.copy(self)
+        view.as_of_date = date.date().isoformat()
+        view.statements = self.statements.as_of(date - publication_lag)
+        view.info = dict(self.info)
+        if price is not None and self.shares_outstanding:
+            view.market_cap = view.info['marketCap'] = price * self.shares_outstanding
+        view.cash = view.get_latest_value(FinStatement.BALANCE_SHEET.value, FinKeys.CASH.value)
+        view.debt = view.get_latest_value(FinStatement.BALANCE_SHEET.value, FinKeys.DEBT.value)
+        return view
+
+    @property
+    def last_modified(self):
+        """Time of the most recent dataset download, as a POSIX timestamp."""
+        return max(self.fetched_at.values(), default=None)
+
+    @property
+    def financial_data(self):
+        """
+        The stored line items of each statement as DataFrames, rebuilt from the statement store
+        on every access. Prefer `statements` or the lookup methods below in hot paths.
+        """
+        return {statement: self.statements.frame(statement) for statement in self.statements.statements}
+
     def reverse_dataframe(self, df):
         return df.iloc[::-1]
     
     def get_latest_value(self, statement, key):
-        try:
-            return self.financial_data[statement].loc[key].dropna().iloc[-1]
-        except KeyError:
-            return None
+        return self.statements.latest(statement, key)
     
     def get_data_range(self, statement, key):
-        df = self.financial_data[statement]
         try:
-            data_series = df.loc[key].dropna()
-            return data_series
+            return self.statements.series(statement, key)
         except KeyError:
             print(f"[ERROR] Key '{key}' not found in statement '{statement}' for ticker '{self.ticker}'.")
             return pd.Series()
     
     def print_metrics(self):
-        for statement, df in self.financial_data.items():
+        for statement in self.statements.statements:
             print(f"\nMetrics from {statement}:")
-            print(df.index.tolist())
+            print(self.statements.keys(statement))
@@ -1,53 +1,198 @@
 from abc import ABC, abstractmethod
-import pandas as pd
-from wacc import WACC
+import numpy as np
+import metrics
 from modeling import ProjectAssumptions
+from dcf_models import core
+from dcf_models.batch import BatchDCF
+from dcf_models.montecarlo import DEFAULT_DISTRIBUTIONS, MonteCarloResult
 
 class BaseDCF(ABC):
-    def __init__(self, company, forecast_years):
+    # fcf_drivers() entry sampled as the growth rate in Monte Carlo mode
+    growth_driver = None
+
+    def __init__(self, company, forecast_years, wacc_model=None, assumptions=None):
         self.company = company
         self.forecast_years = forecast_years
         self.terminal_growth_rate = 0.03
-        self.dcf_table = None
+        self.forecasted_fcf = None
+        self.discounted_fcf = None
+        self._dcf_table = None
         self.equity_value = None
         self.intrinsic_share_price = None
-        self.wacc_model = WACC(self.company.ticker)
-        self.assumptions = ProjectAssumptions(company.financial_data) 
+        self.projected_fcf = None
+        self.drivers = None
+        # fcf_drivers() only depends on the company data, so it is computed once per model
+        self._base_drivers = None
+        # A WACC model may be shared between several DCF models of the same company. It is created
+        # on first use, so models valued at a given discount rate never load the market data layer.
+        self._wacc_model = wacc_model
+        # Assumptions are computed once per company data version and shared by all its models
+        self.assumptions = assumptions or ProjectAssumptions.for_company(company)
+
+    @property
+    def wacc_model(self):
+        if self._wacc_model is None:
+            from wacc import WACC
+            self._wacc_model = WACC(self.company.ticker, company=self.company)
+        return self._wacc_model
+
+    @wacc_model.setter
+    def wacc_model(self, wacc_model):
+        self._wacc_model = wacc_model
+
+    @property
+    def dcf_table(self):
+        """Year, forecasted and discounted FCF as a DataFrame, built on first access after calculate_dcf()."""
+        if self._dcf_table is None and self.discounted_fcf is not None:
+            import pandas as pd
+            self._dcf_table = pd.DataFrame({
+                'Year': list(range(1, len(self.forecasted_fcf))) + ['Terminal Value'],
+                'Forecasted FCF ($)': self.forecasted_fcf,
+                'Discounted FCF ($)': self.discounted_fcf
+            })
+        return self._dcf_table
+
+    @abstractmethod
+    def fcf_drivers(self):
+        """Return the scalar inputs (latest values, growth rates, margins) of the FCF projection."""
+        pass
 
+    @staticmethod
     @abstractmethod
-    def calculate_fcf(self):
-        """Calculate Free Cash Flow (FCF) based on the specific method."""
+    def project_fcf(drivers, forecast_years):
+        """
+        Project Free Cash Flow (FCF) year by year from the drivers returned by fcf_drivers().
+        Only elementwise arithmetic is used, so drivers may be floats or broadcastable NumPy arrays.
+        """
         pass
 
-    def calculate_dcf(self):
-        projected_fcf = self.calculate_fcf()
+    def base_drivers(self):
+        """fcf_drivers(), computed on first use and reused by every later projection."""
+        if self._base_drivers is None:
+            self._base_drivers = self.fcf_drivers()
+        return self._base_drivers
 
-        self.discount_rate = self.wacc_model.calculate_wacc()
-        
-        terminal_value = projected_fcf[-1] * (1 + self.terminal_growth_rate) / (self.discount_rate - self.terminal_growth_rate)
-        discounted_fcf = self.discount_cash_flows(projected_fcf + [terminal_value])
+    def calculate_fcf(self, overrides=None):
+        """Calculate Free Cash Flow (FCF) based on the specific method, optionally overriding some drivers."""
+        drivers = dict(self.base_drivers())
+        if overrides:
+            drivers.update(overrides)
+        invalid = [name for name, value in drivers.items() if not np.all(np.isfinite(value))]
+        if invalid:
+            raise ValueError(f"{type(self).__name__} cannot value '{self.company.ticker}': "
+                             f"{', '.join(invalid)} could not be calculated from its data")
+        self.drivers = drivers
+        return self.project_fcf(drivers, self.forecast_years)
 
-        years = list(range(1, self.forecast_years + 1)) + ['Terminal Value']
-        forecasted_fcf = projected_fcf + [terminal_value]
+    def calculate_dcf(self, discount_rate=None, overrides=None):
+        with metrics.span('dcf.projection'):
+            projected_fcf = self.calculate_fcf(overrides)
+        self.projected_fcf = projected_fcf
 
-        self.dcf_table = pd.DataFrame({
-            'Year': years,
-            'Forecasted FCF ($)': forecasted_fcf,
-            'Discounted FCF ($)': discounted_fcf
-        })
+        with metrics.span('dcf.wacc'):
+            self.discount_rate = self.wacc_model.calculate_wacc() if discount_rate is None else discount_rate
+        
+        with metrics.span('dcf.discounting'):
+            terminal_value = core.terminal_value(projected_fcf[-1], self.discount_rate, self.terminal_growth_rate)
+            self.forecasted_fcf = projected_fcf + [terminal_value]
+            self.discounted_fcf = self.discount_cash_flows(self.forecasted_fcf)
+        self._dcf_table = None
 
     def discount_cash_flows(self, fcf_forecast):
-        return [fcf / (1 + self.discount_rate) ** year for year, fcf in enumerate(fcf_forecast, start=1)]
+        return core.discount_cash_flows(fcf_forecast, self.discount_rate)
 
     def calculate_equity_value(self):
-        if self.dcf_table is None:
+        if self.discounted_fcf is None:
             raise ValueError("DCF Table is not calculated. Please run calculate_dcf() first.")
-        total_dcf_value = self.dcf_table['Discounted FCF ($)'].sum()
-        self.equity_value = total_dcf_value + self.company.cash - self.company.debt
+        self.equity_value = core.equity_value(self.discounted_fcf, self.company.cash, self.company.debt)
         return self.equity_value
 
     def calculate_intrinsic_share_price(self):
         if self.equity_value is None:
             raise ValueError("Equity value is not calculated. Please run calculate_equity_value() first.")
-        self.intrinsic_share_price = self.equity_value / self.company.shares_outstanding
+        intrinsic_share_price = self.equity_value / self.company.shares_outstanding
+        if not np.isfinite(intrinsic_share_price):
+            raise ValueError(f"The intrinsic share price of '{self.company.ticker}' is not a finite number "
+                             f"(equity value {self.equity_value}, {self.company.shares_outstanding} shares)")
+        self.intrinsic_share_price = intrinsic_share_price
         return self.intrinsic_share_price
+
+    def calculate_sensitivity_grid(self, discount_rates=None, terminal_growth_rates=None):
+        """
+        Intrinsic share price over a grid of discount rates and terminal growth rates, reusing the
+        FCF projected by calculate_dcf() and evaluating the whole grid as one array operation.
+
+        :param discount_rates: Discount rates (rows); defaults to 50 rates within 3 points of the WACC.
+        :param terminal_growth_rates: Terminal growth rates (columns); defaults to 50 rates from 0% to 5%.
+        :return: A DataFrame of intrinsic share prices. Cells where the discount rate does not
+                 exceed terminal growth are NaN.
+        """
+        if self.projected_fcf is None:
+            raise ValueError("Projected FCF is not calculated. Please run calculate_dcf() first.")
+        if discount_rates is None:
+            discount_rates = np.linspace(self.discount_rate - 0.03, self.discount_rate + 0.03, 50)
+        if terminal_growth_rates is None:
+            terminal_growth_rates = np.linspace(0.0, 0.05, 50)
+
+        fcf = np.asarray(self.projected_fcf, dtype=float)
+        rates = np.asarray(discount_rates, dtype=float)[:, None]
+        growth = np.asarray(terminal_growth_rates, dtype=float)[None, :]
+        years = np.arange(1, len(fcf) + 1)
+
+        discounted_fcf = (fcf / (1 + rates) ** years).sum(axis=1, keepdims=True)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            terminal_value = np.where(rates > growth, fcf[-1] * (1 + growth) / (rates - growth), np.nan)
+        discounted_terminal_value = terminal_value / (1 + rates) ** (len(fcf) + 1)
+
+        equity_value = discounted_fcf + discounted_terminal_value + self.company.cash - self.company.debt
+        import pandas as pd
+        return pd.DataFrame(
+            equity_value / self.company.shares_outstanding,
+            index=pd.Index(rates[:, 0], name='Discount Rate'),
+            columns=pd.Index(growth[0], name='Terminal Growth Rate'),
+        )
+
+    def simulate_intrinsic_share_price(self, draws=100_000, distributions=None, seed=None, bins=50):
+        """
+        Monte Carlo valuation: samples the growth rate, discount rate and terminal growth rate
+        and values every draw in one vectorized pass.
+
+        :param draws: Number of draws.
+        :param distributions: Overrides for DEFAULT_DISTRIBUTIONS, keyed by 'growth_rate',
+                              'discount_rate' and 'terminal_growth_rate'.
+        :param seed: Seed for reproducible draws.
+        :param bins: Number of histogram bins.
+        :return: A MonteCarloResult with percentiles and a histogram of intrinsic share price.
+        """
+        distributions = {**DEFAULT_DISTRIBUTIONS, **(distributions or {})}
+        rng = np.random.default_rng(seed)
+
+        drivers = self.base_drivers()
+        point_estimates = {
+            'growth_rate': drivers[self.growth_driver],
+            'discount_rate': self.wacc_model.calculate_wacc(),
+            'terminal_growth_rate': self.terminal_growth_rate,
+        }
+        samples = {
+            name: distributions[name].sample(rng, draws, point_estimate)
+            for name, point_estimate in point_estimates.items()
+        }
+
+        # The Gordon growth terminal value is only defined when the discount rate exceeds terminal growth
+        valid = samples['discount_rate'] > samples['terminal_growth_rate']
+        samples = {name: values[valid] for name, values in samples.items()}
+
+        batch = BatchDCF(
+            type(self),
+            {name: [value] for name, value in drivers.items()},
+            cash=[self.company.cash],
+            debt=[self.company.debt],
+            shares_outstanding=[self.company.shares_outstanding],
+        )
+        result = batch.run(
+            discount_rate=samples['discount_rate'],
+            forecast_years=self.forecast_years,
+            terminal_growth_rate=samples['terminal_growth_rate'],
+            overrides={self.growth_driver: samples['growth_rate']},
+        )
+        return MonteCarloResult(result.intrinsic_share_price[0], samples, int(draws - valid.sum()), bins=bins)
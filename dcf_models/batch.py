@@ -0,0 +1,110 @@
+import numpy as np
+
+
+class BatchResult:
+    """
+    Output of a BatchDCF run. Every array has shape (N companies, M assumption sets), except
+    the per-year arrays which add a trailing axis of length max(forecast_years). Years beyond a
+    scenario's own horizon are NaN.
+    """
+
+    def __init__(self, projected_fcf, discounted_fcf, terminal_value, discounted_terminal_value,
+                 enterprise_value, equity_value, intrinsic_share_price):
+        self.projected_fcf = projected_fcf
+        self.discounted_fcf = discounted_fcf
+        self.terminal_value = terminal_value
+        self.discounted_terminal_value = discounted_terminal_value
+        self.enterprise_value = enterprise_value
+        self.equity_value = equity_value
+        self.intrinsic_share_price = intrinsic_share_price
+
+
+class BatchDCF:
+    """
+    Values N companies under M assumption sets in one vectorized pass, reusing the
+    projection of a BaseDCF subclass (`project_fcf`) on NumPy arrays instead of floats.
+
+    Attributes:
+        model_cls (type): The BaseDCF subclass whose projection is used
+        drivers (dict): Driver name -> array of shape (N,), as returned by `fcf_drivers()`
+        cash, debt, shares_outstanding (np.ndarray): Balance sheet inputs of shape (N,)
+    """
+
+    def __init__(self, model_cls, drivers, cash, debt, shares_outstanding):
+        self.model_cls = model_cls
+        self.drivers = {name: np.asarray(values, dtype=float) for name, values in drivers.items()}
+        self.cash = np.asarray(cash, dtype=float)
+        self.debt = np.asarray(debt, dtype=float)
+        self.shares_outstanding = np.asarray(shares_outstanding, dtype=float)
+
+    @classmethod
+    def from_models(cls, models):
+        """
+        Builds a batch from already constructed DCF models of the same class, one per company.
+        """
+        model_cls = type(models[0])
+        all_drivers = [model.fcf_drivers() for model in models]
+        drivers = {name: [d[name] for d in all_drivers] for name in all_drivers[0]}
+        return cls(
+            model_cls,
+            drivers,
+            cash=[model.company.cash for model in models],
+            debt=[model.company.debt for model in models],
+            shares_outstanding=[model.company.shares_outstanding for model in models],
+        )
+
+    def run(self, discount_rate, forecast_years, terminal_growth_rate=0.03, overrides=None):
+        """
+        Runs the DCF for every company/assumption set pair.
+
+        :param discount_rate: WACC per assumption set (M,) or per pair (N, M).
+        :param forecast_years: Forecast horizon per assumption set (M,) or per pair (N, M).
+        :param terminal_growth_rate: Terminal growth rate, scalar, (M,) or (N, M).
+        :param overrides: Optional driver name -> (M,) or (N, M) array replacing the company
+                          drivers, e.g. scenario growth rates or margins.
+        :return: A BatchResult.
+        """
+        drivers = {name: values[:, None] for name, values in self.drivers.items()}
+        for name, values in (overrides or {}).items():
+            drivers[name] = np.asarray(values, dtype=float)
+
+        shape = np.broadcast_shapes(
+            (len(self.cash), 1),
+            np.shape(discount_rate), np.shape(forecast_years), np.shape(terminal_growth_rate),
+            *(np.shape(values) for values in drivers.values())
+        )
+        drivers = {name: np.broadcast_to(values, shape) for name, values in drivers.items()}
+        discount_rate = np.broadcast_to(np.asarray(discount_rate, dtype=float), shape)
+        terminal_growth_rate = np.broadcast_to(np.asarray(terminal_growth_rate, dtype=float), shape)
+        horizon = np.broadcast_to(np.asarray(forecast_years, dtype=int), shape)
+        max_years = int(horizon.max())
+
+        # Years are projected sequentially (as in the scalar models) but across all pairs at once
+        projected_fcf = np.stack(np.broadcast_arrays(*self.model_cls.project_fcf(drivers, max_years)), axis=-1)
+        years = np.arange(1, max_years + 1)
+        in_horizon = years <= horizon[..., None]
+
+        last_fcf = np.take_along_axis(projected_fcf, horizon[..., None] - 1, axis=-1)[..., 0]
+        terminal_value = last_fcf * (1 + terminal_growth_rate) / (discount_rate - terminal_growth_rate)
+
+        discounted_fcf = projected_fcf / (1 + discount_rate[..., None]) ** years
+        discounted_terminal_value = terminal_value / (1 + discount_rate) ** (horizon + 1)
+
+        # Sum year by year so the rounding matches summing the scalar DCF table
+        enterprise_value = np.zeros(shape)
+        for year in range(max_years):
+            enterprise_value = enterprise_value + np.where(in_horizon[..., year], discounted_fcf[..., year], 0.0)
+        enterprise_value = enterprise_value + discounted_terminal_value
+
+        equity_value = enterprise_value + self.cash[:, None] - self.debt[:, None]
+        intrinsic_share_price = equity_value / self.shares_outstanding[:, None]
+
+        return BatchResult(
+            projected_fcf=np.where(in_horizon, projected_fcf, np.nan),
+            discounted_fcf=np.where(in_horizon, discounted_fcf, np.nan),
+            terminal_value=terminal_value,
+            discounted_terminal_value=discounted_terminal_value,
+            enterprise_value=enterprise_value,
+            equity_value=equity_value,
+            intrinsic_share_price=intrinsic_share_price,
+        )
@@ -0,0 +1,78 @@
+"""
+Valuation math shared by the DCF models and the WACC: cost of capital, terminal value,
+discounting and the equity bridge.
+
+This module, the models in `dcf_models`, `modeling` and `statements` only need NumPy at import
+time. pandas, yfinance, Flask and plotly are imported on first use by the modules that fetch data
+or build tables and plots, so CLI tools and pool workers that value numbers start fast.
+
+Usage without any data download:
+    store = StatementStore.from_dict({'income_statement': {'Total Revenue': [...], ...}, ...}, dates)
+    company = CompanyData('ACME', store, shares_outstanding=1e9)
+    model = NopatDCF(company, 5)
+    model.calculate_dcf(discount_rate=0.09)
+"""
+import itertools
+import numpy as np
+from keys import FinKeys, FinStatement
+
+# Data versions of CompanyData objects created without one
+_data_versions = itertools.count()
+
+
+def cost_of_equity(risk_free_rate, beta, market_return):
+    """Cost of equity from the CAPM: risk-free rate plus beta times the market risk premium."""
+    return risk_free_rate + beta * (market_return - risk_free_rate)
+
+
+def weighted_average_cost_of_capital(equity_value, debt_value, cost_of_equity, cost_of_debt, tax_rate):
+    """
+    Weights the cost of equity and the after-tax cost of debt by their share of total capital.
+
+    :return: The WACC; 0 when there is neither equity nor debt.
+    """
+    total_value = equity_value + debt_value
+    equity_proportion = equity_value / total_value if total_value != 0 else 0
+    debt_proportion = debt_value / total_value if total_value != 0 else 0
+    return equity_proportion * cost_of_equity + debt_proportion * cost_of_debt * (1 - tax_rate)
+
+
+def terminal_value(last_fcf, discount_rate, terminal_growth_rate):
+    """Gordon growth value, one year after the last projected FCF, of all later cash flows."""
+    return last_fcf * (1 + terminal_growth_rate) / (discount_rate - terminal_growth_rate)
+
+
+def discount_cash_flows(cash_flows, discount_rate):
+    """Present values of cash flows received at the end of years 1, 2, ..."""
+    return [fcf / (1 + discount_rate) ** year for year, fcf in enumerate(cash_flows, start=1)]
+
+
+def equity_value(discounted_cash_flows, cash, debt):
+    """Enterprise value (the sum of the discounted cash flows) plus cash minus debt."""
+    # Summed like pandas sums the DCF table, so both give identical results
+    return np.sum(np.asarray(discounted_cash_flows, dtype=float)) + cash - debt
+
+
+class CompanyData:
+    """
+    The inputs a DCF model reads from a company, for valuations from local numbers instead of a
+    downloaded `company.Company`.
+
+    Attributes:
+        ticker (str): Identifies the company in caches
+        statements (StatementStore): The financial statements
+        shares_outstanding (float): Number of shares
+        cash, debt (float): Latest balance sheet values, read from the statements when omitted
+        info (dict): Optional `info` fields, e.g. `beta` and `marketCap` for the WACC
+    """
+
+    def __init__(self, ticker, statements, shares_outstanding, cash=None, debt=None, info=None, data_version=None):
+        self.ticker = ticker
+        self.statements = statements
+        self.shares_outstanding = shares_outstanding
+        balance_sheet = FinStatement.BALANCE_SHEET.value
+        self.cash = cash if cash is not None else statements.latest(balance_sheet, FinKeys.CASH.value)
+        self.debt = debt if debt is not None else statements.latest(balance_sheet, FinKeys.DEBT.value)
+        self.info = dict(info or {})
+        # Distinguishes different data under the same ticker in ProjectAssumptions.for_company()
+        self.data_version = data_version if data_version is not None else f'local-{next(_data_versions)}'
@@ -16,27 +16,36 @@ class FreeCashFlowDCF(BaseDCF):
     its operations relative to its revenue. By projecting revenue and applying the
     FCF margin, we can estimate future FCFs for the DCF valuation.
     """
-    def __init__(self, company, forecast_years):
-        super().__init__(company, forecast_years)
+    growth_driver = 'revenue_growth_rate'
 
-    def calculate_fcf(self):
+    def __init__(self, company, forecast_years, wacc_model=None, assumptions=None):
+        super().__init__(company, forecast_years, wacc_model, assumptions)
+
+    def fcf_drivers(self):
         # Calculate revenue growth rate based on historical data
         revenue_growth_rate = self.assumptions.calculate_growth_rate(statement=FinStatement.INCOME, key=FinKeys.REVENUE)
         
-        # Get the latest revenue value
-        revenue = self.company.get_latest_value(FinStatement.INCOME.value, FinKeys.REVENUE.value)
-        
-        # Get historical free cash flow (FCF) and calculate FCF margin
-        fcf_data = self.company.get_data_range(FinStatement.CASHFLOW.value, FinKeys.FREE_CASH_FLOW.value)
-        avg_fcf_margin = fcf_data.mean() / revenue if not fcf_data.empty else 0
-        
+        # Get the latest revenue value and the average FCF margin
+        revenue = self.assumptions.revenue
+        avg_fcf_margin = self.assumptions.fcf_margin
+
+        return {
+            'revenue': revenue,
+            'revenue_growth_rate': revenue_growth_rate,
+            'avg_fcf_margin': avg_fcf_margin,
+        }
+
+    @staticmethod
+    def project_fcf(drivers, forecast_years):
+        revenue = drivers['revenue']
+
         # Initialize a list to store projected FCF values
         projected_fcf = []
         
         # Project future FCF based on revenue growth and FCF margin
-        for year in range(1, self.forecast_years + 1):
-            revenue *= (1 + revenue_growth_rate) 
-            fcf = revenue * avg_fcf_margin 
+        for year in range(1, forecast_years + 1):
+            revenue = revenue * (1 + drivers['revenue_growth_rate'])
+            fcf = revenue * drivers['avg_fcf_margin']
             projected_fcf.append(fcf)
         
-        return projected_fcf
\ No newline at end of file
+        return projected_fcf
@@ -2,8 +2,12 @@ from dcf_models.base import BaseDCF
 from keys import FinStatement, FinKeys
 
 class FreeCashFlowToEquity(BaseDCF):
-    def __init__(self, company, forecast_years):
-        super().__init__(company, forecast_years)
+    def __init__(self, company, forecast_years, wacc_model=None, assumptions=None):
+        super().__init__(company, forecast_years, wacc_model, assumptions)
     
-    def calculate_fcf(self):
-        raise NotImplementedError
\ No newline at end of file
+    def fcf_drivers(self):
+        raise NotImplementedError
+
+    @staticmethod
+    def project_fcf(drivers, forecast_years):
+        raise NotImplementedError
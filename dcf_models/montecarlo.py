@@ -0,0 +1,67 @@
+import numpy as np
+
+
+class Normal:
+    """Normal distribution; centred on the model's point estimate unless `mean` is given."""
+
+    def __init__(self, std, mean=None):
+        self.std = std
+        self.mean = mean
+
+    def sample(self, rng, size, point_estimate):
+        mean = point_estimate if self.mean is None else self.mean
+        return rng.normal(mean, self.std, size)
+
+
+class Uniform:
+    """Uniform distribution; `low` and `high` are offsets from the point estimate unless `absolute` is set."""
+
+    def __init__(self, low, high, absolute=False):
+        self.low = low
+        self.high = high
+        self.absolute = absolute
+
+    def sample(self, rng, size, point_estimate):
+        offset = 0 if self.absolute else point_estimate
+        return rng.uniform(offset + self.low, offset + self.high, size)
+
+
+class Fixed:
+    """Keeps an input at its point estimate (or at `value`)."""
+
+    def __init__(self, value=None):
+        self.value = value
+
+    def sample(self, rng, size, point_estimate):
+        return np.full(size, point_estimate if self.value is None else self.value, dtype=float)
+
+
+DEFAULT_DISTRIBUTIONS = {
+    'growth_rate': Normal(std=0.02),
+    'discount_rate': Normal(std=0.01),
+    'terminal_growth_rate': Normal(std=0.005),
+}
+
+
+class MonteCarloResult:
+    """
+    Distribution of intrinsic share prices produced by BaseDCF.simulate_intrinsic_share_price.
+
+    Attributes:
+        prices (np.ndarray): Intrinsic share price of every valid draw
+        samples (dict): Sampled inputs per draw, keyed like DEFAULT_DISTRIBUTIONS
+        invalid_draws (int): Draws discarded because the discount rate did not exceed terminal growth
+        percentiles (dict): Percentile -> intrinsic share price
+        histogram (tuple): (counts, bin_edges) as returned by np.histogram
+    """
+
+    def __init__(self, prices, samples, invalid_draws, percentiles=(5, 25, 50, 75, 95), bins=50):
+        self.prices = prices
+        self.samples = samples
+        self.invalid_draws = invalid_draws
+        self.percentiles = dict(zip(percentiles, np.percentile(prices, percentiles))) if len(prices) else {}
+        self.histogram = np.histogram(prices, bins=bins) if len(prices) else (np.array([]), np.array([]))
+
+    @property
+    def mean(self):
+        return float(np.mean(self.prices))
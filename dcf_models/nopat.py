@@ -8,47 +8,54 @@ class NopatDCF(BaseDCF):
     NOPAT = Operating Income * (1 - Tax Rate) or NOPAT = EBIT * (1 - Tax Rate)
     We use the operating margin as our proxy for the cash flow.
     """
-    def __init__(self, company, forecast_years):
-        super().__init__(company, forecast_years)
+    growth_driver = 'revenue_growth_rate'
 
-    def calculate_fcf(self):
+    def __init__(self, company, forecast_years, wacc_model=None, assumptions=None):
+        super().__init__(company, forecast_years, wacc_model, assumptions)
+
+    def fcf_drivers(self):
         # Calculate growth rates using the assumptions
         revenue_growth_rate = self.assumptions.calculate_growth_rate(statement=FinStatement.INCOME, key=FinKeys.REVENUE)
         capex_growth_rate = self.assumptions.calculate_growth_rate(statement=FinStatement.CASHFLOW, key=FinKeys.CAPEX)
         wc_growth_rate = self.assumptions.calculate_growth_rate(statement=FinStatement.CASHFLOW, key=FinKeys.CHANGE_IN_WORKING_CAPITAL)
 
-        revenue = self.company.get_latest_value(FinStatement.INCOME.value, FinKeys.REVENUE.value)
-        operating_income = self.company.get_latest_value(FinStatement.INCOME.value, FinKeys.OPERATING_INCOME.value)
-        operating_margin = operating_income / revenue
-        tax_provision = self.company.get_latest_value(FinStatement.INCOME.value, FinKeys.TAX_PROVISION.value)
-        pretax_income = self.company.get_latest_value(FinStatement.INCOME.value, FinKeys.PRETAX_INCOME.value)
-        tax_rate = tax_provision / pretax_income if pretax_income != 0 else 0
-
-        # Historical data for averages
-        depreciation_data = self.company.get_data_range(FinStatement.CASHFLOW.value, FinKeys.DEPRECIATION.value)
-        capex_data = self.company.get_data_range(FinStatement.CASHFLOW.value, FinKeys.CAPEX.value)
-        change_in_working_capital_data = self.company.get_data_range(FinStatement.CASHFLOW.value, FinKeys.CHANGE_IN_WORKING_CAPITAL.value)
-
-        avg_depreciation = depreciation_data.mean() if not depreciation_data.empty else 0
-        avg_capex = abs(capex_data.mean()) if not capex_data.empty else 0
-        avg_change_in_wc = change_in_working_capital_data.mean() if not change_in_working_capital_data.empty else 0
-
-        # Initial calculations for NOPAT and FCF
-        capex_to_revenue_ratio = avg_capex / revenue
-        nopat = operating_income * (1 - tax_rate)
-        fcf = nopat - avg_capex + avg_depreciation - avg_change_in_wc
+        assumptions = self.assumptions
+        revenue = assumptions.revenue
+        operating_margin = assumptions.operating_margin
+        tax_rate = assumptions.effective_tax_rate
+
+        # Historical averages
+        avg_depreciation = assumptions.mean(FinStatement.CASHFLOW, FinKeys.DEPRECIATION) or 0
+        avg_capex = abs(assumptions.mean(FinStatement.CASHFLOW, FinKeys.CAPEX) or 0)
+        avg_change_in_wc = assumptions.mean(FinStatement.CASHFLOW, FinKeys.CHANGE_IN_WORKING_CAPITAL) or 0
+
+        return {
+            'revenue': revenue,
+            'revenue_growth_rate': revenue_growth_rate,
+            'operating_margin': operating_margin,
+            'tax_rate': tax_rate,
+            'capex_to_revenue_ratio': avg_capex / revenue,
+            'capex_growth_rate': capex_growth_rate,
+            'avg_depreciation': avg_depreciation,
+            'avg_change_in_wc': avg_change_in_wc,
+            'wc_growth_rate': wc_growth_rate,
+        }
+
+    @staticmethod
+    def project_fcf(drivers, forecast_years):
+        revenue = drivers['revenue']
 
         projected_fcf = []
-        for year in range(1, self.forecast_years + 1):
-            revenue *= (1 + revenue_growth_rate)
-            operating_income = revenue * operating_margin
-            nopat = operating_income * (1 - tax_rate)
+        for year in range(1, forecast_years + 1):
+            revenue = revenue * (1 + drivers['revenue_growth_rate'])
+            operating_income = revenue * drivers['operating_margin']
+            nopat = operating_income * (1 - drivers['tax_rate'])
             
-            capex = revenue * capex_to_revenue_ratio * (1 + capex_growth_rate)
-            change_in_wc = avg_change_in_wc * (1 + wc_growth_rate)
-            depreciation = revenue * (avg_depreciation / revenue)
+            capex = revenue * drivers['capex_to_revenue_ratio'] * (1 + drivers['capex_growth_rate'])
+            change_in_wc = drivers['avg_change_in_wc'] * (1 + drivers['wc_growth_rate'])
+            depreciation = revenue * (drivers['avg_depreciation'] / revenue)
             
             fcf = nopat + depreciation - capex - change_in_wc
             projected_fcf.append(fcf)
 
-        return projected_fcf
\ No newline at end of file
+        return projected_fcf
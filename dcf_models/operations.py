@@ -7,10 +7,12 @@ class CashFlowOperationsDCF(BaseDCF):
     cash flow from operations as the cash flow proxy. It adjusts for interest expense, 
     tax shield, and capital expenditures (CAPEX).
     """
-    def __init__(self, company, forecast_years):
-        super().__init__(company, forecast_years)
+    growth_driver = 'cfo_growth_rate'
 
-    def calculate_fcf(self):
+    def __init__(self, company, forecast_years, wacc_model=None, assumptions=None):
+        super().__init__(company, forecast_years, wacc_model, assumptions)
+
+    def fcf_drivers(self):
         # Calculate growth rates using the assumptions, handle missing keys
         try:
             
@@ -21,28 +23,40 @@ class CashFlowOperationsDCF(BaseDCF):
             capex_growth_rate = 0
 
         # Get latest values, handle missing values gracefully
-        cfo = self.company.get_latest_value(FinStatement.CASHFLOW.value, FinKeys.CASH_FLOW_OPERATIONS.value) or 0
-        interest_expense = self.company.get_latest_value(FinStatement.INCOME.value, FinKeys.INTEREST_EXPENSE.value) or 0
-        capex = abs(self.company.get_latest_value(FinStatement.CASHFLOW.value, FinKeys.CAPEX.value) or 0)
-        tax_provision = self.company.get_latest_value(FinStatement.INCOME.value, FinKeys.TAX_PROVISION.value) or 0
-        pretax_income = self.company.get_latest_value(FinStatement.INCOME.value, FinKeys.PRETAX_INCOME.value) or 0
-
-        tax_rate = tax_provision / pretax_income if pretax_income != 0 else 0
+        assumptions = self.assumptions
+        cfo = assumptions.latest(FinStatement.CASHFLOW, FinKeys.CASH_FLOW_OPERATIONS) or 0
+        interest_expense = assumptions.latest(FinStatement.INCOME, FinKeys.INTEREST_EXPENSE) or 0
+        capex = abs(assumptions.latest(FinStatement.CASHFLOW, FinKeys.CAPEX) or 0)
+        tax_rate = assumptions.effective_tax_rate
 
         # Calculate the initial interest expense to CFO ratio
         interest_to_cfo_ratio = interest_expense / cfo if cfo != 0 else 0
 
+        return {
+            'cfo': cfo,
+            'capex': capex,
+            'cfo_growth_rate': cfo_growth_rate,
+            'capex_growth_rate': capex_growth_rate,
+            'interest_to_cfo_ratio': interest_to_cfo_ratio,
+            'tax_rate': tax_rate,
+        }
+
+    @staticmethod
+    def project_fcf(drivers, forecast_years):
+        cfo = drivers['cfo']
+        capex = drivers['capex']
+
         projected_fcf = []
-        for year in range(1, self.forecast_years + 1):
+        for year in range(1, forecast_years + 1):
             # Project values for the year
-            cfo *= (1 + cfo_growth_rate)
-            capex *= (1 + capex_growth_rate)
+            cfo = cfo * (1 + drivers['cfo_growth_rate'])
+            capex = capex * (1 + drivers['capex_growth_rate'])
             
             # Calculate interest expense based on the constant ratio to CFO
-            interest_expense = cfo * interest_to_cfo_ratio
+            interest_expense = cfo * drivers['interest_to_cfo_ratio']
             
             # Calculate FCFF
-            fcf = cfo + interest_expense * (1 - tax_rate) - capex
+            fcf = cfo + interest_expense * (1 - drivers['tax_rate']) - capex
             projected_fcf.append(fcf)
             
         return projected_fcf
@@ -0,0 +1,448 @@
+import heapq
+import itertools
+import json
+import os
+import random
+import threading
+import time
+from collections import Counter
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextlib import contextmanager
+from contextvars import ContextVar, copy_context
+import metrics
+
+DEFAULT_MAX_WORKERS = 6
+DEFAULT_TIMEOUT = 30  # seconds allowed for each individual upstream call, not counting its queueing
+
+# Limits of the process-wide fetch scheduler, overridable with DCF_FETCH_* environment variables
+DEFAULT_RATE = 4.0  # sustained upstream calls per second (DCF_FETCH_RATE, 0 for no limit)
+DEFAULT_BURST = 10  # calls that may start at once after a quiet period (DCF_FETCH_BURST)
+DEFAULT_MAX_CONCURRENCY = 8  # upstream calls in flight (DCF_FETCH_CONCURRENCY)
+DEFAULT_MAX_RETRIES = 4  # retries of throttled and transient failures (DCF_FETCH_RETRIES)
+DEFAULT_BACKOFF = 0.5  # seconds before the first retry, doubling with every further one
+DEFAULT_MAX_BACKOFF = 30
+# Empty responses are sometimes throttling and sometimes just no data, so they are retried once
+EMPTY_RETRIES = 1
+
+# Priorities of waiting upstream calls; lower values go first
+INTERACTIVE = 0
+BATCH = 10
+
+
+class FetchError(RuntimeError):
+    """
+    Raised when one or more calls of a concurrent fetch stage fail or time out.
+
+    Attributes:
+        failures (dict): Maps the name of every failed call to its exception
+    """
+
+    def __init__(self, failures, total):
+        self.failures = failures
+        details = '; '.join(f"{name}: {type(error).__name__}: {error}" for name, error in failures.items())
+        super().__init__(f"{len(failures)} of {total} upstream calls failed: {details}")
+
+
+class UpstreamError(RuntimeError):
+    """Raised when an upstream call still fails, or returns nothing, after its retries."""
+
+
+class UpstreamCallCounter:
+    """
+    Counts the upstream (yfinance) calls made while it is active, grouped by call kind,
+    e.g. `info`, `cashflow` or `history:max`.
+    """
+
+    def __init__(self):
+        self.calls = Counter()
+        self._lock = threading.Lock()
+
+    def record(self, kind):
+        with self._lock:
+            self.calls[kind] += 1
+
+    @property
+    def total(self):
+        return sum(self.calls.values())
+
+
+_active_counter = ContextVar('upstream_call_counter', default=None)
+
+
+@contextmanager
+def count_upstream_calls():
+    """
+    Activates a request-scoped UpstreamCallCounter for the enclosed block.
+
+    Usage:
+        with count_upstream_calls() as counter:
+            CashFlowOperationsDCF(Company('AAPL'), 5).calculate_dcf()
+        assert counter.total == 6
+    """
+    counter = UpstreamCallCounter()
+    token = _active_counter.set(counter)
+    try:
+        yield counter
+    finally:
+        _active_counter.reset(token)
+
+
+def _record(kind):
+    metrics.increment('dcf_upstream_calls_total', kind=kind)
+    counter = _active_counter.get()
+    if counter is not None:
+        counter.record(kind)
+
+
+_priority = ContextVar('fetch_priority', default=INTERACTIVE)
+
+
+@contextmanager
+def priority(level):
+    """
+    Runs the upstream calls of the enclosed block, including those of fetch_concurrently(), at
+    the given priority.
+
+    Usage:
+        with fetch.priority(fetch.BATCH):
+            Company('AAPL')
+    """
+    token = _priority.set(level)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+class _CallClock:
+    """Lets the scheduler stop the timeout of a fetch_concurrently() call while it is queued."""
+    __slots__ = ('started', 'name')
+
+    def __init__(self, started, name):
+        self.started = started
+        self.name = name
+
+    def pause(self):
+        self.started.pop(self.name, None)
+
+    def resume(self):
+        self.started[self.name] = time.monotonic()
+
+
+_call_clock = ContextVar('fetch_call_clock', default=None)
+
+
+def _status_code(error):
+    return getattr(getattr(error, 'response', None), 'status_code', None)
+
+
+def is_throttled(error):
+    """Whether an exception looks like a rate limit response (HTTP 429 or yfinance's rate limit error)."""
+    return 'RateLimit' in type(error).__name__ or _status_code(error) == 429 or 'Too Many Requests' in str(error)
+
+
+def is_transient(error):
+    """Whether a failed call is worth retrying: throttling, network errors, 5xx responses and garbled bodies."""
+    if is_throttled(error) or isinstance(error, (OSError, json.JSONDecodeError)):
+        return True
+    status = _status_code(error)
+    return status is not None and status >= 500
+
+
+class FetchScheduler:
+    """
+    Gate for every upstream call of a process. A token bucket limits the sustained call rate, a
+    concurrency cap limits the calls in flight, and waiting calls are served by priority
+    (interactive requests before batch work), in arrival order within a priority. Failed calls
+    are retried with jittered exponential backoff, and a rate limited response pauses all calls
+    for the backoff delay.
+
+    Attributes:
+        rate (float): Sustained calls per second, None for no limit
+        burst (int): Bucket size, i.e. calls that may start at once after a quiet period
+        max_concurrency (int): Maximum number of calls in flight
+        max_retries (int): Retries of throttled and transient failures
+        backoff (float): Seconds before the first retry; doubled for every further retry
+        max_backoff (float): Upper bound of the backoff delay
+    """
+
+    def __init__(self, rate=DEFAULT_RATE, burst=DEFAULT_BURST, max_concurrency=DEFAULT_MAX_CONCURRENCY,
+                 max_retries=DEFAULT_MAX_RETRIES, backoff=DEFAULT_BACKOFF, max_backoff=DEFAULT_MAX_BACKOFF):
+        self.rate = rate or None
+        self.burst = max(1, burst)
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+
+        self._tokens = float(self.burst)
+        self._refilled = time.monotonic()
+        self._paused_until = 0.0
+        self._active = 0
+        self._waiting = []  # Heap of (priority, arrival) of queued calls
+        self._arrivals = itertools.count()
+        self._condition = threading.Condition()
+
+    def _refill(self, now):
+        if self.rate is not None:
+            self._tokens = min(self.burst, self._tokens + (now - self._refilled) * self.rate)
+        self._refilled = now
+
+    def _acquire(self, level):
+        with self._condition:
+            entry = (level, next(self._arrivals))
+            heapq.heappush(self._waiting, entry)
+            while True:
+                now = time.monotonic()
+                self._refill(now)
+                has_token = self.rate is None or self._tokens >= 1
+                if (self._waiting[0] == entry and has_token and self._active < self.max_concurrency
+                        and now >= self._paused_until):
+                    heapq.heappop(self._waiting)
+                    self._active += 1
+                    if self.rate is not None:
+                        self._tokens -= 1
+                    self._condition.notify_all()  # The next call in line may be able to start too
+                    return
+                # Woken up by a finished call, or when the next token or the end of a pause is due
+                waits = [self._paused_until - now] if now < self._paused_until else []
+                if not has_token:
+                    waits.append((1 - self._tokens) / self.rate)
+                self._condition.wait(max(waits) if waits else None)
+
+    def _release(self):
+        with self._condition:
+            self._active -= 1
+            self._condition.notify_all()
+
+    def pause(self, seconds):
+        """Holds back every call for `seconds`, e.g. after a rate limited response."""
+        with self._condition:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    def backoff_delay(self, attempt):
+        """Delay before retry number `attempt + 1`: half fixed and half random, so retries spread out."""
+        delay = min(self.max_backoff, self.backoff * 2 ** attempt)
+        return delay / 2 + random.uniform(0, delay / 2)
+
+    def call(self, fetch, kind, target, is_empty=None):
+        """
+        Runs `fetch()` when the rate limit, the concurrency cap and the priority of the caller allow,
+        retrying throttled and transient failures.
+
+        :param fetch: A zero-argument callable making one upstream call.
+        :param kind: The call kind for metrics and errors, e.g. `cashflow` or `history:max`.
+        :param target: What is fetched, e.g. the ticker, for error messages.
+        :param is_empty: Optional predicate marking empty responses, which are retried once.
+        :return: The result of `fetch()`.
+        :raises: UpstreamError when retries are exhausted or the response stays empty; other
+                 exceptions of `fetch()` are raised as they are.
+        """
+        level = _priority.get()
+        clock = _call_clock.get()
+        for attempt in itertools.count():
+            if clock is not None:
+                clock.pause()
+            queued = time.monotonic()
+            self._acquire(level)
+            metrics.observe('upstream.queue', time.monotonic() - queued)
+            if clock is not None:
+                clock.resume()
+
+            error = None
+            try:
+                result = fetch()
+            except Exception as e:
+                error = e
+            finally:
+                self._release()
+
+            if error is None and not (is_empty is not None and is_empty(result)):
+                metrics.increment('dcf_fetch_attempts_total', kind=kind, result='ok')
+                return result
+            if error is None:
+                metrics.increment('dcf_fetch_attempts_total', kind=kind, result='empty')
+                if attempt >= EMPTY_RETRIES:
+                    raise UpstreamError(f"Empty '{kind}' response for '{target}' after {attempt + 1} attempts "
+                                        f"(no data, or rate limited).")
+            elif not is_transient(error):
+                metrics.increment('dcf_fetch_attempts_total', kind=kind, result='error')
+                raise error
+            else:
+                metrics.increment('dcf_fetch_attempts_total', kind=kind, result='retryable_error')
+                if attempt >= self.max_retries:
+                    raise UpstreamError(f"'{kind}' for '{target}' failed after {attempt + 1} attempts: "
+                                        f"{type(error).__name__}: {error}") from error
+
+            delay = self.backoff_delay(attempt)
+            if error is not None and is_throttled(error):
+                metrics.increment('dcf_fetch_throttled_total')
+                self.pause(delay)
+            if clock is not None:
+                clock.pause()  # Backing off counts as queueing, not against the call's timeout
+            time.sleep(delay)
+
+    @property
+    def in_flight(self):
+        with self._condition:
+            return self._active
+
+    @property
+    def queued(self):
+        """Number of waiting calls by priority."""
+        with self._condition:
+            counts = Counter(level for level, _ in self._waiting)
+        return {(('priority', 'interactive' if level == INTERACTIVE else 'batch' if level == BATCH else level),): count
+                for level, count in counts.items()}
+
+    @property
+    def tokens(self):
+        with self._condition:
+            self._refill(time.monotonic())
+            return self._tokens if self.rate is not None else float(self.burst)
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def configure(**limits):
+    """
+    Replaces the process-wide scheduler, e.g. configure(rate=2, max_concurrency=4).
+    Unspecified limits come from the DCF_FETCH_* environment variables or the defaults.
+    """
+    global _scheduler
+    settings = {
+        'rate': float(os.environ.get('DCF_FETCH_RATE', DEFAULT_RATE)),
+        'burst': int(os.environ.get('DCF_FETCH_BURST', DEFAULT_BURST)),
+        'max_concurrency': int(os.environ.get('DCF_FETCH_CONCURRENCY', DEFAULT_MAX_CONCURRENCY)),
+        'max_retries': int(os.environ.get('DCF_FETCH_RETRIES', DEFAULT_MAX_RETRIES)),
+    }
+    settings.update(limits)
+    scheduler = FetchScheduler(**settings)
+    with _scheduler_lock:
+        _scheduler = scheduler
+    metrics.register_gauge('dcf_fetch_in_flight', lambda: scheduler.in_flight)
+    metrics.register_gauge('dcf_fetch_queued', lambda: scheduler.queued)
+    metrics.register_gauge('dcf_fetch_tokens', lambda: scheduler.tokens)
+    return scheduler
+
+
+def get_scheduler():
+    """Returns the process-wide scheduler, configured from the environment on first use."""
+    with _scheduler_lock:
+        scheduler = _scheduler
+    return scheduler or configure()
+
+
+def configure_process_share(processes):
+    """
+    Gives this process its share of the rate limit and burst when `processes` processes call
+    upstream at once, e.g. the workers of a WSGI server, so together they keep to the configured
+    limits. Call it once per process.
+    """
+    scheduler = get_scheduler()
+    return configure(rate=(scheduler.rate or 0) / processes, burst=max(1, scheduler.burst // processes),
+                     max_concurrency=scheduler.max_concurrency, max_retries=scheduler.max_retries)
+
+
+def configure_batch_process(processes):
+    """
+    Sets up one of `processes` worker processes of a bulk run: its share of the rate limit and
+    burst, and batch priority.
+    """
+    configure_process_share(processes)
+    _priority.set(BATCH)
+
+
+def _is_empty(value):
+    return value is None or len(value) == 0
+
+
+def fetch_ticker_attribute(ticker, attribute):
+    """
+    Downloads one yfinance Ticker attribute such as `info`, `cashflow`, `balance_sheet` or `income_stmt`.
+    Every upstream call in the application goes through this module so it can be counted and
+    scheduled within the rate limits.
+
+    :raises: UpstreamError if the call keeps failing or the response stays empty.
+    """
+    import yfinance as yf  # Loaded on the first download; cached data never needs it
+
+    def fetch():
+        _record(attribute)
+        with metrics.span(f'upstream.{attribute}'):
+            return getattr(yf.Ticker(ticker), attribute)
+
+    return get_scheduler().call(fetch, attribute, ticker, is_empty=_is_empty)
+
+
+def fetch_history(ticker, period):
+    """
+    Downloads the price history of a ticker for the given yfinance period, e.g. `5d` or `max`.
+    An empty history is returned as it is: short periods are legitimately empty on holidays.
+
+    :raises: UpstreamError if the call keeps failing.
+    """
+    import yfinance as yf
+
+    def fetch():
+        _record(f'history:{period}')
+        with metrics.span('upstream.history'):
+            return yf.Ticker(ticker).history(period=period)
+
+    return get_scheduler().call(fetch, f'history:{period}', ticker)
+
+
+def fetch_concurrently(calls, max_workers=DEFAULT_MAX_WORKERS, timeout=DEFAULT_TIMEOUT):
+    """
+    Runs independent fetch calls in a bounded thread pool so a stage takes about as long
+    as its slowest call rather than the sum of all of them.
+
+    :param calls: A dictionary mapping a call name to a zero-argument callable.
+    :param max_workers: Maximum number of calls in flight at once.
+    :param timeout: Seconds each call may run, measured from the moment it starts.
+    :return: A dictionary mapping each call name to its result.
+    :raises: FetchError naming every call that failed or timed out.
+    """
+    started = {}  # Start of each running call; calls queued by the fetch scheduler are left out
+
+    def run(name, call):
+        started[name] = time.monotonic()
+        _call_clock.set(_CallClock(started, name))
+        return call()
+
+    results, failures = {}, {}
+    executor = ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(calls))), thread_name_prefix='fetch')
+    try:
+        # Each call runs in a copy of the caller's context so request-scoped counters keep counting
+        futures = {executor.submit(copy_context().run, run, name, call): name for name, call in calls.items()}
+        pending = set(futures)
+        while pending:
+            now = time.monotonic()
+            starts = [started.get(futures[future]) for future in pending]
+            deadlines = [start + timeout for start in starts if start is not None]
+            wait_for = max(0, min(deadlines) - now) if deadlines else timeout
+            done, pending = wait(pending, timeout=wait_for, return_when=FIRST_COMPLETED)
+
+            for future in done:
+                name = futures[future]
+                try:
+                    results[name] = future.result()
+                except Exception as e:
+                    failures[name] = e
+
+            now = time.monotonic()
+            for future in list(pending):
+                name = futures[future]
+                start = started.get(name)
+                if start is not None and now - start >= timeout:
+                    failures[name] = TimeoutError(f"no response after {timeout}s")
+                    pending.discard(future)
+    finally:
+        # Timed-out calls cannot be interrupted; let them finish in the background
+        executor.shutdown(wait=not failures, cancel_futures=True)
+
+    if failures:
+        raise FetchError(failures, len(calls))
+    return results
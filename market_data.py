@@ -0,0 +1,152 @@
+import threading
+from collections import defaultdict
+from datetime import datetime, timedelta
+from functools import partial
+from zoneinfo import ZoneInfo
+import metrics
+from cache import get_default_cache
+from providers import get_default_provider
+
+MARKET_TIMEZONE = ZoneInfo('America/New_York')
+RISK_FREE_TICKER = '^TNX'  # 10-year Treasury yield
+RISK_FREE_RATE = 'risk_free_rate'
+MARKET_RETURN = 'market_return'
+
+# Values already resolved in this process, keyed by (ticker, dataset) -> (trading day, value)
+_memo = {}
+# One lock per (ticker, dataset) so different inputs can be resolved concurrently
+_locks = defaultdict(threading.Lock)
+_locks_guard = threading.Lock()
+
+
+def trading_day(timestamp=None):
+    """
+    Returns the US trading day a timestamp belongs to. Weekends roll back to the preceding Friday,
+    so market inputs computed on Friday are reused until Monday.
+
+    Args:
+        timestamp (float): POSIX timestamp; defaults to now
+
+    Returns:
+        date: The trading day
+    """
+    moment = datetime.fromtimestamp(timestamp, MARKET_TIMEZONE) if timestamp is not None else datetime.now(MARKET_TIMEZONE)
+    day = moment.date()
+    if day.weekday() >= 5:
+        day -= timedelta(days=day.weekday() - 4)
+    return day
+
+
+def _lock_for(key):
+    with _locks_guard:
+        return _locks[key]
+
+
+def _revalidate(ticker, dataset, compute, cache, today):
+    # Computed outside the lock so requests keep getting the stale value in the meantime
+    value = compute()
+    with _lock_for((ticker, dataset)):
+        cache.set(ticker, dataset, value)
+        _memo[(ticker, dataset)] = (today, value)
+
+
+def _shared_value(ticker, dataset, compute, cache, serve_stale=True, provider=None):
+    """
+    Resolves a market input at most once per trading day. Values are memoized in-process and
+    persisted in the shared cache so other requests and worker processes reuse them. A value
+    from an earlier trading day is served as it is when the cache has a revalidator, which
+    recomputes it in the background. Inputs of providers that are not cacheable are only
+    memoized, per provider.
+    """
+    cache = cache or get_default_cache()
+    provider = provider or get_default_provider()
+    today = trading_day()
+    key = (ticker, dataset)
+
+    if not provider.cacheable:
+        key = (provider.name, provider.version, ticker, dataset)
+        with _lock_for(key):
+            memoized = _memo.get(key)
+            if memoized is None or memoized[0] != today:
+                metrics.increment('dcf_market_data_requests_total', input=dataset, result='provider')
+                _memo[key] = (today, compute())
+            else:
+                metrics.increment('dcf_market_data_requests_total', input=dataset, result='memo')
+            return _memo[key][1]
+
+    with _lock_for(key):
+        memoized = _memo.get(key)
+        if memoized is not None and memoized[0] == today:
+            metrics.increment('dcf_market_data_requests_total', input=dataset, result='memo')
+            return memoized[1]
+
+        entry = cache.get_entry(ticker, dataset)
+        if entry is not None and (cache.offline or trading_day(entry[1]) == today):
+            metrics.increment('dcf_market_data_requests_total', input=dataset, result='hit')
+            value = entry[0]
+        elif cache.offline:
+            raise RuntimeError(f"No cached '{dataset}' data for '{ticker}' and the cache is offline.")
+        elif entry is not None and serve_stale and cache.revalidator is not None:
+            metrics.increment('dcf_market_data_requests_total', input=dataset, result='stale')
+            cache.revalidator.schedule((ticker, dataset), partial(_revalidate, ticker, dataset, compute, cache, today))
+            return entry[0]
+        else:
+            metrics.increment('dcf_market_data_requests_total', input=dataset, result='miss')
+            with metrics.span(f'market_data.{dataset}'):
+                value = compute()
+            cache.set(ticker, dataset, value)
+
+        _memo[key] = (today, value)
+        return value
+
+
+def get_risk_free_rate(cache=None, serve_stale=True, provider=None):
+    """
+    Returns the 10-year Treasury yield as a proxy for the risk-free rate,
+    downloaded at most once per trading day.
+
+    Args:
+        provider (DataProvider): Source of the yield history. Defaults to the process-wide provider.
+
+    Returns:
+        float: The risk-free rate
+    """
+    provider = provider or get_default_provider()
+
+    def compute():
+        periods = ['1d', '5d', '1mo', '3mo']
+        for period in periods:
+            try:
+                return float(provider.history(RISK_FREE_TICKER, period)['Close'].iloc[-1] / 100)
+            except IndexError:
+                pass
+        raise ValueError("No risk free rate data available")
+
+    return _shared_value(RISK_FREE_TICKER, RISK_FREE_RATE, compute, cache, serve_stale, provider)
+
+
+def get_historical_market_return(ticker="^GSPC", cache=None, serve_stale=True, provider=None):
+    """
+    Calculates the average historical yearly return of a given index,
+    downloading and resampling its full history at most once per trading day.
+
+    Args:
+        ticker (str): The ticker symbol of the index. Defaults to "^GSPC".
+        provider (DataProvider): Source of the index history. Defaults to the process-wide provider.
+
+    Returns:
+        float: The historical market return
+    """
+    provider = provider or get_default_provider()
+
+    def compute():
+        historical_data = provider.history(ticker, "max")
+
+        # Ensure that the 'Close' column is available
+        if 'Close' not in historical_data.columns:
+            raise ValueError("The selected ticker does not contain 'Close' data.")
+
+        yearly_returns = historical_data['Close'].resample('YE').ffill().pct_change().dropna()
+        return float(yearly_returns.mean())
+
+    return _shared_value(ticker, MARKET_RETURN, compute, cache, serve_stale, provider)
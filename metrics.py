@@ -0,0 +1,174 @@
+import os
+import threading
+import time
+from collections import defaultdict
+from contextvars import ContextVar
+
+# Set DCF_METRICS=0 to turn instrumentation into no-ops
+ENABLED = os.environ.get('DCF_METRICS', '1') not in ('0', 'false')
+
+STAGE_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+COUNTER_HELP = {
+    'dcf_upstream_calls_total': 'Upstream (Yahoo Finance) calls by call kind',
+    'dcf_data_cache_requests_total': 'Company data cache lookups by dataset and result',
+    'dcf_market_data_requests_total': 'Shared market input lookups by input and result',
+    'dcf_result_cache_requests_total': 'Valuation result cache lookups by result',
+    'dcf_refresh_total': 'Background refreshes by result',
+    'dcf_coalesced_requests_total': 'Requests that computed (leader) or shared (follower) an in-flight result',
+    'dcf_fetch_attempts_total': 'Upstream call attempts of the fetch scheduler by call kind and result',
+    'dcf_fetch_throttled_total': 'Upstream responses that looked rate limited',
+}
+
+GAUGE_HELP = {
+    'dcf_fetch_in_flight': 'Upstream calls currently running',
+    'dcf_fetch_queued': 'Upstream calls waiting for a slot or a rate limit token, by priority',
+    'dcf_fetch_tokens': 'Rate limit tokens currently available',
+}
+
+_lock = threading.Lock()
+_counters = defaultdict(float)  # (name, labels) -> value
+_stage_counts = defaultdict(lambda: [0] * (len(STAGE_BUCKETS) + 1))  # stage -> per-bucket counts
+_stage_sums = defaultdict(float)
+_gauges = {}  # name -> callable returning a value or a dictionary of {labels: value}
+
+# Spans recorded during the current request, for the Server-Timing header
+_request_spans = ContextVar('request_spans', default=None)
+
+
+class _Span:
+    __slots__ = ('name', 'start')
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        observe(self.name, time.perf_counter() - self.start)
+        return False
+
+
+class _NoopSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+def span(name):
+    """
+    Times the enclosed block as pipeline stage `name`.
+
+    Usage:
+        with metrics.span('wacc'):
+            ...
+    """
+    return _Span(name) if ENABLED else _NOOP_SPAN
+
+
+def observe(stage, seconds):
+    """Records one duration for a stage in the histogram and in the current request's spans."""
+    if not ENABLED:
+        return
+    with _lock:
+        counts = _stage_counts[stage]
+        for i, bound in enumerate(STAGE_BUCKETS):
+            if seconds <= bound:
+                counts[i] += 1
+                break
+        else:
+            counts[-1] += 1
+        _stage_sums[stage] += seconds
+    spans = _request_spans.get()
+    if spans is not None:
+        spans.append((stage, seconds))
+
+
+def increment(name, amount=1, **labels):
+    """Increments a counter, e.g. increment('dcf_result_cache_requests_total', result='hit')."""
+    if not ENABLED:
+        return
+    key = (name, tuple(sorted(labels.items())))
+    with _lock:
+        _counters[key] += amount
+
+
+def register_gauge(name, callback):
+    """
+    Exposes a value read at scrape time, e.g. register_gauge('dcf_fetch_in_flight', lambda: scheduler.in_flight).
+    The callback may return a number or a dictionary mapping label dictionaries (as sorted item
+    tuples) to numbers.
+    """
+    if not ENABLED:
+        return
+    with _lock:
+        _gauges[name] = callback
+
+
+def start_request():
+    """Starts collecting spans for the current request context."""
+    if ENABLED:
+        _request_spans.set([])
+
+
+def server_timing():
+    """
+    Returns a Server-Timing header value for the spans of the current request, with the
+    durations of repeated stages summed, or None when nothing was recorded.
+    """
+    spans = _request_spans.get()
+    if not spans:
+        return None
+    totals = defaultdict(float)
+    for stage, seconds in spans:
+        totals[stage] += seconds
+    return ', '.join(f'{stage};dur={seconds * 1e3:.1f}' for stage, seconds in totals.items())
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{key}="{value}"' for key, value in labels) + '}'
+
+
+def render_prometheus():
+    """Renders every counter, gauge and stage histogram in the Prometheus text exposition format."""
+    lines = []
+    with _lock:
+        counters = dict(_counters)
+        stage_counts = {stage: list(counts) for stage, counts in _stage_counts.items()}
+        stage_sums = dict(_stage_sums)
+        gauges = dict(_gauges)
+
+    by_name = defaultdict(list)
+    for (name, labels), value in sorted(counters.items()):
+        by_name[name].append((labels, value))
+    for name, samples in by_name.items():
+        lines.append(f'# HELP {name} {COUNTER_HELP.get(name, name)}')
+        lines.append(f'# TYPE {name} counter')
+        lines.extend(f'{name}{_format_labels(labels)} {value:g}' for labels, value in samples)
+
+    for name, callback in sorted(gauges.items()):
+        values = callback()
+        lines.append(f'# HELP {name} {GAUGE_HELP.get(name, name)}')
+        lines.append(f'# TYPE {name} gauge')
+        samples = sorted(values.items()) if isinstance(values, dict) else [((), values)]
+        lines.extend(f'{name}{_format_labels(labels)} {value:g}' for labels, value in samples)
+
+    lines.append('# HELP dcf_stage_seconds Time spent in each valuation pipeline stage')
+    lines.append('# TYPE dcf_stage_seconds histogram')
+    for stage in sorted(stage_counts):
+        cumulative = 0
+        for bound, count in zip(STAGE_BUCKETS + ('+Inf',), stage_counts[stage]):
+            cumulative += count
+            lines.append(f'dcf_stage_seconds_bucket{{stage="{stage}",le="{bound}"}} {cumulative}')
+        lines.append(f'dcf_stage_seconds_sum{{stage="{stage}"}} {stage_sums[stage]:.6f}')
+        lines.append(f'dcf_stage_seconds_count{{stage="{stage}"}} {cumulative}')
+    return '\n'.join(lines) + '\n'
@@ -1,19 +1,132 @@
+import threading
+from collections import OrderedDict
 import numpy as np
 from keys import FinStatement, FinKeys
+from statements import StatementStore
+
+DEFAULT_LOW_THRESHOLD = 25
+DEFAULT_HIGH_THRESHOLD = 75
+
+# ProjectAssumptions per (ticker, data version), shared by every model and request
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+CACHE_SIZE = 256
+
+
+def growth_statistics(values, low_threshold=DEFAULT_LOW_THRESHOLD, high_threshold=DEFAULT_HIGH_THRESHOLD,
+                      lengths=None):
+    """
+    Average year-over-year growth of every row of a matrix, keeping only the changes between the
+    low and high percentiles of each row. Unreported years are carried forward, like pandas'
+    `pct_change`.
+
+    :param values: (line items, years) matrix, oldest year first, NaN where not reported.
+    :param lengths: Number of years of every row when rows are padded to a common width.
+    :return: (means, changes, kept) arrays of shape (line items,): the filtered mean growth (NaN
+             when undefined), the number of year-over-year changes and the number kept.
+    """
+    years = values.shape[1]
+    reported = ~np.isnan(values)
+    last_reported = np.maximum.accumulate(np.where(reported, np.arange(years), 0), axis=1)
+    filled = np.take_along_axis(values, last_reported, axis=1)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        growth = filled[:, 1:] / filled[:, :-1] - 1
+    valid = ~np.isnan(growth)
+    if lengths is not None:
+        valid &= np.arange(1, years) < lengths[:, None]  # Carried-forward padding is no change
+        growth = np.where(valid, growth, np.nan)
+    changes = valid.sum(axis=1)
+
+    if growth.shape[1] == 0:
+        return np.full(len(values), np.nan), changes, changes
+    lower = _row_percentile(growth, changes, low_threshold)
+    upper = _row_percentile(growth, changes, high_threshold)
+    with np.errstate(invalid='ignore'):
+        keep = valid & (growth >= lower[:, None]) & (growth <= upper[:, None])
+    kept = keep.sum(axis=1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        means = np.where(keep, growth, 0).sum(axis=1) / kept
+    return means, changes, kept
+
+
+def _row_percentile(values, counts, q):
+    """
+    np.percentile (linear method) of the non-NaN values of every row, NaN for empty rows.
+    np.nanpercentile does the same but loops over the rows in Python.
+    """
+    ordered = np.sort(values, axis=1)  # NaN sorts last
+    position = q / 100 * np.maximum(counts - 1, 0)
+    below = np.floor(position).astype(np.intp)
+    above = np.minimum(below + 1, np.maximum(counts - 1, 0))
+    rows = np.arange(len(values))
+    a, b = ordered[rows, below], ordered[rows, above]
+    t = position - below
+    # Same interpolation as NumPy's, so values on a percentile boundary are kept or dropped alike
+    with np.errstate(invalid='ignore'):
+        difference = b - a
+        result = np.where(t >= 0.5, b - difference * (1 - t), a + difference * t)
+    return np.where(counts > 0, result, np.nan)
+
 
 class ProjectAssumptions:
+    """
+    Projection assumptions of one company, computed for every line item of all three statements
+    at once: filtered year-over-year growth rates, averages and latest values, and the margins and
+    tax rate the models are built on. Growth statistics are computed in one vectorized pass per
+    statement the first time they are needed; use ProjectAssumptions.for_company() to share them
+    between models and requests for as long as the company data does not change.
+    """
+
     def __init__(self, financial_data=None):
         """
         Initializes the ProjectAssumptions class with financial data.
 
-        :param financial_data: A dictionary containing financial data, 
+        :param financial_data: A StatementStore, or a dictionary containing financial data
                                where keys are FinancialStatement enum values.
         """
-        self.financial_data = financial_data or {}
-    
-    def calculate_growth_rate(self, statement: FinStatement, key: FinKeys, low_threshold: float = 25, high_threshold: float = 75):
+        if not isinstance(financial_data, StatementStore):
+            financial_data = StatementStore.from_frames(financial_data or {})
+        self.statements = financial_data
+        # Growth statistics per (low_threshold, high_threshold): {(statement, key): (mean, changes, kept)}
+        self._growth = {}
+        self._means = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def for_company(cls, company):
+        """Returns the shared assumptions of a company, computed once per company data version."""
+        key = (company.ticker.upper(), company.data_version)
+        with _cache_lock:
+            assumptions = _cache.get(key)
+            if assumptions is not None:
+                _cache.move_to_end(key)
+                return assumptions
+        assumptions = cls(company.statements)
+        with _cache_lock:
+            assumptions = _cache.setdefault(key, assumptions)
+            while len(_cache) > CACHE_SIZE:
+                _cache.popitem(last=False)
+        return assumptions
+
+    def growth_rates(self, low_threshold=DEFAULT_LOW_THRESHOLD, high_threshold=DEFAULT_HIGH_THRESHOLD):
+        """
+        Growth statistics of every line item, computed once per threshold pair.
+
+        :return: A dictionary mapping (statement, key) to (mean growth, changes, changes kept).
+        """
+        thresholds = (low_threshold, high_threshold)
+        with self._lock:
+            if thresholds not in self._growth:
+                items, values, lengths = self.statements.aligned()
+                self._growth[thresholds] = dict(zip(items, zip(*growth_statistics(values, *thresholds, lengths))))
+            return self._growth[thresholds]
+
+    def calculate_growth_rate(self, statement: FinStatement, key: FinKeys, low_threshold: float = DEFAULT_LOW_THRESHOLD,
+                              high_threshold: float = DEFAULT_HIGH_THRESHOLD):
         """
         Calculates the average growth rate for a given financial key within the specified thresholds.
+        The growth rates of all line items are computed together on first use and then looked up.
 
         :param statement: A FinancialStatement enum value representing the type of financial statement.
         :param key: A FinancialKeys enum value representing the specific financial metric.
@@ -21,22 +134,77 @@ class ProjectAssumptions:
         :param high_threshold: The upper percentile threshold for filtering growth rates.
         :return: The average filtered growth rate.
         :raises: KeyError if the financial key is not found in the data.
-                 ValueError if no growth rates fall within the specified thresholds.
-        """
-        try:
-            # Ensure the data is in numerical format
-            data = self.financial_data[statement.value].loc[key.value].astype(float).sort_index(ascending=True)
-            yoy_growth = data.pct_change().dropna()
-
-            lower, upper = np.percentile(yoy_growth, [low_threshold, high_threshold])
-            filtered_growth = yoy_growth[(yoy_growth >= lower) & (yoy_growth <= upper)]
-            
-            if filtered_growth.empty:
-                raise ValueError("No growth rates within the specified thresholds.")
-
-            return filtered_growth.mean()
-        
-        except KeyError:
+                 RuntimeError if there are no growth rates, or none within the specified thresholds.
+        """
+        stats = self.growth_rates(low_threshold, high_threshold).get((statement.value, key.value))
+        if stats is None:
+            raise KeyError(f"The key '{key.value}' does not exist in the '{statement.value}' data.")
+        mean, changes, kept = stats
+        if changes == 0:
+            raise RuntimeError("An error occurred while calculating the growth rate: no year-over-year changes.")
+        if kept == 0:
+            raise RuntimeError("An error occurred while calculating the growth rate: "
+                               "No growth rates within the specified thresholds.")
+        return mean
+
+    def latest(self, statement: FinStatement, key: FinKeys):
+        """The last reported value of a line item, or None if it is missing."""
+        return self.statements.latest(statement.value, key.value)
+
+    def required(self, statement: FinStatement, key: FinKeys):
+        """
+        The last reported value of a line item the projection cannot do without.
+
+        :raises: KeyError if the line item is missing.
+        """
+        value = self.latest(statement, key)
+        if value is None:
             raise KeyError(f"The key '{key.value}' does not exist in the '{statement.value}' data.")
-        except Exception as e:
-            raise RuntimeError(f"An error occurred while calculating the growth rate: {e}")
+        return value
+
+    def mean(self, statement: FinStatement, key: FinKeys):
+        """The average reported value of a line item, or None if it was never reported."""
+        with self._lock:
+            if self._means is None:
+                # Rows only hold values on their own statement's columns, so one pass covers all statements
+                store = self.statements
+                counts = store.mask.sum(axis=1)
+                with np.errstate(divide='ignore', invalid='ignore'):
+                    means = np.nansum(store.values, axis=1) / counts
+                self._means = {item: (mean if count else None) for item, mean, count in zip(store.items(), means, counts)}
+        return self._means.get((statement.value, key.value))
+
+    @property
+    def revenue(self):
+        """Latest revenue; raises KeyError if it is missing."""
+        return self.required(FinStatement.INCOME, FinKeys.REVENUE)
+
+    @property
+    def operating_margin(self):
+        """Latest operating income over latest revenue; raises KeyError if either is missing."""
+        return self._ratio(self.required(FinStatement.INCOME, FinKeys.OPERATING_INCOME), self.revenue)
+
+    @property
+    def fcf_margin(self):
+        """Average free cash flow over latest revenue; 0 without free cash flow data."""
+        fcf = self.mean(FinStatement.CASHFLOW, FinKeys.FREE_CASH_FLOW)
+        return self._ratio(fcf, self.revenue) if fcf is not None else 0
+
+    @property
+    def capex_to_revenue(self):
+        """Average absolute capital expenditure over latest revenue."""
+        capex = self.mean(FinStatement.CASHFLOW, FinKeys.CAPEX)
+        return self._ratio(abs(capex) if capex is not None else 0, self.revenue)
+
+    @property
+    def effective_tax_rate(self):
+        """Latest tax provision over latest pretax income; 0 when pretax income is zero or missing."""
+        tax_provision = self.latest(FinStatement.INCOME, FinKeys.TAX_PROVISION) or 0
+        pretax_income = self.latest(FinStatement.INCOME, FinKeys.PRETAX_INCOME) or 0
+        return tax_provision / pretax_income if pretax_income != 0 else 0
+
+    @staticmethod
+    def _ratio(numerator, denominator):
+        # A zero denominator gives inf or NaN, which BaseDCF.calculate_fcf() rejects
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.float64(numerator) / denominator
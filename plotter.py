@@ -1,13 +1,42 @@
+import os
+import plotly
 import plotly.graph_objs as go
 import plotly.io as pio
 from keys import FinKeys,FinStatement
 
+# The Plotly bundle shipped with the plotly package, served once as a cacheable static file
+PLOTLY_JS_DIR = os.path.join(os.path.dirname(plotly.__file__), 'package_data')
+PLOTLY_JS_FILENAME = 'plotly.min.js'
+PLOTLY_VERSION = plotly.__version__
+
 class Plotter:
-    def __init__(self, dcf_table=None, company=None):
+    def __init__(self, dcf_table=None, company=None, sensitivity_grid=None, comparison=None):
         self.dcf_table = dcf_table
         self.company = company
+        self.sensitivity_grid = sensitivity_grid
+        self.comparison = comparison
 
     def create_dcf_plot(self):
+        return self.to_json(self.dcf_figure())
+
+    def create_financial_metrics_plot(self):
+        return self.to_json(self.financial_metrics_figure())
+
+    def create_sensitivity_heatmap(self):
+        return self.to_json(self.sensitivity_figure())
+
+    def create_model_comparison_plot(self):
+        return self.to_json(self.model_comparison_figure())
+
+    @staticmethod
+    def to_json(fig):
+        """
+        Serializes a figure to compact JSON for `Plotly.newPlot` on the page. The Plotly library
+        itself is not embedded; templates load it once from the static PLOTLY_JS_FILENAME route.
+        """
+        return pio.to_json(fig, validate=False, pretty=False)
+
+    def dcf_figure(self):
         plot_data = self.dcf_table[self.dcf_table['Year'] != 'Terminal Value'].copy()
         trace1 = go.Scatter(
             x=plot_data['Year'],
@@ -75,11 +104,9 @@ class Plotter:
         fig.update_xaxes(fixedrange=True)  # Disable zoom on x-axis
         fig.update_yaxes(fixedrange=True)  # Disable zoom on y-axis
         fig.update_traces(marker=dict(size=8), selector=dict(mode='markers'))
+        return fig
 
-        plot_html = pio.to_html(fig, full_html=False)
-        return plot_html
-
-    def create_financial_metrics_plot(self):
+    def financial_metrics_figure(self):
         if self.company is None:
             raise ValueError("Company data is not provided")
 
@@ -141,7 +168,60 @@ class Plotter:
             margin=dict(l=40, r=40, t=80, b=40),  # Slightly reduce top margin
             dragmode=False  
         )
+        return fig
+
+    def sensitivity_figure(self):
+        if self.sensitivity_grid is None:
+            raise ValueError("Sensitivity grid is not provided")
 
-        # Generate the HTML for the plot
-        plot_html = pio.to_html(fig, full_html=False)
-        return plot_html
+        grid = self.sensitivity_grid
+        fig = go.Figure(data=go.Heatmap(
+            x=grid.columns * 100,
+            y=grid.index * 100,
+            z=grid.values,
+            colorscale='RdYlGn',
+            colorbar=dict(title='Price ($)'),
+            hovertemplate='Discount rate %{y:.2f}%<br>Terminal growth %{x:.2f}%<br>Price $%{z:.2f}<extra></extra>'
+        ))
+
+        fig.update_layout(
+            xaxis=dict(title='Terminal Growth Rate (%)', fixedrange=True),
+            yaxis=dict(title='Discount Rate (%)', fixedrange=True),
+            plot_bgcolor='rgba(0,0,0,0)',
+            paper_bgcolor='rgba(0,0,0,0)',
+            font=dict(color='black', size=12),
+            margin=dict(l=40, r=40, t=40, b=40),
+            dragmode=False
+        )
+        return fig
+
+    def model_comparison_figure(self):
+        if self.comparison is None:
+            raise ValueError("Model comparison is not provided")
+
+        prices = self.comparison['Intrinsic Share Price ($)'].dropna()
+        fig = go.Figure(data=go.Bar(
+            x=prices.index,
+            y=prices.values,
+            marker=dict(color='royalblue'),
+            text=[f"${price:.2f}" for price in prices.values],
+            textposition='outside',
+            hovertemplate='%{x}<br>Intrinsic price $%{y:.2f}<extra></extra>'
+        ))
+
+        # Current market price for reference
+        if self.company is not None and self.company.market_cap and self.company.shares_outstanding:
+            market_price = self.company.market_cap / self.company.shares_outstanding
+            fig.add_hline(y=market_price, line=dict(color='firebrick', dash='dash'),
+                          annotation_text=f"Market price ${market_price:.2f}", annotation_position='top left')
+
+        fig.update_layout(
+            xaxis=dict(title='Model', fixedrange=True),
+            yaxis=dict(title='Intrinsic Share Price ($)', showgrid=False, zeroline=False, fixedrange=True),
+            plot_bgcolor='rgba(0,0,0,0)',
+            paper_bgcolor='rgba(0,0,0,0)',
+            font=dict(color='black', size=12),
+            margin=dict(l=40, r=40, t=40, b=40),
+            dragmode=False
+        )
+        return fig
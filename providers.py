@@ -0,0 +1,361 @@
+"""
+Data providers: where company data and price histories come from.
+
+Company, the WACC market inputs and the backtest read every dataset through a DataProvider:
+  - YFinanceProvider downloads from Yahoo Finance (the default); its results go through the data cache;
+  - LocalProvider reads bulk dumps for thousands of tickers from memory-mapped NumPy files, loading
+    only the rows of the tickers asked for, so screeners and backtests run offline at disk speed;
+  - CacheProvider reads what an earlier run left in the data cache, e.g. to export it.
+
+The default provider is chosen with the DCF_PROVIDER environment variable (`yfinance` or `local`,
+the latter reading DCF_LOCAL_DATA_PATH).
+
+Usage:
+    python providers.py export tickers.txt data/bulk            # download and write a local dataset
+    python providers.py export tickers.txt data/bulk --from-cache
+    DCF_PROVIDER=local DCF_LOCAL_DATA_PATH=data/bulk python screener.py tickers.txt --output results.csv
+"""
+import argparse
+import json
+import os
+import threading
+import time
+from abc import ABC, abstractmethod
+import numpy as np
+import fetch
+from cache import INFO, PRICE_HISTORY, get_default_cache
+from keys import FinKeys, FinStatement
+
+STATEMENTS = [FinStatement.CASHFLOW.value, FinStatement.BALANCE_SHEET.value, FinStatement.INCOME.value]
+DATASETS = [INFO] + STATEMENTS
+
+# yfinance Ticker attribute backing each dataset
+DATASET_ATTRIBUTES = {
+    INFO: 'info',
+    FinStatement.CASHFLOW.value: 'cashflow',
+    FinStatement.BALANCE_SHEET.value: 'balance_sheet',
+    FinStatement.INCOME.value: 'income_stmt',
+}
+
+# `info` fields a Company keeps, by type: a local dataset stores only these
+INFO_TEXT_FIELDS = ('longName', 'industry', 'sector')
+INFO_NUMBER_FIELDS = ('marketCap', 'enterpriseValue', 'beta', FinKeys.SHARES_OUTSTANDING.value)
+
+# How far back each yfinance history period reaches
+HISTORY_PERIODS = {'1d': 'D', '5d': '5D', '1mo': 'MS', '3mo': '3MS', '6mo': '6MS', '1y': 'YS', 'max': None}
+
+
+class DataProvider(ABC):
+    """
+    Source of company datasets and price histories, in the yfinance layout: `info` is a dictionary,
+    statements are DataFrames with line items as rows and dates as columns (most recent first),
+    and histories are DataFrames with a 'Close' column indexed by date.
+
+    Attributes:
+        name (str): Identifies the provider, e.g. in memoized market inputs
+        cacheable (bool): Whether results should be kept in the data cache. Local providers are
+            read directly, as the cache would not be faster.
+    """
+    name = None
+    cacheable = True
+
+    @abstractmethod
+    def dataset(self, ticker, dataset):
+        """
+        Returns one dataset of a ticker: `info` or one of the FinStatement values.
+
+        :raises: KeyError if the provider has no data for the ticker.
+        """
+        pass
+
+    @abstractmethod
+    def history(self, ticker, period):
+        """Returns the price history of a ticker for a yfinance period such as `5d` or `max`."""
+        pass
+
+    @property
+    def version(self):
+        """
+        A POSIX timestamp that changes when the provider's data changes. It stands in for the
+        download time of the datasets of providers that are not cacheable.
+        """
+        return 0.0
+
+
+class YFinanceProvider(DataProvider):
+    """Downloads from Yahoo Finance through `fetch`, so every call is counted and timed."""
+    name = 'yfinance'
+
+    def dataset(self, ticker, dataset):
+        return fetch.fetch_ticker_attribute(ticker, DATASET_ATTRIBUTES[dataset])
+
+    def history(self, ticker, period):
+        return fetch.fetch_history(ticker, period)
+
+
+class CacheProvider(DataProvider):
+    """
+    Serves the datasets held in a DataCache regardless of their age, and price histories from the
+    `price_history` entries written by the backtest.
+    """
+    name = 'cache'
+    cacheable = False
+
+    def __init__(self, cache=None):
+        self.cache = cache or get_default_cache()
+
+    def dataset(self, ticker, dataset):
+        entry = self.cache.get_entry(ticker, dataset)
+        if entry is None:
+            raise KeyError(f"No cached '{dataset}' data for ticker '{ticker}'.")
+        return entry[0]
+
+    def history(self, ticker, period):
+        import pandas as pd
+        entry = self.cache.get_entry(ticker, PRICE_HISTORY)
+        if entry is None:
+            raise KeyError(f"No cached '{PRICE_HISTORY}' data for ticker '{ticker}'.")
+        return _trim_history(pd.DataFrame({'Close': entry[0]}), period)
+
+
+class LocalProvider(DataProvider):
+    """
+    Reads a bulk dataset written by `write_local_dataset`. Statements and `info` numbers are
+    memory-mapped arrays with one row per ticker, and `info` text and price histories memory-mapped
+    ragged arrays, so opening a dataset reads only its manifest, and each lookup reads only the rows
+    of one ticker.
+
+    Layout of the dataset directory:
+        manifest.json       row of every ticker, line items, `info` fields and the offsets of every
+                            price history
+        statements.npy      float64 (tickers, line items, periods), NaN where not reported
+        present.npy         bool (tickers, line items): whether the ticker reports the line item
+        periods.npy         datetime64[D] (tickers, statements, periods), most recent first, NaT padded
+        info_numbers.npy    float64 (tickers, INFO_NUMBER_FIELDS), NaN where missing
+        info_text.npy       int64 (tickers, INFO_TEXT_FIELDS, 2): start and end of every value in
+                            info_text.bin, -1 where missing
+        info_text.bin       UTF-8 `info` text values, concatenated
+        prices.f8           float64 closes of all histories, concatenated
+        price_dates.i8      datetime64[D] dates of all histories, concatenated
+    """
+    name = 'local'
+    cacheable = False
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, 'manifest.json')) as f:
+            manifest = json.load(f)
+        self.tickers = manifest['tickers']
+        self.line_items = [tuple(item) for item in manifest['line_items']]
+        self.histories = {ticker: tuple(span) for ticker, span in manifest['histories'].items()}
+        self._created = manifest['created']
+        if 'info_fields' not in manifest:
+            raise ValueError(f"{path} was written by an earlier version; export it again.")
+        self.info_number_fields = manifest['info_fields']['numbers']
+        self.info_text_fields = manifest['info_fields']['text']
+        self._rows = {statement: [i for i, (name, _) in enumerate(self.line_items) if name == statement]
+                      for statement in STATEMENTS}
+        self._statements = np.load(os.path.join(path, 'statements.npy'), mmap_mode='r')
+        self._present = np.load(os.path.join(path, 'present.npy'), mmap_mode='r')
+        self._periods = np.load(os.path.join(path, 'periods.npy'), mmap_mode='r')
+        self._prices = np.memmap(os.path.join(path, 'prices.f8'), dtype=np.float64, mode='r') \
+            if os.path.getsize(os.path.join(path, 'prices.f8')) else np.empty(0)
+        self._price_dates = np.memmap(os.path.join(path, 'price_dates.i8'), dtype='datetime64[D]', mode='r') \
+            if os.path.getsize(os.path.join(path, 'price_dates.i8')) else np.empty(0, dtype='datetime64[D]')
+        self._info_numbers = np.load(os.path.join(path, 'info_numbers.npy'), mmap_mode='r')
+        self._info_text_spans = np.load(os.path.join(path, 'info_text.npy'), mmap_mode='r')
+        self._info_text = np.memmap(os.path.join(path, 'info_text.bin'), dtype=np.uint8, mode='r') \
+            if os.path.getsize(os.path.join(path, 'info_text.bin')) else np.empty(0, dtype=np.uint8)
+
+    @property
+    def version(self):
+        return self._created
+
+    def _index(self, ticker):
+        try:
+            return self.tickers[ticker.upper()]
+        except KeyError:
+            raise KeyError(f"No local data for ticker '{ticker}' in {self.path}.")
+
+    def dataset(self, ticker, dataset):
+        import pandas as pd
+        i = self._index(ticker)
+        if dataset == INFO:
+            return self._info(i)
+
+        rows = [row for row in self._rows[dataset] if self._present[i, row]]
+        periods = self._periods[i, STATEMENTS.index(dataset)]
+        columns = np.flatnonzero(~np.isnat(periods))
+        values = np.asarray(self._statements[i])[np.ix_(rows, columns)]
+        return pd.DataFrame(values, index=pd.Index([self.line_items[row][1] for row in rows]),
+                            columns=pd.DatetimeIndex(periods[columns].astype('datetime64[ns]')))
+
+    def _info(self, i):
+        info = {field: float(value) for field, value in zip(self.info_number_fields, self._info_numbers[i])
+                if not np.isnan(value)}
+        for field, (start, end) in zip(self.info_text_fields, self._info_text_spans[i]):
+            if start >= 0:
+                info[field] = self._info_text[start:end].tobytes().decode('utf-8')
+        return info
+
+    def history(self, ticker, period):
+        import pandas as pd
+        try:
+            start, end = self.histories[ticker.upper()]
+        except KeyError:
+            raise KeyError(f"No local price history for ticker '{ticker}' in {self.path}.")
+        closes = pd.DataFrame({'Close': np.asarray(self._prices[start:end])},
+                              index=pd.DatetimeIndex(np.asarray(self._price_dates[start:end]).astype('datetime64[ns]')))
+        return _trim_history(closes, period)
+
+
+def _trim_history(history, period):
+    """Keeps the part of a history a yfinance period would return, counted back from its last date."""
+    import pandas as pd
+    if period not in HISTORY_PERIODS:
+        raise ValueError(f"Unsupported history period '{period}'")
+    if HISTORY_PERIODS[period] is None or history.empty:
+        return history
+    offset = pd.tseries.frequencies.to_offset(HISTORY_PERIODS[period])
+    start = history.index[-1] - offset if period != '1d' else history.index[-1]
+    return history[history.index >= start]
+
+
+def write_local_dataset(path, tickers, source, history_tickers=(), max_periods=8):
+    """
+    Writes a LocalProvider dataset for `tickers` from another provider. Statements and the `info`
+    fields a Company keeps are written ticker by ticker into memory-mapped arrays and histories
+    appended to the price files, so memory use does not grow with the number of tickers.
+
+    :param source: The DataProvider to read from.
+    :param history_tickers: Tickers whose price history is exported, e.g. the universe plus
+                            ^TNX and ^GSPC for WACC inputs and backtests.
+    :param max_periods: Statement columns kept per ticker, most recent first.
+    :return: A dictionary mapping every ticker that failed to its error.
+    """
+    os.makedirs(path, exist_ok=True)
+    tickers = [ticker.upper() for ticker in dict.fromkeys(tickers)]
+    line_items = [(statement, key.value) for statement in STATEMENTS for key in FinKeys]
+    rows = {item: i for i, item in enumerate(line_items)}
+
+    statements = np.lib.format.open_memmap(os.path.join(path, 'statements.npy'), mode='w+', dtype=np.float64,
+                                           shape=(len(tickers), len(line_items), max_periods))
+    present = np.lib.format.open_memmap(os.path.join(path, 'present.npy'), mode='w+', dtype=bool,
+                                        shape=(len(tickers), len(line_items)))
+    periods = np.lib.format.open_memmap(os.path.join(path, 'periods.npy'), mode='w+', dtype='datetime64[D]',
+                                        shape=(len(tickers), len(STATEMENTS), max_periods))
+    info_numbers = np.lib.format.open_memmap(os.path.join(path, 'info_numbers.npy'), mode='w+', dtype=np.float64,
+                                             shape=(len(tickers), len(INFO_NUMBER_FIELDS)))
+    info_text_spans = np.lib.format.open_memmap(os.path.join(path, 'info_text.npy'), mode='w+', dtype=np.int64,
+                                                shape=(len(tickers), len(INFO_TEXT_FIELDS), 2))
+    statements[:] = np.nan
+    periods[:] = np.datetime64('NaT')
+    info_numbers[:] = np.nan
+    info_text_spans[:] = -1
+
+    failures, rows_of_tickers = {}, {}
+    with open(os.path.join(path, 'info_text.bin'), 'wb') as info_text:
+        for i, ticker in enumerate(tickers):
+            try:
+                datasets = {dataset: source.dataset(ticker, dataset) for dataset in DATASETS}
+            except Exception as e:
+                failures[ticker] = f"{type(e).__name__}: {e}"
+                continue
+            rows_of_tickers[ticker] = i
+            info = datasets[INFO]
+            for f, field in enumerate(INFO_NUMBER_FIELDS):
+                if isinstance(info.get(field), (int, float)) and not isinstance(info[field], bool):
+                    info_numbers[i, f] = info[field]
+            for f, field in enumerate(INFO_TEXT_FIELDS):
+                if isinstance(info.get(field), str):
+                    start = info_text.tell()
+                    info_text.write(info[field].encode('utf-8'))
+                    info_text_spans[i, f] = (start, info_text.tell())
+            for s, statement in enumerate(STATEMENTS):
+                df = datasets[statement]
+                df = df.iloc[:, :max_periods]
+                periods[i, s, :df.shape[1]] = np.asarray(df.columns, dtype='datetime64[D]')
+                for key, values in zip(df.index, df.to_numpy()):
+                    row = rows.get((statement, key))
+                    if row is not None and not present[i, row]:
+                        present[i, row] = True
+                        statements[i, row, :df.shape[1]] = np.asarray(values, dtype=float)
+    for array in (statements, present, periods, info_numbers, info_text_spans):
+        array.flush()
+
+    histories = {}
+    with open(os.path.join(path, 'prices.f8'), 'wb') as prices, open(os.path.join(path, 'price_dates.i8'), 'wb') as dates:
+        offset = 0
+        for ticker in dict.fromkeys(ticker.upper() for ticker in history_tickers):
+            try:
+                closes = source.history(ticker, 'max')['Close'].dropna()
+            except Exception as e:
+                failures.setdefault(ticker, f"{type(e).__name__}: {e}")
+                continue
+            index = closes.index.tz_localize(None) if getattr(closes.index, 'tz', None) is not None else closes.index
+            closes.to_numpy(dtype=np.float64).tofile(prices)
+            np.asarray(index, dtype='datetime64[D]').tofile(dates)
+            histories[ticker] = (offset, offset + len(closes))
+            offset += len(closes)
+
+    with open(os.path.join(path, 'manifest.json'), 'w') as f:
+        json.dump({'tickers': rows_of_tickers, 'line_items': line_items, 'histories': histories,
+                   'info_fields': {'numbers': INFO_NUMBER_FIELDS, 'text': INFO_TEXT_FIELDS},
+                   'created': time.time()}, f)
+    return failures
+
+
+_default_provider = None
+_default_provider_lock = threading.Lock()
+
+
+def get_default_provider():
+    """
+    Returns the process-wide provider, configured from the DCF_PROVIDER (`yfinance` or `local`)
+    and DCF_LOCAL_DATA_PATH environment variables on first use.
+    """
+    global _default_provider
+    with _default_provider_lock:
+        if _default_provider is None:
+            kind = os.environ.get('DCF_PROVIDER', 'yfinance')
+            if kind == 'local':
+                _default_provider = LocalProvider(os.environ['DCF_LOCAL_DATA_PATH'])
+            elif kind == 'yfinance':
+                _default_provider = YFinanceProvider()
+            else:
+                raise ValueError(f"Unknown data provider '{kind}'")
+        return _default_provider
+
+
+def set_default_provider(provider):
+    """Replaces the process-wide provider, e.g. with a stub in load tests."""
+    global _default_provider
+    with _default_provider_lock:
+        _default_provider = provider
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    export = subparsers.add_parser('export', help='Write a local dataset')
+    export.add_argument('tickers_file', help='File with one ticker per line')
+    export.add_argument('path', help='Directory of the dataset')
+    export.add_argument('--from-cache', action='store_true', help='Read the data cache instead of downloading')
+    export.add_argument('--no-history', action='store_true', help='Skip price histories')
+    args = parser.parse_args()
+
+    from screener import read_tickers
+    tickers = read_tickers(args.tickers_file)
+    history_tickers = [] if args.no_history else tickers + ['^TNX', '^GSPC']
+    source = CacheProvider() if args.from_cache else YFinanceProvider()
+
+    start = time.perf_counter()
+    failures = write_local_dataset(args.path, tickers, source, history_tickers)
+    for ticker, error in failures.items():
+        print(f"[ERROR] {ticker}: {error}")
+    print(f"Exported {len(tickers) - len(set(failures) & set(tickers))} of {len(tickers)} tickers to {args.path} "
+          f"in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,198 @@
+"""
+Background refresh of cached company data and market inputs.
+
+RefreshScheduler serves two purposes:
+  - stale-while-revalidate: attached to a DataCache as its `revalidator`, expired entries are
+    served immediately and downloaded again in the background, at most once at a time per entry;
+  - off-hours prewarming: every day outside market hours, the data (and optionally the
+    valuations) of a watchlist is refreshed so the first request of the day finds a warm cache.
+
+All refreshes run in one bounded thread pool of `max_workers` threads. Each refresh downloads the
+datasets of a company concurrently, so the number of upstream calls is not bounded by
+`max_workers`: like every upstream call, they go through the fetch scheduler (fetch.py), which
+holds them to DCF_FETCH_CONCURRENCY calls in flight and DCF_FETCH_RATE calls per second, at batch
+priority behind interactive requests.
+
+Usage:
+    python refresh.py watchlist.txt            # prewarm the watchlist once, e.g. from cron
+"""
+import argparse
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+import fetch
+import market_data
+import metrics
+from cache import get_default_cache
+from company import Company
+
+try:
+    import fcntl
+except ImportError:  # Windows: no prewarm lock, every process prewarms
+    fcntl = None
+
+DEFAULT_MAX_WORKERS = 4
+# Hours (America/New_York) outside of which the watchlist is prewarmed: before 8:00 and from 18:00
+DEFAULT_MARKET_HOURS = (8, 18)
+DEFAULT_CHECK_INTERVAL = 300  # seconds between checks of the prewarm loop
+
+
+def read_watchlist(path):
+    """Reads one ticker per line, ignoring blank lines and `#` comments."""
+    with open(path) as f:
+        tickers = [line.split('#', 1)[0].strip().upper() for line in f]
+    return list(dict.fromkeys(ticker for ticker in tickers if ticker))
+
+
+class RefreshScheduler:
+    """
+    Runs data refreshes in a bounded background thread pool.
+
+    Attributes:
+        cache (DataCache): The cache refreshed entries are written to
+        watchlist (list): Tickers prewarmed during off-hours
+        max_workers (int): Maximum number of refreshes running at once
+        prewarm_valuation (callable): Optional `f(company)` run after a watchlist ticker is
+            refreshed, e.g. to render and cache its default valuation
+        market_hours (tuple): (start, end) hours in market time during which no prewarm runs
+        lock_path (str): Optional lock file electing one prewarming process among several, e.g.
+            the workers of a WSGI server; the others only serve stale-while-revalidate
+    """
+
+    def __init__(self, cache=None, watchlist=(), max_workers=DEFAULT_MAX_WORKERS, prewarm_valuation=None,
+                 market_hours=DEFAULT_MARKET_HOURS, check_interval=DEFAULT_CHECK_INTERVAL, lock_path=None):
+        self.cache = cache or get_default_cache()
+        self.watchlist = [ticker.upper() for ticker in watchlist]
+        self.max_workers = max_workers
+        self.prewarm_valuation = prewarm_valuation
+        self.market_hours = market_hours
+        self.check_interval = check_interval
+        self.last_prewarm = None  # Market-time date of the last completed prewarm
+        self.lock_path = lock_path
+        self._lock_file = None
+
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='refresh')
+        self._pending = set()
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def schedule(self, key, refresh):
+        """
+        Runs `refresh()` in the background unless a refresh for the same key is already pending.
+
+        :param key: Identifies what is refreshed, e.g. (ticker, dataset).
+        :param refresh: A zero-argument callable.
+        :return: True if the refresh was scheduled.
+        """
+        with self._lock:
+            if key in self._pending or self._stopped.is_set():
+                return False
+            self._pending.add(key)
+
+        def run():
+            try:
+                with fetch.priority(fetch.BATCH):  # Requests waiting for upstream data go first
+                    refresh()
+                metrics.increment('dcf_refresh_total', result='ok')
+            except Exception as e:
+                metrics.increment('dcf_refresh_total', result='error')
+                print(f"[ERROR] Background refresh of {key} failed: {type(e).__name__}: {e}")
+            finally:
+                with self._lock:
+                    self._pending.discard(key)
+
+        self._executor.submit(run)
+        return True
+
+    @property
+    def pending(self):
+        """Number of refreshes scheduled or running."""
+        with self._lock:
+            return len(self._pending)
+
+    def is_off_hours(self, moment=None):
+        moment = moment or datetime.now(market_data.MARKET_TIMEZONE)
+        start, end = self.market_hours
+        return moment.weekday() >= 5 or not start <= moment.hour < end
+
+    def refresh_ticker(self, ticker):
+        """Downloads every expired dataset of a ticker and the market inputs, then prewarms its valuation."""
+        company = Company(ticker, cache=self.cache, serve_stale=False)
+        if self.prewarm_valuation is not None:
+            self.prewarm_valuation(company)
+
+    def prewarm(self):
+        """Schedules a refresh of every watchlist ticker and waits for all of them."""
+        done = threading.Semaphore(0)
+
+        def refresh(ticker):
+            try:
+                self.refresh_ticker(ticker)
+            finally:
+                done.release()
+
+        scheduled = [ticker for ticker in self.watchlist if self.schedule(('prewarm', ticker), lambda t=ticker: refresh(t))]
+        for _ in scheduled:
+            done.acquire()
+        self.last_prewarm = datetime.now(market_data.MARKET_TIMEZONE).date()
+
+    def holds_prewarm_lock(self):
+        """
+        True if this process is the one that prewarms: always without a lock path, otherwise once
+        it holds the lock file. The lock is released when the process exits, so another process
+        takes over at its next check.
+        """
+        if self.lock_path is None or fcntl is None or self._lock_file is not None:
+            return True
+        lock_file = open(self.lock_path, 'a')
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+        self._lock_file = lock_file
+        return True
+
+    def _run(self):
+        while not self._stopped.is_set():
+            now = datetime.now(market_data.MARKET_TIMEZONE)
+            if (self.watchlist and self.is_off_hours(now) and self.last_prewarm != now.date()
+                    and self.holds_prewarm_lock()):
+                self.prewarm()
+            self._stopped.wait(self.check_interval)
+
+    def start(self):
+        """Attaches the scheduler to the cache for stale-while-revalidate and starts the prewarm loop."""
+        self.cache.revalidator = self
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='refresh-scheduler', daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, wait=True):
+        self._stopped.set()
+        if self.cache.revalidator is self:
+            self.cache.revalidator = None
+        self._executor.shutdown(wait=wait)
+        if self._lock_file is not None:
+            self._lock_file.close()  # Releases the prewarm lock
+            self._lock_file = None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('watchlist', help='Text file with one ticker per line')
+    parser.add_argument('--workers', type=int, default=DEFAULT_MAX_WORKERS, help='Maximum concurrent refreshes')
+    args = parser.parse_args()
+
+    scheduler = RefreshScheduler(watchlist=read_watchlist(args.watchlist), max_workers=args.workers)
+    start = time.perf_counter()
+    scheduler.prewarm()
+    scheduler.stop()
+    print(f"Prewarmed {len(scheduler.watchlist)} tickers in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,217 @@
+"""
+Exports static valuation reports for a list of tickers: one self-contained HTML page (the web
+app's result page, without the adjust form) and one JSON file (the /api/valuation payload) per
+ticker, rendered in parallel worker processes.
+
+Usage:
+    python reports.py tickers.txt --output reports/
+    python reports.py tickers.txt --output reports/ --model NopatDCF --forecast-years 10 --workers 8
+
+The tickers file holds one ticker per line (blank lines and lines starting with # are ignored).
+All reports load one copy of the Plotly bundle from assets/ in the output directory, so the
+directory can be published as is. reports.json records a fingerprint of the numbers each report
+was rendered from (statements, company details, WACC inputs, model and templates); re-running the
+export skips tickers whose fingerprint has not changed, however recently their data was
+downloaded, and records failed tickers with their error.
+"""
+import argparse
+import contextlib
+import hashlib
+import io
+import json
+import os
+import shutil
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from flask import Flask, render_template
+import app as webapp
+import fetch
+from company import Company
+from plotter import PLOTLY_JS_DIR, PLOTLY_JS_FILENAME, PLOTLY_VERSION
+from screener import read_tickers
+from valuation import DEFAULT_MODEL, MODELS, ValuationSession, summarize_valuation
+
+MANIFEST_FILENAME = 'reports.json'
+ASSETS_DIR = 'assets'
+# Templates a report is rendered from, part of its version
+TEMPLATES_DIR = os.path.join(os.path.dirname(os.path.abspath(webapp.__file__)), 'templates')
+_TEMPLATES = ('base.html', 'macros.html', 'result.html')
+
+# Flask app rendering the templates of a worker process, set by _init_worker()
+_renderer = None
+
+
+def plotly_asset_path():
+    """Path of the shared Plotly bundle, relative to the output directory."""
+    return f"{ASSETS_DIR}/plotly-{PLOTLY_VERSION}.min.js"
+
+
+def copy_plotly_asset(output_dir):
+    """Copies the Plotly bundle into the output directory once per Plotly version."""
+    path = os.path.join(output_dir, plotly_asset_path())
+    if not os.path.exists(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        shutil.copyfile(os.path.join(PLOTLY_JS_DIR, PLOTLY_JS_FILENAME), path)
+
+
+def read_manifest(output_dir):
+    path = os.path.join(output_dir, MANIFEST_FILENAME)
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def _write_atomically(path, text):
+    # Readers of a published directory never see a half-written file
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+
+def write_manifest(output_dir, manifest):
+    _write_atomically(os.path.join(output_dir, MANIFEST_FILENAME), json.dumps(manifest, indent=2, sort_keys=True))
+
+
+def report_version(session, model_name, forecast_years):
+    """
+    Fingerprint of everything a report is rendered from: the statements, the company details shown
+    on the page, the WACC inputs, the model and the templates. Unlike Company.data_version, it
+    does not depend on when the data was downloaded, so unchanged numbers give the same version.
+    Daily market inputs (market capitalization, risk-free rate) are part of the WACC, so a report
+    is rendered again when they move.
+    """
+    company, wacc = session.company, session.wacc_model
+    statements = company.statements
+    digest = hashlib.sha1()
+    digest.update(repr((
+        model_name, forecast_years, PLOTLY_VERSION,
+        statements.items(), [str(date) for date in statements.dates],
+        company.name, company.sector, company.industry, company.market_cap,
+        company.shares_outstanding, company.cash, company.debt,
+        wacc.risk_free_rate, wacc.market_return, wacc.beta, wacc.equity_value, wacc.debt_value,
+        wacc.tax_rate, wacc.calculate_cost_of_debt(), session.wacc,
+    )).encode())
+    digest.update(statements.values.tobytes())
+    for template in _TEMPLATES:
+        with open(os.path.join(TEMPLATES_DIR, template), 'rb') as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+
+def _init_worker(processes):
+    global _renderer
+    fetch.configure_batch_process(processes)
+    # Only the web app's templates are needed, not its routes or background refresh
+    _renderer = Flask(webapp.__name__)
+
+
+def export_report(ticker, model_name, forecast_years, output_dir, previous_version=None):
+    """
+    Renders the HTML and JSON report of one ticker unless its report_version() is
+    `previous_version` and both files exist. Errors are caught and recorded in the returned row.
+
+    :return: A manifest row with the status ('ok', 'unchanged' or 'error'), the report version
+             and the intrinsic share price.
+    """
+    row = {'ticker': ticker, 'model': model_name, 'forecast_years': forecast_years}
+    start = time.perf_counter()
+    html_path = os.path.join(output_dir, f"{ticker}.html")
+    json_path = os.path.join(output_dir, f"{ticker}.json")
+    try:
+        # The models print their WACC inputs; keep worker output quiet
+        with contextlib.redirect_stdout(io.StringIO()):
+            session = ValuationSession(Company(ticker))
+            version = report_version(session, model_name, forecast_years)
+            if version == previous_version and os.path.exists(html_path) and os.path.exists(json_path):
+                row.update(status='unchanged', version=version)
+                return row
+
+            dcf_calculator = session.value(forecast_years, model_name)
+            context = webapp.result_page_context(dcf_calculator, ticker, None, session.wacc)
+            context['adjustable'] = False
+            with _renderer.app_context():
+                html = render_template('result.html', plotly_src=plotly_asset_path(), **context)
+            valuation = summarize_valuation(dcf_calculator)
+
+        _write_atomically(html_path, html)
+        _write_atomically(json_path, json.dumps(valuation, indent=2))
+        row.update(status='ok', version=version, intrinsic_share_price=valuation['intrinsic_share_price'],
+                   generated_at=time.strftime('%Y-%m-%dT%H:%M:%S%z'))
+    except Exception as e:
+        row.update(status='error', error=f"{type(e).__name__}: {e}")
+    finally:
+        row['elapsed_seconds'] = round(time.perf_counter() - start, 3)
+    return row
+
+
+def run(tickers, model_name, forecast_years, output_dir, workers=None, force=False):
+    """
+    Exports the reports of `tickers` in a process pool, keeping a few tasks per worker in flight,
+    and records every completed ticker in the manifest as it finishes, so an interrupted run keeps
+    its progress.
+
+    :return: Number of tickers by status.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    copy_plotly_asset(output_dir)
+    manifest = read_manifest(output_dir)
+    reports = manifest.setdefault('reports', {})
+    manifest['plotly_asset'] = plotly_asset_path()
+
+    workers = workers or os.cpu_count() or 1
+    max_in_flight = workers * 4
+    counts = {'ok': 0, 'unchanged': 0, 'error': 0}
+
+    # Each worker gets its share of the upstream rate limit and runs at batch priority
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(workers,)) as executor:
+        remaining = iter(tickers)
+        pending = set()
+        while True:
+            for ticker in remaining:
+                previous = None if force else reports.get(ticker, {}).get('version')
+                pending.add(executor.submit(export_report, ticker, model_name, forecast_years, output_dir, previous))
+                if len(pending) >= max_in_flight:
+                    break
+            if not pending:
+                break
+
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                row = future.result()
+                counts[row['status']] += 1
+                if row['status'] == 'unchanged':
+                    # The report on disk is current, even if the previous run failed to update it
+                    reports[row['ticker']]['status'] = 'ok'
+                    reports[row['ticker']].pop('error', None)
+                elif row['status'] == 'error':
+                    print(f"[ERROR] {row['ticker']}: {row['error']}")
+                    # Keep the version of the last good report, whose files are left in place
+                    reports[row['ticker']] = {**reports.get(row['ticker'], {}), **row}
+                else:
+                    reports[row['ticker']] = row
+            write_manifest(output_dir, manifest)
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('tickers_file', help='File with one ticker per line')
+    parser.add_argument('--output', required=True, help='Directory of the reports')
+    parser.add_argument('--model', choices=sorted(MODELS), default=DEFAULT_MODEL)
+    parser.add_argument('--forecast-years', type=int, default=5)
+    parser.add_argument('--workers', type=int, default=None, help='Worker processes (default: CPU count)')
+    parser.add_argument('--force', action='store_true', help='Render every report, even unchanged ones')
+    args = parser.parse_args()
+
+    tickers = read_tickers(args.tickers_file)
+    print(f"Exporting {len(tickers)} {args.model} reports to {args.output}")
+    start = time.perf_counter()
+    counts = run(tickers, args.model, args.forecast_years, args.output, args.workers, args.force)
+    print(f"Rendered {counts['ok']} reports, {counts['unchanged']} unchanged, {counts['error']} failed "
+          f"in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == '__main__':
+    main()
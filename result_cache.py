@@ -0,0 +1,135 @@
+import hashlib
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+import metrics
+
+
+class CachedResult:
+    """
+    A rendered valuation together with its HTTP validators.
+
+    Attributes:
+        body (str): The rendered response body
+        etag (str): Strong entity tag derived from the cache key
+        last_modified (float): POSIX time the underlying company data was downloaded
+    """
+
+    def __init__(self, body, etag, last_modified):
+        self.body = body
+        self.etag = etag
+        self.last_modified = last_modified
+
+
+class ResultCache:
+    """
+    Bounded LRU cache of full valuation results, keyed on ticker, forecast horizon, model class
+    and the company data version. Because the data version is part of the key, refreshing the
+    underlying company data automatically misses the old entries, which then age out.
+
+    When `shared_path` is given, entries are also written to a SQLite database so that several
+    worker processes serve each other's results; the database is trimmed to `max_entries` rows
+    in least-recently-used order as well.
+
+    Attributes:
+        max_entries (int): Maximum number of entries kept in memory (and in shared storage)
+        shared_path (str): Optional SQLite database shared by all workers
+    """
+
+    def __init__(self, max_entries=256, shared_path=None):
+        self.max_entries = max_entries
+        self.shared_path = shared_path
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+        if shared_path:
+            directory = os.path.dirname(shared_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with self._connect() as conn:
+                conn.execute(
+                    """
+                    CREATE TABLE IF NOT EXISTS results (
+                        key TEXT PRIMARY KEY,
+                        used_at REAL NOT NULL,
+                        payload BLOB NOT NULL
+                    )
+                    """
+                )
+
+    @staticmethod
+    def key(ticker, forecast_years, model_cls, data_version):
+        return f"{ticker.upper()}|{forecast_years}|{model_cls.__name__}|{data_version}"
+
+    @staticmethod
+    def etag_for(key):
+        return hashlib.sha1(key.encode()).hexdigest()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.shared_path, timeout=30)
+        conn.execute('PRAGMA journal_mode=WAL')
+        return conn
+
+    def get(self, key):
+        with self._lock:
+            result = self._entries.get(key)
+            if result is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                metrics.increment('dcf_result_cache_requests_total', result='hit')
+                return result
+
+        result = self._get_shared(key) if self.shared_path else None
+        with self._lock:
+            if result is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self._remember(key, result)
+        metrics.increment('dcf_result_cache_requests_total', result='miss' if result is None else 'shared_hit')
+        return result
+
+    def set(self, key, body, last_modified):
+        result = CachedResult(body, self.etag_for(key), last_modified)
+        with self._lock:
+            self._remember(key, result)
+        if self.shared_path:
+            self._set_shared(key, result)
+        return result
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+        if self.shared_path:
+            with self._connect() as conn:
+                conn.execute('DELETE FROM results')
+
+    def _remember(self, key, result):
+        self._entries[key] = result
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _get_shared(self, key):
+        with self._connect() as conn:
+            row = conn.execute('SELECT payload FROM results WHERE key = ?', (key,)).fetchone()
+            if row is None:
+                return None
+            conn.execute('UPDATE results SET used_at = ? WHERE key = ?', (time.time(), key))
+        return pickle.loads(row[0])
+
+    def _set_shared(self, key, result):
+        with self._connect() as conn:
+            conn.execute(
+                'INSERT OR REPLACE INTO results (key, used_at, payload) VALUES (?, ?, ?)',
+                (key, time.time(), pickle.dumps(result, protocol=pickle.HIGHEST_PROTOCOL))
+            )
+            conn.execute(
+                'DELETE FROM results WHERE key NOT IN (SELECT key FROM results ORDER BY used_at DESC LIMIT ?)',
+                (self.max_entries,)
+            )
@@ -0,0 +1,243 @@
+"""
+Values a universe of tickers in parallel and streams one result row per ticker to CSV or Parquet.
+
+Usage:
+    python screener.py tickers.txt --model CashFlowOperationsDCF --output results.csv
+    python screener.py tickers.txt --model NopatDCF --output results_parquet --format parquet
+
+The tickers file holds one ticker per line (blank lines and lines starting with # are ignored).
+Completed tickers are appended to a checkpoint file next to the output once their rows are on
+disk, so re-running the same command resumes where an interrupted run stopped. Tickers already
+in the output count as done too, so a run killed between writing a row and checkpointing it does
+not write the row twice. Failed tickers are recorded with their error instead of aborting the run.
+"""
+import argparse
+import contextlib
+import csv
+import io
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+import fetch
+from company import Company
+from valuation import DEFAULT_MODEL, MODELS
+
+FIELDS = [
+    'ticker', 'model', 'forecast_years', 'status', 'error',
+    'intrinsic_share_price', 'equity_value', 'enterprise_value', 'wacc',
+    'cash', 'debt', 'shares_outstanding', 'market_cap', 'elapsed_seconds',
+]
+
+
+def value_ticker(ticker, model_name, forecast_years):
+    """
+    Values one ticker and returns a result row. Errors are caught and recorded in the row.
+    """
+    row = dict.fromkeys(FIELDS)
+    row.update(ticker=ticker, model=model_name, forecast_years=forecast_years)
+    start = time.perf_counter()
+    try:
+        # The models print their WACC inputs; keep worker output quiet
+        with contextlib.redirect_stdout(io.StringIO()):
+            company = Company(ticker)
+            dcf_calculator = MODELS[model_name](company, forecast_years)
+            dcf_calculator.calculate_dcf()
+            equity_value = dcf_calculator.calculate_equity_value()
+            intrinsic_share_price = dcf_calculator.calculate_intrinsic_share_price()
+        row.update(
+            status='ok',
+            intrinsic_share_price=float(intrinsic_share_price),
+            equity_value=float(equity_value),
+            enterprise_value=float(dcf_calculator.dcf_table['Discounted FCF ($)'].sum()),
+            wacc=float(dcf_calculator.discount_rate),
+            cash=company.cash,
+            debt=company.debt,
+            shares_outstanding=company.shares_outstanding,
+            market_cap=company.market_cap,
+        )
+    except Exception as e:
+        row.update(status='error', error=f"{type(e).__name__}: {e}")
+    row['elapsed_seconds'] = round(time.perf_counter() - start, 3)
+    return row
+
+
+def _sync(file):
+    file.flush()
+    os.fsync(file.fileno())
+
+
+class CsvResultWriter:
+    """
+    Appends rows to a CSV file, syncing every row to disk before it is reported as written.
+
+    Attributes:
+        written (set): Tickers already in the file when it was opened
+    """
+
+    def __init__(self, path):
+        self.written = self._repair(path)
+        is_new = not os.path.exists(path) or os.path.getsize(path) == 0
+        self.file = open(path, 'a', newline='')
+        self.writer = csv.DictWriter(self.file, fieldnames=FIELDS)
+        if is_new:
+            self.writer.writeheader()
+
+    @staticmethod
+    def _repair(path):
+        """Drops a row cut short by an interrupted run and returns the tickers of the complete rows."""
+        if not os.path.exists(path):
+            return set()
+        with open(path, 'rb+') as f:
+            data = f.read()
+            if data and not data.endswith(b'\n'):
+                f.truncate(data.rfind(b'\n') + 1)
+        with open(path, newline='') as f:
+            return {row['ticker'] for row in csv.DictReader(f)}
+
+    def write(self, row):
+        self.writer.writerow(row)
+        _sync(self.file)
+        return [row['ticker']]
+
+    def close(self):
+        self.file.close()
+        return []
+
+
+class ParquetResultWriter:
+    """
+    Writes rows in batches of `batch_size`, each batch to its own part file in the output
+    directory, so each run only holds one batch in memory. A part file is complete (with its
+    footer) before it is renamed into place, so an interrupted run leaves only readable files.
+    Requires pyarrow.
+
+    Attributes:
+        written (set): Tickers in the part files already in the directory
+    """
+
+    def __init__(self, directory, batch_size=500):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        os.makedirs(directory, exist_ok=True)
+        self.pa = pa
+        self.pq = pq
+        types = {'ticker': pa.string(), 'model': pa.string(), 'status': pa.string(), 'error': pa.string(),
+                 'forecast_years': pa.int64()}
+        self.schema = pa.schema([(name, types.get(name, pa.float64())) for name in FIELDS])
+        self.directory = directory
+        self.prefix = f"part-{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}"
+        self.parts = 0
+        self.batch_size = batch_size
+        self.rows = []
+        self.written = set()
+        for name in os.listdir(directory):
+            if name.endswith('.parquet'):
+                self.written.update(pq.read_table(os.path.join(directory, name), columns=['ticker'])['ticker'].to_pylist())
+
+    def write(self, row):
+        self.rows.append(row)
+        return self.flush() if len(self.rows) >= self.batch_size else []
+
+    def flush(self):
+        if not self.rows:
+            return []
+        columns = {name: [row[name] for row in self.rows] for name in FIELDS}
+        path = os.path.join(self.directory, f"{self.prefix}-{self.parts:05d}.parquet")
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            self.pq.write_table(self.pa.Table.from_pydict(columns, schema=self.schema), f)
+            _sync(f)
+        os.replace(tmp_path, path)
+        self.parts += 1
+        written = [row['ticker'] for row in self.rows]
+        self.rows = []
+        return written
+
+    def close(self):
+        return self.flush()
+
+
+def read_tickers(path):
+    with open(path) as f:
+        tickers = [line.strip().upper() for line in f]
+    return list(dict.fromkeys(t for t in tickers if t and not t.startswith('#')))
+
+
+def read_checkpoint(path):
+    if not os.path.exists(path):
+        return set()
+    with open(path) as f:
+        return {line.strip() for line in f if line.strip()}
+
+
+def run(tickers, model_name, forecast_years, writer, checkpoint_path, workers=None):
+    """
+    Values `tickers` in a process pool, keeping at most a few tasks per worker in flight so
+    memory stays flat, and streams each row to `writer` as soon as it completes.
+    """
+    workers = workers or os.cpu_count() or 1
+    max_in_flight = workers * 4
+    counts = {'ok': 0, 'error': 0}
+
+    # Each worker gets its share of the upstream rate limit and runs at batch priority
+    executor = ProcessPoolExecutor(max_workers=workers, initializer=fetch.configure_batch_process, initargs=(workers,))
+    with executor, open(checkpoint_path, 'a') as checkpoint:
+        def record(tickers_written):
+            # Writers only return tickers whose rows are already on disk
+            for ticker in tickers_written:
+                checkpoint.write(ticker + '\n')
+            _sync(checkpoint)
+
+        try:
+            remaining = iter(tickers)
+            pending = set()
+            while True:
+                for ticker in remaining:
+                    pending.add(executor.submit(value_ticker, ticker, model_name, forecast_years))
+                    if len(pending) >= max_in_flight:
+                        break
+                if not pending:
+                    break
+
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    row = future.result()
+                    counts[row['status']] += 1
+                    record(writer.write(row))
+                    if row['status'] == 'error':
+                        print(f"[ERROR] {row['ticker']}: {row['error']}")
+        finally:
+            # Rows the writer still buffers are written and checkpointed even when the run is interrupted
+            record(writer.close())
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('tickers_file', help='File with one ticker per line')
+    parser.add_argument('--model', choices=sorted(MODELS), default=DEFAULT_MODEL)
+    parser.add_argument('--forecast-years', type=int, default=5)
+    parser.add_argument('--output', required=True, help='CSV file, or directory of part files for Parquet')
+    parser.add_argument('--format', choices=['csv', 'parquet'], default=None,
+                        help='Output format; inferred from the output extension by default')
+    parser.add_argument('--workers', type=int, default=None, help='Worker processes (default: CPU count)')
+    parser.add_argument('--checkpoint', default=None, help='Checkpoint file (default: <output>.checkpoint)')
+    args = parser.parse_args()
+
+    output_format = args.format or ('csv' if args.output.endswith('.csv') else 'parquet')
+    checkpoint_path = args.checkpoint or args.output.rstrip('/\\') + '.checkpoint'
+
+    writer = CsvResultWriter(args.output) if output_format == 'csv' else ParquetResultWriter(args.output)
+    tickers = read_tickers(args.tickers_file)
+    done = read_checkpoint(checkpoint_path) | writer.written
+    todo = [ticker for ticker in tickers if ticker not in done]
+    print(f"{len(tickers)} tickers, {len(tickers) - len(todo)} already done, {len(todo)} to value with {args.model}")
+
+    start = time.perf_counter()
+    counts = run(todo, args.model, args.forecast_years, writer, checkpoint_path, args.workers)
+    print(f"Valued {counts['ok']} tickers, {counts['error']} failed in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == '__main__':
+    main()
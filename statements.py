@@ -0,0 +1,264 @@
+import numpy as np
+from keys import FinKeys
+
+# Line items kept by default: everything the models, WACC and plots read
+DEFAULT_LINE_ITEMS = frozenset(key.value for key in FinKeys)
+
+
+class StatementStore:
+    """
+    Compact, read-only store of the financial statements of one company.
+
+    Every kept line item is a row of one float64 matrix laid out on a date axis shared by all
+    statements, with a validity mask marking the reported values. The latest value of every row
+    and its reported values are precomputed when the store is built, so `latest()` and
+    `valid_values()` are O(1) and do not allocate.
+
+    "Latest" keeps the meaning of the original DataFrame lookups: the last reported value in the
+    statement's column order as delivered by yfinance.
+
+    Attributes:
+        dates (pd.Index or np.ndarray): Shared date axis, most recent first
+        values (np.ndarray): (rows, dates) matrix of line item values, NaN where not reported
+        mask (np.ndarray): Boolean matrix, True where a value was reported
+    """
+
+    def __init__(self, statements, dates, values, rows, columns):
+        """
+        Use StatementStore.from_frames() to build a store from yfinance DataFrames.
+
+        :param statements: Statement names in insertion order.
+        :param dates: The shared date axis.
+        :param values: (rows, dates) float64 matrix.
+        :param rows: Maps (statement, line item) to a row of `values`.
+        :param columns: Maps each statement to the positions of its columns on the date axis.
+        """
+        self.statements = list(statements)
+        self.dates = dates
+        self.values = values
+        self.mask = ~np.isnan(values)
+        self._rows = rows
+        self._columns = columns
+        # Positions of each statement's columns in ascending date order, for growth rates
+        self._chronological = {statement: self._chronological_order(positions) for statement, positions in columns.items()}
+
+        # Reported values of every row, concatenated in statement column order
+        self._latest = np.full(len(values), np.nan)
+        self._offsets = np.zeros(len(values) + 1, dtype=np.intp)
+        chunks = []
+        for (statement, _), row in sorted(rows.items(), key=lambda item: item[1]):
+            positions = columns[statement]
+            reported = values[row, positions][self.mask[row, positions]]
+            if reported.size:
+                self._latest[row] = reported[-1]
+            self._offsets[row + 1] = self._offsets[row] + reported.size
+            chunks.append(reported)
+        self._valid = np.concatenate(chunks) if chunks else np.empty(0)
+        self._valid.flags.writeable = False
+        self.values.flags.writeable = False
+
+    @classmethod
+    def from_frames(cls, frames, line_items=DEFAULT_LINE_ITEMS):
+        """
+        Builds a store from statement DataFrames with line items as rows and dates as columns.
+
+        :param frames: A dictionary mapping FinStatement values to DataFrames.
+        :param line_items: Line items to keep, or None to keep every row.
+        """
+        import pandas as pd
+        frames = {statement: df for statement, df in frames.items() if df is not None}
+
+        indexes = [pd.Index(df.columns) for df in frames.values()]
+        dates = indexes[0].append(indexes[1:]).unique() if indexes else pd.Index([])
+        try:
+            dates = dates.sort_values(ascending=False)
+        except TypeError:
+            pass  # Mixed column labels keep their first-seen order
+
+        rows, columns, blocks = {}, {}, []
+        for statement, df in frames.items():
+            columns[statement] = dates.get_indexer(df.columns)
+            index = df.index
+            keep = [i for i, key in enumerate(index)
+                    if (line_items is None or key in line_items) and (statement, key) not in rows]
+            for i in keep:
+                rows[(statement, index[i])] = len(rows)
+            block = np.full((len(keep), len(dates)), np.nan)
+            if keep:
+                raw = df.to_numpy()[keep]
+                try:
+                    numeric = raw.astype(float)
+                except (TypeError, ValueError):
+                    numeric = np.vstack([pd.to_numeric(row, errors='coerce') for row in raw]).astype(float)
+                block[:, columns[statement]] = numeric
+            blocks.append(block)
+
+        values = np.vstack(blocks) if blocks else np.empty((0, len(dates)))
+        return cls(frames.keys(), dates, values, rows, columns)
+
+    @classmethod
+    def from_dict(cls, statements, dates):
+        """
+        Builds a store from plain sequences, without pandas.
+
+        :param statements: Maps each FinStatement value to a dictionary of line item -> values,
+                           one value per date (NaN where not reported).
+        :param dates: Column dates shared by all statements, most recent first.
+        :raises: ValueError if a line item does not have one value per date.
+        """
+        dates = np.asarray(dates, dtype='datetime64[ns]')
+        rows, columns, blocks = {}, {}, []
+        for statement, line_items in statements.items():
+            columns[statement] = np.arange(len(dates))
+            for key, values in line_items.items():
+                values = np.asarray(values, dtype=float)
+                if values.shape != dates.shape:
+                    raise ValueError(f"'{key}' has {values.size} values for {len(dates)} dates.")
+                rows[(statement, key)] = len(rows)
+                blocks.append(values)
+        values = np.vstack(blocks) if blocks else np.empty((0, len(dates)))
+        return cls(statements.keys(), dates, values, rows, columns)
+
+    def _chronological_order(self, positions):
+        try:
+            dates = np.asarray(self.dates[positions], dtype='datetime64[ns]')
+        except (TypeError, ValueError):
+            return positions[::-1]  # Undated columns are assumed to be most recent first
+        return positions[np.argsort(dates, kind='stable')]
+
+    def _row(self, statement, key):
+        try:
+            return self._rows[(statement, key)]
+        except KeyError:
+            raise KeyError(f"The key '{key}' does not exist in the '{statement}' data.")
+
+    def __contains__(self, item):
+        """`(statement, key) in store`"""
+        return item in self._rows
+
+    def keys(self, statement):
+        """Line items stored for a statement, in row order."""
+        return [key for (name, key) in self._rows if name == statement]
+
+    def period_ends(self, statement):
+        """Dates of a statement's columns, in statement column order; empty for a missing statement."""
+        return self.dates[self._columns.get(statement, np.empty(0, dtype=np.intp))]
+
+    def items(self):
+        """(statement, line item) of every row, in row order."""
+        return sorted(self._rows, key=self._rows.get)
+
+    def latest(self, statement, key):
+        """
+        Returns the last reported value of a line item, or None when the line item is missing
+        or was never reported.
+        """
+        row = self._rows.get((statement, key))
+        if row is None or self._offsets[row] == self._offsets[row + 1]:
+            return None
+        return self._latest[row]
+
+    def first(self, statement, key, default=np.nan):
+        """
+        Returns the value in the statement's first (most recent) column, NaN if not reported there
+        and `default` if the statement has no columns at all.
+
+        :raises: KeyError if the line item is missing.
+        """
+        row = self._row(statement, key)
+        positions = self._columns[statement]
+        return self.values[row, positions[0]] if len(positions) else default
+
+    def valid_values(self, statement, key):
+        """
+        Returns a read-only view of the reported values of a line item in statement column order,
+        empty when the line item is missing.
+        """
+        row = self._rows.get((statement, key))
+        if row is None:
+            return self._valid[:0]
+        return self._valid[self._offsets[row]:self._offsets[row + 1]]
+
+    def chronological(self, statement, key):
+        """
+        Returns the values of a line item on its statement's columns in ascending date order,
+        including NaN for unreported years.
+
+        :raises: KeyError if the line item is missing.
+        """
+        return self.values[self._row(statement, key), self._chronological[statement]]
+
+    def matrix(self, statement, chronological=False):
+        """
+        Returns (line items, values) for a whole statement: a (line items, columns) matrix in
+        statement column order, or in ascending date order when `chronological` is True.
+        """
+        keys = self.keys(statement)
+        rows = [self._rows[(statement, key)] for key in keys]
+        positions = (self._chronological if chronological else self._columns).get(statement, np.empty(0, dtype=np.intp))
+        return keys, self.values[np.ix_(rows, positions)]
+
+    def aligned(self):
+        """
+        Returns every row on its own statement's columns in ascending date order, so line items of
+        all statements can be processed in one pass.
+
+        :return: (line items, values, lengths): the (statement, key) of every row, a (rows, columns)
+                 matrix left-aligned and NaN-padded to the statement with the most columns, and the
+                 number of columns of each row's statement.
+        """
+        items = self.items()
+        width = max((len(positions) for positions in self._chronological.values()), default=0)
+        # Gather index into `values` with one extra NaN column for the padding
+        gather = np.full((len(items), width), self.values.shape[1], dtype=np.intp)
+        lengths = np.zeros(len(items), dtype=np.intp)
+        for row, (statement, _) in enumerate(items):
+            positions = self._chronological[statement]
+            gather[row, :len(positions)] = positions
+            lengths[row] = len(positions)
+        padded = np.hstack([self.values, np.full((len(items), 1), np.nan)])
+        return items, np.take_along_axis(padded, gather, axis=1), lengths
+
+    def as_of(self, cutoff):
+        """
+        Returns a store holding only the columns of periods that ended on or before `cutoff`,
+        with the same line items and column order.
+
+        :param cutoff: A date or timestamp.
+        :raises: ValueError if the statement columns are not dated.
+        """
+        import pandas as pd
+        try:
+            dates = pd.DatetimeIndex(self.dates)
+        except (TypeError, ValueError):
+            raise ValueError("Statement columns are not dated, so a point-in-time view cannot be built.")
+        keep = np.flatnonzero(dates <= pd.Timestamp(cutoff))
+        # Old column position -> new position, -1 for dropped columns
+        remap = np.full(len(self.dates), -1, dtype=np.intp)
+        remap[keep] = np.arange(len(keep))
+        columns = {statement: remap[positions][remap[positions] >= 0] for statement, positions in self._columns.items()}
+        return StatementStore(self.statements, self.dates[keep], self.values[:, keep].copy(), dict(self._rows), columns)
+
+    def series(self, statement, key):
+        """
+        Returns the reported values of a line item as a Series indexed by date.
+
+        :raises: KeyError if the line item is missing.
+        """
+        import pandas as pd
+        row = self._row(statement, key)
+        positions = self._columns[statement]
+        positions = positions[self.mask[row, positions]]
+        return pd.Series(self.values[row, positions], index=self.dates[positions], name=key)
+
+    def frame(self, statement):
+        """Rebuilds a DataFrame of the stored line items of a statement."""
+        import pandas as pd
+        keys, values = self.matrix(statement)
+        positions = self._columns.get(statement, np.empty(0, dtype=np.intp))
+        return pd.DataFrame(values, index=pd.Index(keys), columns=self.dates[positions])
+
+    @property
+    def nbytes(self):
+        """Approximate memory held by the store's arrays."""
+        return self.values.nbytes + self.mask.nbytes + self._valid.nbytes + self._latest.nbytes + self._offsets.nbytes
@@ -0,0 +1,34 @@
+import os
+import sys
+import pytest
+
+# The application modules live at the repository root
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+import market_data
+import providers
+from benchmarks import fixtures as fixture_store
+from cache import DataCache
+
+
+@pytest.fixture
+def replayed(tmp_path):
+    """
+    Serves upstream calls from synthetic fixtures (SYNA...SYNE, ^GSPC, ^TNX) through the yfinance
+    provider, with an empty cache and no memoized market inputs.
+
+    :return: The DataCache to build companies with.
+    """
+    fixture_store.synthesize(str(tmp_path / 'fixtures'))
+    fixtures = fixture_store.load_fixtures(str(tmp_path / 'fixtures'))
+    previous_provider = providers._default_provider
+    providers.set_default_provider(providers.YFinanceProvider())
+    market_data._memo.clear()
+    try:
+        with fixture_store.replay(fixtures):
+            yield DataCache(str(tmp_path / 'cache.sqlite'))
+    finally:
+        market_data._memo.clear()
+        providers.set_default_provider(previous_provider)
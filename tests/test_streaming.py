@@ -0,0 +1,103 @@
+import gc
+import threading
+import pytest
+import cache
+from coalesce import StreamFlight
+
+
+class Produced:
+    """A generator of chunks that records how far it got and whether it was closed."""
+
+    def __init__(self, chunks=('a', 'b', 'c')):
+        self.chunks = chunks
+        self.runs = 0
+        self.closed = threading.Event()
+        self.finished = False
+
+    def __call__(self):
+        self.runs += 1
+        try:
+            yield from self.chunks
+            self.finished = True
+        finally:
+            self.closed.set()
+
+
+def test_abandoned_stream_is_closed_and_forgotten():
+    flight, produce = StreamFlight('test'), Produced()
+    consumer = flight.stream('key', produce)
+    assert next(consumer) == 'a'
+    consumer.close()
+    assert flight.in_flight == 0
+    assert produce.closed.is_set() and not produce.finished
+
+
+def test_dropped_stream_is_closed_and_forgotten():
+    flight, produce = StreamFlight('test'), Produced()
+    consumer = flight.stream('key', produce)
+    next(consumer)
+    del consumer
+    gc.collect()
+    assert flight.in_flight == 0
+    assert produce.closed.is_set()
+
+
+def test_stream_continues_while_a_follower_reads_it():
+    flight, produce = StreamFlight('test'), Produced()
+    leader = flight.stream('key', produce)
+    follower = flight.stream('key', produce)
+    next(leader)
+    leader.close()
+    assert flight.in_flight == 1 and not produce.closed.is_set()
+    assert list(follower) == ['a', 'b', 'c']
+    assert produce.runs == 1 and produce.finished
+    assert flight.in_flight == 0
+
+
+def test_abandoned_key_starts_a_new_stream():
+    flight, produce = StreamFlight('test'), Produced()
+    consumer = flight.stream('key', produce)
+    next(consumer)
+    consumer.close()
+    assert list(flight.stream('key', produce)) == ['a', 'b', 'c']
+    assert produce.runs == 2
+    assert flight.in_flight == 0
+
+
+def test_failed_stream_is_forgotten():
+    def produce():
+        yield 'a'
+        raise ValueError('no data')
+
+    flight = StreamFlight('test')
+    consumer = flight.stream('key', produce)
+    assert next(consumer) == 'a'
+    with pytest.raises(ValueError):
+        next(consumer)
+    assert flight.in_flight == 0
+
+
+def test_disconnected_result_page_is_not_cached(replayed, monkeypatch):
+    import app
+    monkeypatch.setattr(cache, '_default_cache', replayed)
+    app.result_cache.clear()
+    flask_app = app.create_app()
+    client = flask_app.test_client()
+
+    def cached_page():
+        with flask_app.test_request_context('/'):
+            return app.lookup_valuation('SYNA', 5, app.MODELS[app.DEFAULT_MODEL])[2]
+
+    response = client.get('/?ticker=SYNA&forecast_years=5&stream=1', buffered=False)
+    assert response.status_code == 200
+    next(response.response)
+    response.close()
+    gc.collect()
+    assert app.stream_flight.in_flight == 0
+    assert cached_page() is None
+
+    # A later request values the company again and stores the complete page
+    response = client.get('/?ticker=SYNA&forecast_years=5&stream=1')
+    assert '</html>' in response.get_data(as_text=True)
+    assert app.stream_flight.in_flight == 0
+    assert cached_page() is not None
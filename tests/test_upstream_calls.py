@@ -0,0 +1,45 @@
+from collections import Counter
+import fetch
+from company import Company
+from valuation import MODELS, ValuationSession, value_company
+
+# One call per dataset of the company, and one per market input shared by all companies
+COMPANY_CALLS = Counter({'info': 1, 'cashflow': 1, 'balance_sheet': 1, 'income_stmt': 1})
+MARKET_CALLS = Counter({'history:max': 1, 'history:1d': 1})
+
+
+def test_valuation_fetches_every_input_once(replayed):
+    with fetch.count_upstream_calls() as counter:
+        value_company('SYNA', 5, company=Company('SYNA', cache=replayed))
+    assert counter.calls == COMPANY_CALLS + MARKET_CALLS
+    assert counter.total == 6
+
+
+def test_wacc_without_prefetch_fetches_market_inputs_once(replayed):
+    with fetch.count_upstream_calls() as counter:
+        company = Company('SYNA', cache=replayed, prefetch_market_data=False)
+        value_company('SYNA', 5, company=company)
+    assert counter.calls == COMPANY_CALLS + MARKET_CALLS
+
+
+def test_session_models_share_the_wacc(replayed):
+    with fetch.count_upstream_calls() as counter:
+        session = ValuationSession(Company('SYNA', cache=replayed))
+        for model_name in MODELS:
+            session.value(5, model_name)
+            session.value(10, model_name, terminal_growth_rate=0.02)
+    assert counter.calls == COMPANY_CALLS + MARKET_CALLS
+
+
+def test_market_inputs_are_shared_between_companies(replayed):
+    value_company('SYNA', 5, company=Company('SYNA', cache=replayed))
+    with fetch.count_upstream_calls() as counter:
+        value_company('SYNB', 5, company=Company('SYNB', cache=replayed))
+    assert counter.calls == COMPANY_CALLS
+
+
+def test_cached_company_makes_no_upstream_calls(replayed):
+    value_company('SYNA', 5, company=Company('SYNA', cache=replayed))
+    with fetch.count_upstream_calls() as counter:
+        value_company('SYNA', 5, company=Company('SYNA', cache=replayed))
+    assert counter.total == 0
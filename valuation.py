@@ -0,0 +1,230 @@
+import copy
+import math
+import secrets
+import threading
+from collections import OrderedDict
+import pandas as pd
+import metrics
+from company import Company
+from dcf_models.fcf import FreeCashFlowDCF
+from dcf_models.nopat import NopatDCF
+from dcf_models.operations import CashFlowOperationsDCF
+from modeling import ProjectAssumptions
+from wacc import WACC
+
+MODELS = {
+    'CashFlowOperationsDCF': CashFlowOperationsDCF,
+    'NopatDCF': NopatDCF,
+    'FreeCashFlowDCF': FreeCashFlowDCF,
+}
+
+DEFAULT_MODEL = 'CashFlowOperationsDCF'
+DEFAULT_TERMINAL_GROWTH_RATE = 0.03
+
+
+def _number(value):
+    """Converts NumPy scalars to plain floats for JSON; None for missing or non-finite values."""
+    if value is None:
+        return None
+    value = float(value)
+    # NaN and infinity have no JSON literal
+    return value if math.isfinite(value) else None
+
+
+def value_company(ticker, forecast_years, model_name=DEFAULT_MODEL, company=None):
+    """
+    Runs a DCF valuation without any plotting or template work.
+
+    :param ticker: The stock ticker symbol.
+    :param forecast_years: Number of years to project.
+    :param model_name: A key of MODELS.
+    :param company: An already downloaded Company to reuse.
+    :return: A JSON-serializable dictionary with the DCF table, equity value, intrinsic price,
+             WACC components and the projection assumptions.
+    :raises: KeyError if the model name is unknown.
+    """
+    model_cls = MODELS[model_name]
+    company = company or Company(ticker)
+    dcf_calculator = model_cls(company, forecast_years)
+    dcf_calculator.calculate_dcf()
+    dcf_calculator.calculate_equity_value()
+    dcf_calculator.calculate_intrinsic_share_price()
+    return summarize_valuation(dcf_calculator)
+
+
+def summarize_valuation(dcf_calculator):
+    """
+    Returns the JSON-serializable dictionary of value_company() for a model whose DCF table,
+    equity value and intrinsic share price are already calculated.
+    """
+    company = dcf_calculator.company
+    wacc = dcf_calculator.wacc_model
+
+    return {
+        'ticker': company.ticker.upper(),
+        'model': type(dcf_calculator).__name__,
+        'forecast_years': dcf_calculator.forecast_years,
+        'company': {
+            'name': company.name,
+            'sector': company.sector,
+            'industry': company.industry,
+            'market_cap': _number(company.market_cap),
+            'shares_outstanding': _number(company.shares_outstanding),
+            'cash': _number(company.cash),
+            'debt': _number(company.debt),
+        },
+        'dcf_table': [
+            {
+                'year': row['Year'],
+                'forecasted_fcf': _number(row['Forecasted FCF ($)']),
+                'discounted_fcf': _number(row['Discounted FCF ($)']),
+            }
+            for row in dcf_calculator.dcf_table.to_dict('records')
+        ],
+        'enterprise_value': _number(dcf_calculator.dcf_table['Discounted FCF ($)'].sum()),
+        'equity_value': _number(dcf_calculator.equity_value),
+        'intrinsic_share_price': _number(dcf_calculator.intrinsic_share_price),
+        'wacc': {
+            'wacc': _number(dcf_calculator.discount_rate),
+            'risk_free_rate': _number(wacc.risk_free_rate),
+            'market_return': _number(wacc.market_return),
+            'beta': _number(wacc.beta),
+            'cost_of_equity': _number(wacc.calculate_cost_of_equity()),
+            'cost_of_debt': _number(wacc.calculate_cost_of_debt()),
+            'tax_rate': _number(wacc.tax_rate),
+            'equity_value': _number(wacc.equity_value),
+            'debt_value': _number(wacc.debt_value),
+        },
+        'assumptions': {
+            **{name: _number(value) for name, value in dcf_calculator.drivers.items()},
+            'terminal_growth_rate': _number(dcf_calculator.terminal_growth_rate),
+        },
+    }
+
+
+class ValuationSession:
+    """
+    Keeps everything about a company that does not depend on the valuation inputs: the
+    downloaded data, one WACC model with its computed rate, memoized growth rates shared by all
+    models and the FCF drivers (growth rates, margins, tax rate) of every model used so far.
+    Changing the horizon, terminal growth or discount rate only reruns the projection and
+    discounting; switching models additionally computes the new model's drivers once.
+
+    Usage:
+        session = ValuationSession(Company('AAPL'))
+        session.value(forecast_years=5).intrinsic_share_price
+        session.value(forecast_years=10, terminal_growth_rate=0.025).intrinsic_share_price
+
+    Attributes:
+        company (Company): The downloaded company data
+        wacc_model (WACC): Shared by every model of the session
+        wacc (float): The computed WACC, used unless a discount rate is given
+        assumptions (ProjectAssumptions): Shared by every model of the session
+    """
+
+    def __init__(self, company):
+        self.company = company
+        with metrics.span('session.wacc'):
+            self.wacc_model = WACC(company.ticker, company=company)
+            self.wacc = self.wacc_model.calculate_wacc()
+        self.assumptions = ProjectAssumptions.for_company(company)
+        self._models = {}
+        self._lock = threading.Lock()
+
+    def value(self, forecast_years, model_name=DEFAULT_MODEL, terminal_growth_rate=DEFAULT_TERMINAL_GROWTH_RATE,
+              discount_rate=None):
+        """
+        Values the company with the given inputs, reusing the WACC and the model's drivers.
+
+        :param forecast_years: Number of years to project.
+        :param model_name: A key of MODELS.
+        :param terminal_growth_rate: Perpetual growth rate after the forecast horizon.
+        :param discount_rate: Discount rate to use instead of the session's WACC.
+        :return: A snapshot of the model, with its DCF table, equity value and intrinsic share price
+                 calculated. Later calls on the session do not change it.
+        :raises: KeyError if the model name is unknown.
+                 ValueError if the discount rate does not exceed terminal growth.
+        """
+        discount_rate = self.wacc if discount_rate is None else discount_rate
+        if discount_rate <= terminal_growth_rate:
+            raise ValueError("The discount rate must exceed the terminal growth rate")
+
+        # Models keep their results as attributes, so one session values one input set at a time
+        with self._lock:
+            dcf_calculator = self._models.get(model_name)
+            if dcf_calculator is None:
+                dcf_calculator = MODELS[model_name](self.company, forecast_years, wacc_model=self.wacc_model,
+                                                    assumptions=self.assumptions)
+                self._models[model_name] = dcf_calculator
+            dcf_calculator.forecast_years = forecast_years
+            dcf_calculator.terminal_growth_rate = terminal_growth_rate
+            with metrics.span('session.value'):
+                dcf_calculator.calculate_dcf(discount_rate=discount_rate)
+                dcf_calculator.calculate_equity_value()
+                dcf_calculator.calculate_intrinsic_share_price()
+            # Every calculation assigns new result attributes, so a shallow copy keeps this input set
+            # even while concurrent requests revalue the session's model
+            return copy.copy(dcf_calculator)
+
+    def compare(self, forecast_years, model_names=None, terminal_growth_rate=DEFAULT_TERMINAL_GROWTH_RATE,
+                discount_rate=None):
+        """
+        Values the company under several models in one pass, sharing the WACC and growth rates.
+        A model that cannot value the company gets NaN values and its error message.
+
+        :param forecast_years: Number of years to project.
+        :param model_names: Keys of MODELS; defaults to all of them.
+        :return: A DataFrame indexed by model name with the enterprise value, equity value,
+                 intrinsic share price and growth rate of every model, and the valued models
+                 by name (failed models are left out).
+        """
+        rows, models = [], {}
+        for model_name in model_names or MODELS:
+            try:
+                dcf_calculator = self.value(forecast_years, model_name, terminal_growth_rate, discount_rate)
+            except Exception as e:
+                rows.append({'Model': model_name, 'Error': f"{type(e).__name__}: {e}"})
+                continue
+            models[model_name] = dcf_calculator
+            rows.append({
+                'Model': model_name,
+                'Enterprise Value ($)': dcf_calculator.dcf_table['Discounted FCF ($)'].sum(),
+                'Equity Value ($)': dcf_calculator.equity_value,
+                'Intrinsic Share Price ($)': dcf_calculator.intrinsic_share_price,
+                'Growth Rate': dcf_calculator.drivers[dcf_calculator.growth_driver],
+                'Error': None,
+            })
+        columns = ['Enterprise Value ($)', 'Equity Value ($)', 'Intrinsic Share Price ($)', 'Growth Rate', 'Error']
+        return pd.DataFrame(rows).set_index('Model').reindex(columns=columns), models
+
+
+class ValuationSessions:
+    """
+    Server-side ValuationSession handles for the web UI, evicted in least-recently-used order.
+
+    Attributes:
+        max_entries (int): Maximum number of sessions kept
+    """
+
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+
+    def create(self, company):
+        """Starts a session for a company and returns (handle, session)."""
+        session = ValuationSession(company)
+        handle = secrets.token_urlsafe(16)
+        with self._lock:
+            self._sessions[handle] = session
+            while len(self._sessions) > self.max_entries:
+                self._sessions.popitem(last=False)
+        return handle, session
+
+    def get(self, handle):
+        """Returns the session for a handle, or None if it is unknown or was evicted."""
+        with self._lock:
+            session = self._sessions.get(handle)
+            if session is not None:
+                self._sessions.move_to_end(handle)
+            return session
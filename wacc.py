@@ -1,23 +1,33 @@
-import yfinance as yf 
+import metrics
+from dcf_models import core
+from keys import FinKeys, FinStatement
+
 class WACC:
     """
     The WACC class calculates the Weighted Average Cost of Capital (WACC) for a given stock ticker.
 
     Attributes:
         ticker (str): The stock ticker symbol (e.g. "AAPL")
+        company (Company): Already-downloaded company data; all company inputs are read from it
+            instead of being fetched again. A new Company is created when omitted.
     """
 
-    def __init__(self, ticker):
+    def __init__(self, ticker, company=None):
         self.ticker = ticker
-        self.stock = yf.Ticker(ticker)
+        if company is None:
+            from company import Company
+            company = Company(ticker)
+        self.company = company
 
         self.market_bond_spread = 0.02
-        self.risk_free_rate = self.get_risk_free_rate()
-        self.market_return = self.get_historical_market_return()
-        self.beta = self.stock.info.get('beta', 1) 
-        self.equity_value = self.stock.info.get('marketCap', 0)  
-        self.debt_value = self.get_debt_value()
-        self.tax_rate = self.calculate_effective_tax_rate()
+        with metrics.span('wacc.market_inputs'):
+            self.risk_free_rate = self.get_risk_free_rate()
+            self.market_return = self.get_historical_market_return()
+        with metrics.span('wacc.company_inputs'):
+            self.beta = self.company.info.get('beta', 1) 
+            self.equity_value = self.company.info.get('marketCap', 0)  
+            self.debt_value = self.get_debt_value()
+            self.tax_rate = self.calculate_effective_tax_rate()
 
         print("##### Calculating WACC #####")
         print(f"Risk-free rate: {self.risk_free_rate:.2%}")
@@ -31,30 +41,24 @@ class WACC:
         Returns:
             float: The total debt value
         """
-        balance_sheet = self.stock.balance_sheet
-        total_debt = balance_sheet.loc['Total Debt']
-        return total_debt.iloc[0] if not total_debt.empty else 0
+        return self.company.statements.first(FinStatement.BALANCE_SHEET.value, FinKeys.DEBT.value, default=0)
     
     def get_risk_free_rate(self):
         """
         Returns the 10-year Treasury yield as a proxy for the risk-free rate.
+        The value is shared across requests and refreshed once per trading day.
 
         Returns:
             float: The risk-free rate
         """
-        treasury_data = yf.Ticker("^TNX")  # 10-year Treasury yield
-        periods = ['1d', '5d', '1mo', '3mo']
-        for period in periods:
-            try:
-                return treasury_data.history(period=period)['Close'].iloc[-1] / 100
-            except IndexError:
-                pass
-        raise ValueError("No risk free rate data available")  
+        import market_data
+        return market_data.get_risk_free_rate(self.company.cache, provider=getattr(self.company, 'provider', None))
 
     def get_historical_market_return(self,ticker="^GSPC"):
         """
         Calculates the average historical return of a given index.
         By default, it uses the S&P 500 Index (^GSPC), but other indices can be specified.
+        The value is shared across requests and refreshed once per trading day.
 
         Args:
             ticker (str): The ticker symbol of the index. Defaults to "^GSPC".
@@ -67,19 +71,9 @@ class WACC:
         Returns:
             float: The historical market return
         """
-        index = yf.Ticker(ticker)
-        historical_data = index.history(period="max")
-        
-        # Ensure that the 'Close' column is available
-        if 'Close' not in historical_data.columns:
-            raise ValueError("The selected ticker does not contain 'Close' data.")
-        
-        historical_data['Year'] = historical_data.index.year
-        yearly_returns = historical_data['Close'].resample('YE').ffill().pct_change().dropna()
-
-        average_return = yearly_returns.mean()
-        
-        return average_return
+        import market_data
+        return market_data.get_historical_market_return(ticker, self.company.cache,
+                                                         provider=getattr(self.company, 'provider', None))
     def calculate_effective_tax_rate(self):
         """
         Calculates the effective tax rate based on the company's income statement data.
@@ -87,11 +81,12 @@ class WACC:
         Returns:
             float: The effective tax rate
         """
-        income_statement = self.stock.financials.T
+        statements = self.company.statements
+        income = FinStatement.INCOME.value
 
-        if 'Tax Provision' in income_statement.columns and 'Pretax Income' in income_statement.columns:
-            tax_provision = income_statement['Tax Provision'].iloc[0]
-            pretax_income = income_statement['Pretax Income'].iloc[0]
+        if (income, FinKeys.TAX_PROVISION.value) in statements and (income, FinKeys.PRETAX_INCOME.value) in statements:
+            tax_provision = statements.first(income, FinKeys.TAX_PROVISION.value)
+            pretax_income = statements.first(income, FinKeys.PRETAX_INCOME.value)
             return tax_provision / pretax_income if pretax_income != 0 else 0.21
         
         # Default tax rate if calculation is not possible
@@ -104,7 +99,7 @@ class WACC:
         Returns:
             float: The cost of equity
         """
-        return self.risk_free_rate + self.beta * (self.market_return - self.risk_free_rate)
+        return core.cost_of_equity(self.risk_free_rate, self.beta, self.market_return)
 
     def calculate_cost_of_debt(self):
         """
@@ -113,10 +108,11 @@ class WACC:
         Returns:
             float: The cost of debt
         """
-        income_statement = self.stock.financials.T
+        statements = self.company.statements
+        income = FinStatement.INCOME.value
 
-        if 'Interest Expense' in income_statement.columns and self.debt_value != 0:
-            interest_expense = income_statement['Interest Expense'].iloc[0]
+        if (income, FinKeys.INTEREST_EXPENSE.value) in statements and self.debt_value != 0:
+            interest_expense = statements.first(income, FinKeys.INTEREST_EXPENSE.value)
             return interest_expense / self.debt_value
         
         # Default cost of debt if data is missing
@@ -129,14 +125,7 @@ class WACC:
         Returns:
             float: The WACC
         """
-        # Calculate the proportion of equity and debt
-        total_value = self.equity_value + self.debt_value
-        equity_proportion = self.equity_value / total_value if total_value != 0 else 0
-        debt_proportion = self.debt_value / total_value if total_value != 0 else 0
-
-        wacc = (
-            equity_proportion * self.calculate_cost_of_equity() +
-            debt_proportion * self.calculate_cost_of_debt() * (1 - self.tax_rate)
-        )
+        wacc = core.weighted_average_cost_of_capital(self.equity_value, self.debt_value, self.calculate_cost_of_equity(),
+                                                     self.calculate_cost_of_debt(), self.tax_rate)
         print(f"WACC: {wacc:.2%}")
         return wacc
\ No newline at end of file
@@ -0,0 +1,13 @@
+"""
+WSGI entry point for multi-worker servers, e.g.:
+
+    DCF_WEB_WORKERS=4 gunicorn -w 4 --threads 8 -b 0.0.0.0:8000 wsgi:application
+
+Each worker process builds its own app (do not use --preload: the background refresh scheduler
+started by create_app() would not survive the fork). Set DCF_RESULT_CACHE_PATH so workers share
+rendered results, and DCF_WEB_WORKERS (or WEB_CONCURRENCY) to the worker count so the workers split
+DCF_FETCH_RATE between them. Only one worker prewarms the watchlist (see DCF_REFRESH_LOCK_PATH).
+"""
+from app import create_app
+
+application = create_app()